@@ -0,0 +1,195 @@
+# alerts.py
+#
+# Meldingen (ChangeEvent) per pagina met keyset (cursor) paginering op
+# (detected_at, event_id), nieuwste eerst. De cursor onthoudt de laatste
+# melding van een pagina; de volgende pagina begint daar via de index
+# ix_change_event_detected (of ix_change_event_company_detected per bedrijf).
+#
+# Het totale aantal meldingen komt uit de teller change_event_count
+# (app_counter), die bij de commit van een transactie met nieuwe of verwijderde
+# ChangeEvents mee aangepast wordt, zodat het dashboard geen COUNT(*) meer doet.
+# Zoals de change_seq (app/changes.py) pas in before_commit: de wekelijkse
+# refresh houdt de tellerrij zo niet de hele lus vergrendeld.
+
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app import db
+from app.counters import bump_counter, read_counter, set_counter
+from app.models import ChangeEvent, Company
+
+ALERT_PAGE_SIZE = 50
+ALERT_PAGE_MAX = 200
+
+CHANGE_EVENT_COUNT = "change_event_count"
+
+
+def encode_alert_cursor(detected_at, event_id):
+    """Opake cursor (base64url JSON) voor de positie (detected_at, event_id)."""
+    raw = json.dumps(
+        [detected_at.isoformat() if detected_at else None, event_id],
+        separators=(",", ":"),
+    ).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_alert_cursor(cursor):
+    """(detected_at, event_id) uit een cursor; ValueError bij een ongeldige cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        detected_at, event_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(detected_at), int(event_id)
+    except Exception as e:
+        raise ValueError("Ongeldige cursor") from e
+
+
+def alert_page(company_id=None, after=None, limit=ALERT_PAGE_SIZE):
+    """
+    Eén pagina meldingen, nieuwste eerst, met de bedrijfsnaam in dezelfde query.
+    after: cursor van de laatste melding van de vorige pagina.
+    Retourneert (alerts, next_cursor) met alerts als dicts zoals de templates ze gebruiken.
+    """
+    limit = max(1, min(ALERT_PAGE_MAX, limit))
+
+    query = (
+        db.session.query(ChangeEvent, Company.name)
+        .outerjoin(Company, Company.company_id == ChangeEvent.company_id)
+        .filter(ChangeEvent.detected_at.isnot(None))
+    )
+    if company_id is not None:
+        query = query.filter(ChangeEvent.company_id == company_id)
+    if after is not None:
+        key = db.tuple_(ChangeEvent.detected_at, ChangeEvent.event_id)
+        query = query.filter(key < decode_alert_cursor(after))
+
+    # Eén rij extra ophalen om te weten of er nog een pagina volgt
+    rows = (
+        query.order_by(ChangeEvent.detected_at.desc(), ChangeEvent.event_id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    alerts = [
+        {
+            "id": e.event_id,
+            "company_id": e.company_id,
+            "company": company_name or "Onbekend bedrijf",
+            "type": e.event_type,
+            "description": e.description,
+            "time": e.detected_at,
+        }
+        for e, company_name in rows
+    ]
+
+    next_cursor = None
+    if more:
+        last = rows[-1][0]
+        next_cursor = encode_alert_cursor(last.detected_at, last.event_id)
+    return alerts, next_cursor
+
+
+# -----------------------------
+# Eventfeed (/api/events)
+# -----------------------------
+
+# Rijen per server-side fetch bij het streamen (yield_per)
+EVENT_FEED_BATCH = 1000
+EVENT_FEED_PAGE_SIZE = 500
+EVENT_FEED_PAGE_MAX = 5000
+
+
+def event_feed_query(company_id=None, event_type=None, since=None, after=None):
+    """
+    (ChangeEvent, Company.name) gesorteerd op (detected_at, event_id), nieuwste eerst.
+    after: cursor van het laatst ontvangen event (zie event_record); ValueError bij een ongeldige cursor.
+    """
+    query = (
+        db.session.query(ChangeEvent, Company.name)
+        .join(Company, ChangeEvent.company_id == Company.company_id)
+    )
+    if company_id:
+        query = query.filter(ChangeEvent.company_id == company_id)
+    if event_type:
+        query = query.filter(ChangeEvent.event_type == event_type)
+    if since is not None:
+        query = query.filter(ChangeEvent.detected_at >= since)
+    if after is not None:
+        key = db.tuple_(ChangeEvent.detected_at, ChangeEvent.event_id)
+        query = query.filter(key < decode_alert_cursor(after))
+    return query.order_by(ChangeEvent.detected_at.desc(), ChangeEvent.event_id.desc())
+
+
+def event_record(e, company_name):
+    """Eén event zoals /api/events het teruggeeft, met de cursor om erna verder te lezen."""
+    return {
+        "event_id": e.event_id,
+        "company_id": e.company_id,
+        "company_name": company_name or "Onbekend",
+        "event_type": e.event_type,
+        "description": e.description,
+        "detected_at": e.detected_at.isoformat() if e.detected_at else None,
+        "cursor": encode_alert_cursor(e.detected_at, e.event_id) if e.detected_at else None,
+    }
+
+
+def stream_event_records(query, limit=None):
+    """
+    Events één voor één uit een server-side cursor (yield_per), zonder het
+    volledige resultaat in het geheugen op te bouwen.
+    """
+    if limit is not None:
+        query = query.limit(limit)
+    for e, company_name in query.yield_per(EVENT_FEED_BATCH):
+        yield event_record(e, company_name)
+
+
+# -----------------------------
+# Teller change_event_count
+# -----------------------------
+
+def _recount():
+    return select(func.count()).select_from(ChangeEvent.__table__)
+
+
+def change_event_count():
+    """Totaal aantal meldingen (bijgehouden teller, geen COUNT(*) per request)."""
+    return read_counter(CHANGE_EVENT_COUNT, _recount())
+
+
+def recount_change_events():
+    """Zet de teller opnieuw gelijk aan COUNT(*), bv. na bulk-deletes buiten de ORM."""
+    return set_counter(CHANGE_EVENT_COUNT, _recount())
+
+
+# Sleutel in session.info: netto aantal toegevoegde ChangeEvents in deze transactie
+_DELTA = "change_event_delta"
+
+
+@event.listens_for(Session, "after_flush")
+def _count_change_events(session, flush_context):
+    # session.new / session.deleted bevatten hier nog de toestand van vóór de flush
+    delta = (sum(isinstance(obj, ChangeEvent) for obj in session.new)
+             - sum(isinstance(obj, ChangeEvent) for obj in session.deleted))
+    if delta:
+        session.info[_DELTA] = session.info.get(_DELTA, 0) + delta
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_change_event_count(session):
+    session.flush()
+    delta = session.info.pop(_DELTA, 0)
+    if delta:
+        bump_counter(session.connection(), CHANGE_EVENT_COUNT, delta, _recount().scalar_subquery())
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_change_event_count(session, transaction):
+    # Na een rollback (of close) van de buitenste transactie: niets meer te tellen
+    if transaction.parent is None:
+        session.info.pop(_DELTA, None)
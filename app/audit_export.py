@@ -0,0 +1,141 @@
+# audit_export.py
+#
+# Streaming exports van de audit logs (CSV, JSON-array of NDJSON).
+# De rijen komen uit een server-side cursor (yield_per) en worden in blokken
+# van enkele tientallen KB naar de response geschreven, zodat het geheugen-
+# gebruik niet meegroeit met de tabel. Optioneel wordt de stroom meteen
+# gzip-gecomprimeerd.
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import AuditLog, Company
+
+# Rijen per server-side fetch
+AUDIT_EXPORT_BATCH = 2000
+
+# Grootte (tekens) waarop een blok naar de client gaat
+AUDIT_EXPORT_CHUNK = 64 * 1024
+
+AUDIT_EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "json": ("application/json", "json"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+CSV_HEADER = ["Company", "Source Name", "Source URL", "Retrieved At"]
+
+
+def parse_export_bound(value, end=False):
+    """
+    Datum(tijd) voor ?since= / ?until= (ISO-formaat), of None als de parameter leeg is.
+    Een datum zonder tijd als einde telt de hele dag mee ("2025-12-31" → tot 2026-01-01).
+    ValueError bij een ongeldige waarde.
+    """
+    if not value:
+        return None
+    bound = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        bound += timedelta(days=1)
+    return bound
+
+
+def audit_log_query(company_ids=None, since=None, until=None):
+    """
+    (bedrijfsnaam, source_name, source_url, retrieved_at) per audit log,
+    nieuwste eerst; since inclusief, until exclusief.
+    """
+    query = (
+        db.session.query(Company.name, AuditLog.source_name, AuditLog.source_url, AuditLog.retrieved_at)
+        .outerjoin(Company, Company.company_id == AuditLog.company_id)
+    )
+    if company_ids is not None:
+        query = query.filter(AuditLog.company_id.in_(company_ids))
+    if since is not None:
+        query = query.filter(AuditLog.retrieved_at >= since)
+    if until is not None:
+        query = query.filter(AuditLog.retrieved_at < until)
+    return query.order_by(AuditLog.retrieved_at.desc(), AuditLog.log_id.desc())
+
+
+def _rows(query):
+    for company_name, source_name, source_url, retrieved_at in query.yield_per(AUDIT_EXPORT_BATCH):
+        yield (company_name or "Onbekend", source_name, source_url,
+               retrieved_at.isoformat() if retrieved_at else None)
+
+
+def _record(row):
+    company, source_name, source_url, retrieved_at = row
+    return {
+        "company": company,
+        "source_name": source_name,
+        "source_url": source_url,
+        "retrieved_at": retrieved_at,
+    }
+
+
+def _csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for company, source_name, source_url, retrieved_at in rows:
+        writer.writerow([company, source_name, source_url, retrieved_at or ""])
+        if buffer.tell() >= AUDIT_EXPORT_CHUNK:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _json_chunks(rows):
+    parts = ["["]
+    size = 1
+    first = True
+    for row in rows:
+        part = ("" if first else ",") + json.dumps(_record(row))
+        first = False
+        parts.append(part)
+        size += len(part)
+        if size >= AUDIT_EXPORT_CHUNK:
+            yield "".join(parts)
+            parts, size = [], 0
+    parts.append("]")
+    yield "".join(parts)
+
+
+def _ndjson_chunks(rows):
+    parts = []
+    size = 0
+    for row in rows:
+        part = json.dumps(_record(row)) + "\n"
+        parts.append(part)
+        size += len(part)
+        if size >= AUDIT_EXPORT_CHUNK:
+            yield "".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts)
+
+
+_WRITERS = {"csv": _csv_chunks, "json": _json_chunks, "ndjson": _ndjson_chunks}
+
+
+def audit_export_chunks(query, fmt):
+    """Export in het gevraagde formaat als generator van UTF-8 blokken."""
+    for chunk in _WRITERS[fmt](_rows(query)):
+        if chunk:
+            yield chunk.encode("utf-8")
+
+
+def gzip_chunks(chunks):
+    """Comprimeert een stroom bytes-blokken tot één gzip-stroom."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,443 @@
+# cache.py
+#
+# Caches die onder gunicorn tussen de workers gedeeld worden, zonder externe
+# dienst (geen Redis/memcached):
+#   - LRUCache: begrensde LRU per proces (laag 1), optioneel met TTL
+#   - SqliteCache: gedeelde laag op schijf (één SQLite-bestand in WAL-modus,
+#     dus gelijktijdige lezers blokkeren niet), met TTL en een maximumgrootte
+#     in bytes; bij overschrijding verdwijnen de minst recent gebruikte items
+#   - TieredCache: LRU vóór de gedeelde laag; een hit uit de gedeelde laag
+#     komt in de LRU van dit proces terecht
+#
+# Invalidatie tussen workers: een worker die een bedrijf wijzigt, verwijdert
+# de gedeelde items zelf, maar de LRU's (en andere caches per proces, zoals de
+# features van similarity.py) van de andere workers weten daar niets van.
+# Daarvoor dient de teller "change_seq" in app_counter (zie app/changes.py):
+# die stijgt bij elke commit die een bedrijf wijzigt of verwijdert.
+# sync_cache_version() leest de teller (hoogstens om de CACHE_SYNC_INTERVAL
+# seconden) en roept bij een nieuwe waarde de listeners van on_company_change
+# op voor elk bedrijf met een hoger change_seq of een tombstone.
+#
+# Het bestand staat standaard in <instance-map>/cache (mode 0700) en krijgt zelf
+# mode 0600 na een eigenaarscontrole (zie app/private_files.py): fragmenten
+# komen als vertrouwde HTML terug in de pagina, dus niemand anders mag het
+# bestand kunnen lezen of vooraf aanmaken en vullen. Waarden worden als JSON
+# bewaard (geen pickle).
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from app import db
+from app.models import AppCounter, ChangeTombstone, Company
+from app.private_files import ensure_private_dir, ensure_private_file
+
+# Laatste gebruik van een item in de gedeelde laag wordt hoogstens zo vaak
+# (seconden) bijgewerkt: een hit hoeft dan meestal niet te schrijven
+ACCESS_RESOLUTION = 30.0
+
+# Eén listener-oproep met None (alles) i.p.v. per bedrijf boven dit aantal
+CACHE_SYNC_MAX_IDS = 1000
+
+
+class LRUCache:
+    """Begrensde LRU (thread-safe) met tellers voor hits, misses en verdringingen."""
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires_at, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete_prefix(self, prefix):
+        """Verwijdert alle sleutels die met prefix beginnen ("" = alles); retourneert het aantal."""
+        with self._lock:
+            keys = [key for key in self._data if key.startswith(prefix)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class SqliteCache:
+    """
+    Gedeelde cache in één SQLite-bestand (WAL). Elke thread van elk proces
+    opent een eigen connectie; na een fork wordt opnieuw verbonden.
+    Fouten (bv. een vergrendelde database, of een bestand van een andere
+    gebruiker) gelden als miss: de cache mag een aanvraag nooit laten mislukken.
+    Het totaal aantal bytes staat in cache_meta en wordt door triggers
+    bijgehouden, zodat een set() niet over de hele tabel moet sommeren.
+    """
+
+    def __init__(self, path, max_bytes, ttl=None, timeout=2.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.timeout = timeout
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.evictions = 0
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Eigen bestand met mode 0600; WAL/SHM krijgen van SQLite dezelfde rechten,
+        # maar mogen dan ook niet vooraf door iemand anders aangemaakt zijn
+        ensure_private_file(self.path)
+        for suffix in ("-wal", "-shm"):
+            if os.path.lexists(self.path + suffix):
+                ensure_private_file(self.path + suffix)
+
+        # Autocommit: elke opdracht is een eigen, korte transactie
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entry ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_cache_entry_accessed ON cache_entry (accessed_at)")
+            # Lopend totaal van size; bij een bestaand bestand zonder cache_meta één keer geteld
+            connection.execute("CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            connection.execute(
+                "INSERT OR IGNORE INTO cache_meta (name, value)"
+                " SELECT 'bytes', COALESCE(SUM(size), 0) FROM cache_entry"
+            )
+            connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_entry_bytes_insert AFTER INSERT ON cache_entry"
+                " BEGIN UPDATE cache_meta SET value = value + new.size WHERE name = 'bytes'; END"
+            )
+            connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_entry_bytes_delete AFTER DELETE ON cache_entry"
+                " BEGIN UPDATE cache_meta SET value = value - old.size WHERE name = 'bytes'; END"
+            )
+            connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS cache_entry_bytes_update AFTER UPDATE OF size ON cache_entry"
+                " BEGIN UPDATE cache_meta SET value = value + new.size - old.size WHERE name = 'bytes'; END"
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        now = time.time()
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                "SELECT value, expires_at FROM cache_entry WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] is not None and row[1] <= now:
+                connection.execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            connection.execute(
+                "UPDATE cache_entry SET accessed_at = ? WHERE key = ? AND accessed_at < ?",
+                (now, key, now - ACCESS_RESOLUTION),
+            )
+        except (sqlite3.Error, OSError):
+            self.errors += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        raw = json.dumps(value, separators=(",", ":"))
+        size = len(key) + len(raw.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        try:
+            connection = self._connection()
+            # Upsert i.p.v. INSERT OR REPLACE: de impliciete delete van REPLACE
+            # vuurt geen triggers af, een UPDATE wel (lopend totaal in cache_meta)
+            connection.execute(
+                "INSERT INTO cache_entry (key, value, size, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size,"
+                " expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+                (key, raw, size, now + ttl if ttl else None, now),
+            )
+            self._evict(connection, now)
+        except (sqlite3.Error, OSError):
+            self.errors += 1
+
+    def _evict(self, connection, now):
+        total = connection.execute("SELECT value FROM cache_meta WHERE name = 'bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Eerst verlopen items, dan de minst recent gebruikte tot 90% van het maximum
+        removed = connection.execute(
+            "DELETE FROM cache_entry WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        ).rowcount
+        removed += connection.execute(
+            "DELETE FROM cache_entry WHERE key IN ("
+            " SELECT key FROM ("
+            "  SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS running FROM cache_entry"
+            " ) WHERE running > ?)",
+            (int(self.max_bytes * 0.9),),
+        ).rowcount
+        self.evictions += removed
+
+    def delete_prefix(self, prefix):
+        """Verwijdert alle sleutels die met prefix beginnen ("" = alles)."""
+        try:
+            connection = self._connection()
+            if prefix:
+                # Bereik i.p.v. LIKE: gebruikt de primaire sleutel en kent geen jokertekens
+                connection.execute(
+                    "DELETE FROM cache_entry WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff")
+                )
+            else:
+                connection.execute("DELETE FROM cache_entry")
+        except (sqlite3.Error, OSError):
+            self.errors += 1
+
+    def stats(self):
+        entries = size = None
+        try:
+            entries, size = self._connection().execute(
+                "SELECT (SELECT COUNT(*) FROM cache_entry), (SELECT value FROM cache_meta WHERE name = 'bytes')"
+            ).fetchone()
+        except (sqlite3.Error, OSError):
+            self.errors += 1
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class TieredCache:
+    """
+    LRU per proces vóór een (optionele) gedeelde laag. Sleutels in de gedeelde
+    laag krijgen "<namespace>:" ervoor, zodat meerdere caches één bestand delen.
+    """
+
+    def __init__(self, namespace, maxsize, shared=None, ttl=None):
+        self.namespace = namespace
+        self.local = LRUCache(maxsize, ttl=ttl)
+        self.shared = shared
+        self.ttl = ttl
+
+    def _shared_key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def lookup(self, key):
+        """(waarde, "local" / "shared") of (None, None) bij een miss."""
+        value = self.local.get(key)
+        if value is not None:
+            return value, "local"
+        if self.shared is not None:
+            value = self.shared.get(self._shared_key(key))
+            if value is not None:
+                self.local.set(key, value)
+                return value, "shared"
+        return None, None
+
+    def get(self, key):
+        return self.lookup(key)[0]
+
+    def set(self, key, value, ttl=None):
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), value, ttl if ttl is not None else self.ttl)
+
+    def delete_prefix(self, prefix, local_only=False):
+        """
+        Verwijdert sleutels met dit prefix uit de LRU en (tenzij local_only) uit
+        de gedeelde laag; retourneert het aantal verwijderd uit de LRU.
+        """
+        removed = self.local.delete_prefix(prefix)
+        if self.shared is not None and not local_only:
+            self.shared.delete_prefix(self._shared_key(prefix))
+        return removed
+
+    def stats(self):
+        return {
+            "local": self.local.stats(),
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
+
+
+_shared = None
+
+
+def shared_cache():
+    """
+    De gedeelde laag van deze deployment (SHARED_CACHE_PATH), of None als die
+    uitgeschakeld is (lege SHARED_CACHE_PATH: enkel caches per proces).
+    Niet ingesteld (None): <instance-map>/cache/shared.sqlite3, in een map met mode 0700.
+    """
+    global _shared
+    path = current_app.config["SHARED_CACHE_PATH"]
+    if path is None:
+        path = os.path.join(ensure_private_dir(os.path.join(current_app.instance_path, "cache")),
+                            "shared.sqlite3")
+    if not path:
+        return None
+    if _shared is None or _shared.path != path:
+        _shared = SqliteCache(
+            path,
+            max_bytes=current_app.config["SHARED_CACHE_MAX_BYTES"],
+            ttl=current_app.config["SHARED_CACHE_TTL"],
+        )
+    return _shared
+
+
+# -----------------------------
+# Invalidatie tussen workers
+# -----------------------------
+
+_listeners = []
+_sync_lock = threading.Lock()
+_seen_version = None
+_last_sync = 0.0
+_sync_stats = {"checks": 0, "broadcasts": 0, "companies": 0}
+
+
+def on_company_change(listener):
+    """
+    Registreert listener(company_id) voor caches per proces: wordt opgeroepen
+    voor elk bedrijf dat sinds de vorige controle (ook in een andere worker)
+    gewijzigd of verwijderd werd, of met None als alles weg moet.
+    """
+    _listeners.append(listener)
+    return listener
+
+
+def _changed_company_ids(since):
+    """Bedrijven met change_seq > since (gewijzigd of verwijderd), of None als het er te veel zijn."""
+    changed = {
+        company_id for (company_id,) in
+        db.session.query(Company.company_id)
+        .filter(Company.change_seq > since)
+        .limit(CACHE_SYNC_MAX_IDS + 1)
+    }
+    changed.update(
+        row_id for (row_id,) in
+        db.session.query(ChangeTombstone.row_id)
+        .filter(ChangeTombstone.change_seq > since, ChangeTombstone.table_name == "company")
+        .limit(CACHE_SYNC_MAX_IDS + 1)
+    )
+    return None if len(changed) > CACHE_SYNC_MAX_IDS else changed
+
+
+def sync_cache_version(force=False):
+    """
+    Vergelijkt de teller change_seq met de laatst geziene waarde en verwittigt
+    de listeners bij wijzigingen. Leest de database hoogstens om de
+    CACHE_SYNC_INTERVAL seconden (tenzij force).
+    """
+    global _seen_version, _last_sync
+    now = time.monotonic()
+    if not force and now - _last_sync < current_app.config["CACHE_SYNC_INTERVAL"]:
+        return
+    if not _sync_lock.acquire(blocking=False):
+        return  # een andere thread van dit proces is al bezig
+    try:
+        _last_sync = now
+        _sync_stats["checks"] += 1
+        version = db.session.execute(
+            db.select(AppCounter.value).where(AppCounter.name == "change_seq")
+        ).scalar() or 0
+        if _seen_version is None:
+            # Eerste controle van dit proces: de caches zijn nog leeg
+            _seen_version = version
+            return
+        if version == _seen_version:
+            return
+        # Een lagere waarde (teller teruggezet, bv. nieuwe database): alles vergeten
+        company_ids = _changed_company_ids(_seen_version) if version > _seen_version else None
+
+        if company_ids is None:
+            for listener in _listeners:
+                listener(None)
+        else:
+            for company_id in company_ids:
+                for listener in _listeners:
+                    listener(company_id)
+        _sync_stats["broadcasts"] += 1
+        _sync_stats["companies"] += len(company_ids) if company_ids is not None else 0
+        _seen_version = version
+    finally:
+        _sync_lock.release()
+
+
+def cache_sync_stats():
+    return dict(_sync_stats, seen_version=_seen_version, listeners=len(_listeners))
@@ -0,0 +1,209 @@
+# changes.py
+#
+# Change data capture voor company, metric en metric_history.
+# Elke rij die in een transactie toegevoegd of gewijzigd wordt, krijgt bij de
+# commit een oplopend volgnummer (change_seq) uit de teller "change_seq" in
+# app_counter; verwijderde rijen krijgen een tombstone met een eigen
+# volgnummer. /api/changes?since=<seq> geeft dan enkel wat na dat nummer
+# veranderde, zodat BI-syncs niet telkens alles opnieuw moeten exporteren.
+#
+# De volgnummers worden pas in before_commit uitgedeeld: de tellerrij blijft
+# vergrendeld tot de commit, dus een lezer die volgnummer N ziet, ziet ook
+# alle kleinere. Tijdens lange transacties (wekelijkse refresh) wordt de
+# teller zo niet minutenlang vastgehouden.
+#
+# Wijzigingen buiten de ORM (bulk Query.update/delete, SQL in Supabase) krijgen
+# geen volgnummer; `flask backfill-change-seq` nummert rijen zonder change_seq.
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import bindparam, event, inspect, insert, update
+from sqlalchemy.orm import Session
+
+from app import db
+from app.counters import allocate_counter
+from app.load_profiles import LIST_COLUMNS
+from app.models import ChangeTombstone, Company, Metric, MetricHistory
+
+CHANGE_SEQ = "change_seq"
+
+CHANGES_PAGE_SIZE = 500
+CHANGES_PAGE_MAX = 5000
+
+TRACKED_TABLES = {
+    Company: "company",
+    Metric: "metric",
+    MetricHistory: "metric_history",
+}
+
+# Compacte kolommen per tabel in de feed (geen zware tekst/JSON-velden van Company)
+_FEED_COLUMNS = {
+    Company: LIST_COLUMNS + (Company.created_at, Company.updated_at),
+    Metric: (Metric.metric_id, Metric.company_id, Metric.name, Metric.description,
+             Metric.tracking_frequency, Metric.value, Metric.active, Metric.last_updated,
+             Metric.updated_at),
+    MetricHistory: (MetricHistory.id, MetricHistory.company_id, MetricHistory.name,
+                    MetricHistory.value, MetricHistory.recorded_at, MetricHistory.source,
+                    MetricHistory.updated_at),
+}
+
+# Sleutels in session.info: {(model, id): True} in volgorde van wijziging
+_CHANGED = "cdc_changed"
+_DELETED = "cdc_deleted"
+
+
+def _row_id(obj):
+    return inspect(obj).mapper.primary_key_from_instance(obj)[0]
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    # session.new / dirty / deleted bevatten hier nog de toestand van vóór de flush
+    changed = session.info.setdefault(_CHANGED, {})
+    deleted = session.info.setdefault(_DELETED, {})
+
+    for obj in session.new:
+        if type(obj) in TRACKED_TABLES:
+            changed[(type(obj), _row_id(obj))] = True
+    for obj in session.dirty:
+        if type(obj) in TRACKED_TABLES and session.is_modified(obj, include_collections=False):
+            changed[(type(obj), _row_id(obj))] = True
+    for obj in session.deleted:
+        if type(obj) in TRACKED_TABLES:
+            key = (type(obj), _row_id(obj))
+            changed.pop(key, None)
+            deleted[key] = True
+
+
+@event.listens_for(Session, "before_commit")
+def _assign_change_seq(session):
+    session.flush()
+    changed = session.info.pop(_CHANGED, None) or {}
+    deleted = session.info.pop(_DELETED, None) or {}
+    total = len(changed) + len(deleted)
+    if not total:
+        return
+
+    connection = session.connection()
+    seq = allocate_counter(connection, CHANGE_SEQ, total) - total + 1
+
+    per_model = defaultdict(list)
+    for model, row_id in changed:
+        per_model[model].append({"row_id": row_id, "seq": seq})
+        seq += 1
+    for model, params in per_model.items():
+        pk = model.__mapper__.primary_key[0]
+        connection.execute(
+            update(model.__table__)
+            .where(pk == bindparam("row_id"))
+            .values(change_seq=bindparam("seq"), updated_at=model.__table__.c.updated_at),
+            params,
+        )
+
+    if deleted:
+        tombstones = []
+        for model, row_id in deleted:
+            tombstones.append({"change_seq": seq, "table_name": TRACKED_TABLES[model], "row_id": row_id})
+            seq += 1
+        connection.execute(insert(ChangeTombstone.__table__), tombstones)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_changes(session, transaction):
+    # Na een rollback (of close) van de buitenste transactie: niets meer te nummeren
+    if transaction.parent is None:
+        session.info.pop(_CHANGED, None)
+        session.info.pop(_DELETED, None)
+
+
+def touch_company(company):
+    """
+    Markeert een bedrijf als gewijzigd (updated_at + nieuw change_seq bij de commit),
+    ook als geen enkele kolom van het bedrijf zelf veranderde, bv. een scrape
+    die enkel metrics, historiek of events toevoegde. ETags en gecachte
+    rapporten van dit bedrijf vervallen daardoor.
+    """
+    # Python-waarde i.p.v. func.now(): een SQL-expressie wordt tijdens de flush
+    # al vervallen verklaard en zou in after_flush niet meer als wijziging tellen
+    company.updated_at = datetime.now(timezone.utc)
+
+
+# -----------------------------
+# Feed
+# -----------------------------
+
+def _jsonable(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def change_page(since=0, limit=CHANGES_PAGE_SIZE):
+    """
+    Wijzigingen met change_seq > since, oplopend.
+    Retourneert (changes, next_since, has_more); changes zijn dicts
+    {seq, table, op ("upsert" / "delete"), id, data}.
+    """
+    limit = max(1, min(CHANGES_PAGE_MAX, limit))
+    entries = []
+
+    for model, table in TRACKED_TABLES.items():
+        columns = _FEED_COLUMNS[model]
+        pk = model.__mapper__.primary_key[0]
+        rows = (
+            db.session.query(model.change_seq, *columns)
+            .filter(model.change_seq > since)
+            .order_by(model.change_seq)
+            .limit(limit + 1)
+            .all()
+        )
+        for row in rows:
+            data = {col.key: _jsonable(value) for col, value in zip(columns, row[1:])}
+            entries.append({"seq": row[0], "table": table, "op": "upsert",
+                            "id": data[pk.key], "data": data})
+
+    tombstones = (
+        db.session.query(ChangeTombstone.change_seq, ChangeTombstone.table_name, ChangeTombstone.row_id)
+        .filter(ChangeTombstone.change_seq > since)
+        .order_by(ChangeTombstone.change_seq)
+        .limit(limit + 1)
+        .all()
+    )
+    for seq, table, row_id in tombstones:
+        entries.append({"seq": seq, "table": table, "op": "delete", "id": row_id, "data": None})
+
+    entries.sort(key=lambda e: e["seq"])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    next_since = entries[-1]["seq"] if entries else since
+    return entries, next_since, has_more
+
+
+def backfill_change_seq():
+    """
+    Geeft rijen zonder change_seq (van vóór de change-feed, of gewijzigd buiten
+    de ORM) een volgnummer, in volgorde van hun id. Retourneert {tabel: aantal}.
+    """
+    counts = {}
+    for model, table in TRACKED_TABLES.items():
+        pk = model.__mapper__.primary_key[0]
+        ids = [row_id for (row_id,) in
+               db.session.query(pk).filter(model.change_seq.is_(None)).order_by(pk)]
+        counts[table] = len(ids)
+        if not ids:
+            continue
+
+        connection = db.session.connection()
+        first = allocate_counter(connection, CHANGE_SEQ, len(ids)) - len(ids) + 1
+        connection.execute(
+            update(model.__table__)
+            .where(pk == bindparam("row_id"))
+            .values(change_seq=bindparam("seq"), updated_at=model.__table__.c.updated_at),
+            [{"row_id": row_id, "seq": first + i} for i, row_id in enumerate(ids)],
+        )
+    db.session.commit()
+    return counts
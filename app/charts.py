@@ -0,0 +1,72 @@
+# charts.py
+#
+# Downsampling van tijdreeksen voor grafieken met
+# Largest-Triangle-Three-Buckets (LTTB, Steinarsson 2013).
+# LTTB behoudt de visuele vorm (pieken en dalen) veel beter dan
+# "elk n-de punt" en levert exact max_points punten op.
+
+import numpy as np
+
+
+def lttb_indices(x, y, max_points: int):
+    """
+    Geeft de indices van de punten die LTTB behoudt.
+    x moet oplopend zijn; eerste en laatste punt blijven altijd behouden.
+
+    De keuze per bucket hangt af van het vorige gekozen punt (sequentieel),
+    maar de gemiddelden van alle buckets en de driehoeksoppervlakken binnen
+    een bucket worden gevectoriseerd met NumPy berekend.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    # Bucketgrenzen voor de max_points - 2 middelste buckets
+    every = (n - 2) / (max_points - 2)
+    edges = np.floor(np.arange(max_points - 1) * every).astype(int) + 1
+
+    # Gemiddelde (x, y) per bucket via cumulatieve sommen,
+    # plus het laatste punt als "volgende bucket" van de laatste bucket
+    cs_x = np.concatenate(([0.0], np.cumsum(x)))
+    cs_y = np.concatenate(([0.0], np.cumsum(y)))
+    counts = np.diff(edges)
+    avg_x = np.append((cs_x[edges[1:]] - cs_x[edges[:-1]]) / counts, x[-1])
+    avg_y = np.append((cs_y[edges[1:]] - cs_y[edges[:-1]]) / counts, y[-1])
+
+    selected = np.empty(max_points, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        cx, cy = avg_x[i + 1], avg_y[i + 1]
+
+        # Dubbele driehoeksoppervlakte (a, b, c) voor alle b in de bucket
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def downsample_columns(timestamps, values, max_points: int):
+    """
+    Downsampelt kolommen (epoch-seconden, waarden) tot max_points punten.
+    Punten zonder waarde (NaN) worden overgeslagen.
+    Retourneert (timestamps, values) als NumPy-arrays.
+    """
+    timestamps = np.asarray(timestamps, dtype=float)
+    values = np.asarray(values, dtype=float)
+
+    keep = ~np.isnan(values)
+    timestamps, values = timestamps[keep], values[keep]
+    if not len(values):
+        return timestamps, values
+
+    idx = lttb_indices(timestamps, values, max_points)
+    return timestamps[idx], values[idx]
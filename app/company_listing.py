@@ -0,0 +1,89 @@
+# company_listing.py
+#
+# Bedrijvenlijst met keyset (cursor) paginering op (name, company_id).
+# In plaats van OFFSET (dat alle vorige rijen opnieuw leest) onthoudt de cursor
+# de laatste (naam, id) van een pagina; de volgende pagina begint daar via de
+# index ix_company_name_id. Er worden enkel de lijstkolommen geladen, niet de
+# grote tekst- en JSON-velden (ai_summary, product_description, ...).
+
+import base64
+import json
+
+from app import db
+from app.load_profiles import company_options
+from app.models import Company, Sector
+
+COMPANY_PAGE_SIZE = 50
+COMPANY_PAGE_MAX = 200
+
+
+def encode_cursor(name, company_id):
+    """Opake cursor (base64url JSON) voor de positie (name, company_id)."""
+    raw = json.dumps([name, company_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(name, company_id) uit een cursor; ValueError bij een ongeldige cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        name, company_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return str(name), int(company_id)
+    except Exception as e:
+        raise ValueError("Ongeldige cursor") from e
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def company_page(after=None, before=None, limit=COMPANY_PAGE_SIZE, name_filter=None, sector_id=None):
+    """
+    Eén pagina bedrijven gesorteerd op (name, company_id).
+    after / before: cursor van de laatste / eerste rij van de vorige pagina.
+    Retourneert (rows, prev_cursor, next_cursor) met rows = [(Company, sector_name), ...];
+    Company bevat enkel de kolommen van het laadprofiel "list".
+    """
+    limit = max(1, min(COMPANY_PAGE_MAX, limit))
+    key = db.tuple_(Company.name, Company.company_id)
+
+    query = (
+        db.session.query(Company, Sector.name)
+        .options(*company_options("list"))
+        .outerjoin(Sector, Sector.sector_id == Company.sector_id)
+    )
+    if sector_id:
+        query = query.filter(Company.sector_id == sector_id)
+    if name_filter:
+        query = query.filter(Company.name.ilike(f"%{_escape_like(name_filter)}%", escape="\\"))
+
+    backwards = before is not None and after is None
+    if after is not None:
+        query = query.filter(key > decode_cursor(after))
+    elif backwards:
+        query = query.filter(key < decode_cursor(before))
+
+    if backwards:
+        query = query.order_by(Company.name.desc(), Company.company_id.desc())
+    else:
+        query = query.order_by(Company.name.asc(), Company.company_id.asc())
+
+    # Eén rij extra ophalen om te weten of er nog een pagina volgt
+    rows = query.limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return [], None, None
+
+    first, last = rows[0][0], rows[-1][0]
+    if backwards:
+        prev_cursor = encode_cursor(first.name, first.company_id) if more else None
+        next_cursor = encode_cursor(last.name, last.company_id)
+    else:
+        prev_cursor = encode_cursor(first.name, first.company_id) if after is not None else None
+        next_cursor = encode_cursor(last.name, last.company_id) if more else None
+
+    return rows, prev_cursor, next_cursor
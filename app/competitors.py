@@ -0,0 +1,432 @@
+# competitors.py
+#
+# Competitor-namen uit Company.competitors (JSON) genormaliseerd in een eigen
+# tabel (competitor_name), bijgewerkt telkens een bedrijf geschreven wordt.
+# Het dashboard haalt de distincte, gesorteerde lijst dan met één
+# geïndexeerde query op in plaats van alle bedrijven in Python te overlopen.
+#
+# Dezelfde rijen vormen ook de competitor-graaf: elke naam wordt (indien
+# mogelijk) opgelost naar een gevolgd bedrijf via een voorberekende index van
+# genormaliseerde bedrijfsnamen en domeinen (target_company_id). Graafvragen
+# (in-edges, out-edges, k-hop) lezen dan enkel geïndexeerde kolommen.
+
+import difflib
+import math
+import re
+import unicodedata
+from urllib.parse import urlparse
+
+from app import db
+from app.models import Company, CompetitorName
+
+# Aantal competitors per pagina op het dashboard
+COMPETITOR_PAGE_SIZE = 100
+
+_NIET_ALFANUMERIEK = re.compile(r"[^\w]+")
+
+# "adidas.com", "www.notion.so"
+_DOMEIN = re.compile(r"^(?:www\.)?[a-z0-9-]+(?:\.[a-z0-9-]+)+$")
+
+# Scheidingstekens in gescrapete titels: "Spotify - Web Player: Music for everyone"
+_TITEL_SCHEIDING = re.compile(r"\s[-–|:]\s|[|:]|\.\s")
+
+# Minimale difflib-ratio voor een fuzzy naammatch
+FUZZY_CUTOFF = 0.88
+
+# Maximum aantal knopen in een k-hop antwoord
+GRAPH_MAX_NODES = 500
+
+
+def normalize_competitor_name(name):
+    """
+    Vergelijkbare vorm van een naam: unicode-genormaliseerd, lowercase,
+    leestekens → spatie, witruimte samengevoegd ("Under-Armour " → "under armour").
+    """
+    name = unicodedata.normalize("NFKC", name).casefold()
+    return " ".join(_NIET_ALFANUMERIEK.sub(" ", name).split())
+
+
+def company_domain(website_url):
+    """Host zonder www. ("https://www.nike.com/be" → "nike.com"), of None."""
+    if not website_url:
+        return None
+    url = website_url.strip().lower()
+    if not url.startswith(("http://", "https://")):
+        url = "https://" + url
+    host = urlparse(url).hostname or ""
+    if host.startswith("www."):
+        host = host[4:]
+    return host or None
+
+
+def _trigrams(key):
+    """Verzameling trigrammen van " key " (evenveel trigrammen als tekens)."""
+    padded = f" {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _max_lost_trigrams(length, cutoff):
+    """
+    Bovengrens op het aantal trigrammen van een sleutel met deze lengte dat
+    verdwijnt in een naam met difflib-ratio >= cutoff. Met L gemeenschappelijke
+    tekens kost elk verwijderd teken hoogstens 3 trigrammen en elke invoeging
+    hoogstens 2: verlies <= 3(la - L) + 2(lb - L), met L >= cutoff * (la + lb) / 2
+    en lb >= la * cutoff / (2 - cutoff) (anders haalt de ratio de cutoff niet).
+    """
+    shortest = length * cutoff / (2 - cutoff)
+    worst = max(
+        3 * length + 2 * lb - 2.5 * cutoff * (length + lb)
+        for lb in (shortest, length * (2 - cutoff) / cutoff)
+    )
+    return max(0, math.floor(worst + 1e-9))
+
+
+class CompanyNameIndex:
+    """
+    Voorberekende index van gevolgde bedrijven op genormaliseerde naam en domein.
+    Sleutels per bedrijf (met matchscore):
+      - domein ("nike.com")                          1.0
+      - volledige genormaliseerde naam               1.0
+      - eerste deel van de titel ("spotify")         0.95
+      - domeinlabel ("nike")                         0.95
+    Bij dezelfde sleutel voor meerdere bedrijven wint de hoogste score, dan het laagste id.
+
+    Fuzzy matching (difflib, FUZZY_CUTOFF) vergelijkt enkel sleutels die genoeg
+    trigrammen delen met de gezochte naam: een sleutel met ratio >= cutoff deelt
+    er minstens t, dus zeker één van de (n - t + 1) zeldzaamste trigrammen van
+    de naam. Enkel de sleutels onder die trigrammen worden bekeken, met
+    hetzelfde resultaat als difflib.get_close_matches over alle sleutels.
+    """
+
+    def __init__(self, rows):
+        self._domains = {}
+        self._names = {}
+        for company_id, name, website_url in sorted(rows, key=lambda r: r[0]):
+            domain = company_domain(website_url)
+            if domain:
+                self._put(self._domains, domain, company_id, 1.0)
+                self._put(self._names, normalize_competitor_name(domain.split(".")[0]), company_id, 0.95)
+            if name:
+                self._put(self._names, normalize_competitor_name(name), company_id, 1.0)
+                short = _TITEL_SCHEIDING.split(name, maxsplit=1)[0]
+                self._put(self._names, normalize_competitor_name(short), company_id, 0.95)
+        self._name_keys = list(self._names)
+
+        self._key_trigrams = {}   # sleutel -> frozenset(trigrammen)
+        self._trigram_keys = {}   # trigram -> [sleutels]
+        for key in self._name_keys:
+            trigrams = self._key_trigrams[key] = _trigrams(key)
+            for trigram in trigrams:
+                self._trigram_keys.setdefault(trigram, []).append(key)
+
+    @staticmethod
+    def _put(target, key, company_id, score):
+        if not key:
+            return
+        current = target.get(key)
+        if current is None or score > current[1]:
+            target[key] = (company_id, score)
+
+    def __len__(self):
+        return len(self._name_keys)
+
+    def resolve(self, competitor_name, exclude_id=None):
+        """
+        (company_id, score) van het best passende gevolgde bedrijf, of None.
+        Een bedrijf wordt nooit naar zichzelf opgelost (exclude_id).
+        """
+        raw = competitor_name.strip().lower()
+        match = None
+        if _DOMEIN.match(raw):
+            match = self._domains.get(raw[4:] if raw.startswith("www.") else raw)
+
+        normalized = normalize_competitor_name(competitor_name)
+        if match is None:
+            match = self._names.get(normalized)
+
+        if match is None and normalized:
+            close = self._closest(normalized)
+            if close is not None:
+                key, ratio = close
+                company_id, score = self._names[key]
+                match = (company_id, round(min(score, ratio), 4))
+
+        if match is None or match[0] == exclude_id:
+            return None
+        return match
+
+    def fuzzy_candidates(self, normalized, cutoff=FUZZY_CUTOFF):
+        """Sleutels die genoeg trigrammen delen met normalized om ratio >= cutoff te kunnen halen."""
+        trigrams = _trigrams(normalized)
+        needed = len(trigrams) - _max_lost_trigrams(len(normalized), cutoff)
+        if needed <= 0:
+            return list(self._name_keys)
+
+        # Zeldzaamste trigrammen eerst: een geldige sleutel deelt er minstens één
+        probe = sorted(trigrams, key=lambda t: len(self._trigram_keys.get(t, ())))
+        keys = set()
+        for trigram in probe[:len(trigrams) - needed + 1]:
+            keys.update(self._trigram_keys.get(trigram, ()))
+        return [key for key in keys if len(trigrams & self._key_trigrams[key]) >= needed]
+
+    def _closest(self, normalized, cutoff=FUZZY_CUTOFF):
+        """(sleutel, ratio) zoals difflib.get_close_matches(n=1), maar enkel over de kandidaten."""
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(normalized)
+        best = None
+        for key in self.fuzzy_candidates(normalized, cutoff):
+            matcher.set_seq1(key)
+            if matcher.real_quick_ratio() < cutoff or matcher.quick_ratio() < cutoff:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= cutoff and (best is None or (ratio, key) > best):
+                best = (ratio, key)
+        return None if best is None else (best[1], best[0])
+
+
+def company_name_index():
+    """CompanyNameIndex over alle bedrijven (één query op id, naam en url)."""
+    return CompanyNameIndex(
+        db.session.query(Company.company_id, Company.name, Company.website_url).all()
+    )
+
+
+def competitor_names(competitors):
+    """
+    Namen uit de competitors-JSON van een bedrijf: strings, of dicts met
+    'name' / 'company_name'. Lege of onbruikbare items worden overgeslagen.
+    """
+    names = []
+    for c in competitors or []:
+        if isinstance(c, dict):
+            name = c.get("name") or c.get("company_name") or ""
+        elif isinstance(c, str):
+            name = c
+        else:
+            continue
+        name = name.strip() if isinstance(name, str) else ""
+        if name:
+            names.append(name)
+    return names
+
+
+def _competitor_rows(company_id, competitors, name_index):
+    rows = {}
+    for name in competitor_names(competitors):
+        normalized = normalize_competitor_name(name)
+        if not normalized or normalized in rows:
+            continue
+        match = name_index.resolve(name, exclude_id=company_id)
+        rows[normalized] = CompetitorName(
+            company_id=company_id,
+            competitor_name=name,
+            normalized_name=normalized,
+            target_company_id=match[0] if match else None,
+            match_score=match[1] if match else None,
+        )
+    return list(rows.values())
+
+
+def sync_company_competitors(company, name_index=None):
+    """
+    Zet de competitor_name rijen (out-edges) van één bedrijf gelijk aan
+    company.competitors, lost de namen die al naar dit bedrijf wezen opnieuw op
+    (na een hernoeming kunnen ze niet meer passen) en koppelt bestaande, nog
+    niet opgeloste namen van andere bedrijven aan dit bedrijf (in-edges).
+    Het bedrijf moet al een company_id hebben (flush). Commit gebeurt door de aanroeper.
+    """
+    if name_index is None:
+        name_index = company_name_index()
+
+    CompetitorName.query.filter_by(company_id=company.company_id).delete(synchronize_session=False)
+    db.session.add_all(_competitor_rows(company.company_id, company.competitors, name_index))
+    reresolve_in_edges(company, name_index)
+    link_unresolved_competitors(company)
+
+
+def reresolve_in_edges(company, name_index):
+    """
+    Lost de namen van andere bedrijven die naar dit bedrijf wijzen opnieuw op
+    met de actuele naamindex; ze kunnen nu naar een ander of geen bedrijf wijzen.
+    Retourneert het aantal gewijzigde rijen.
+    """
+    changed = 0
+    rows = CompetitorName.query.filter(CompetitorName.target_company_id == company.company_id,
+                                       CompetitorName.company_id != company.company_id)
+    for row in rows:
+        match = name_index.resolve(row.competitor_name, exclude_id=row.company_id)
+        target_company_id, match_score = match if match else (None, None)
+        if (target_company_id, match_score) != (row.target_company_id, row.match_score):
+            row.target_company_id = target_company_id
+            row.match_score = match_score
+            changed += 1
+    return changed
+
+
+def link_unresolved_competitors(company):
+    """
+    Lost namen zonder target op naar dit (nieuwe of hernoemde) bedrijf,
+    als ze ermee overeenkomen. Enkel distincte, onopgeloste namen worden bekeken.
+    """
+    own_index = CompanyNameIndex([(company.company_id, company.name, company.website_url)])
+
+    unresolved = (
+        db.session.query(CompetitorName.normalized_name, db.func.min(CompetitorName.competitor_name))
+        .filter(CompetitorName.target_company_id.is_(None),
+                CompetitorName.company_id != company.company_id)
+        .group_by(CompetitorName.normalized_name)
+        .all()
+    )
+    linked = 0
+    for normalized, name in unresolved:
+        match = own_index.resolve(name)
+        if match is None:
+            continue
+        linked += (
+            CompetitorName.query
+            .filter(CompetitorName.normalized_name == normalized,
+                    CompetitorName.target_company_id.is_(None),
+                    CompetitorName.company_id != company.company_id)
+            .update({"target_company_id": company.company_id, "match_score": match[1]},
+                    synchronize_session=False)
+        )
+    return linked
+
+
+def distinct_competitor_names(limit=None, offset=0):
+    """
+    Distincte competitors, gesorteerd op genormaliseerde naam.
+    Per genormaliseerde naam wordt één weergavenaam gekozen (de kleinste).
+    """
+    query = (
+        db.session.query(db.func.min(CompetitorName.competitor_name))
+        .group_by(CompetitorName.normalized_name)
+        .order_by(CompetitorName.normalized_name)
+    )
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    return [name for (name,) in query]
+
+
+def competitor_name_count():
+    """Aantal distincte (genormaliseerde) competitors."""
+    return db.session.query(db.func.count(db.distinct(CompetitorName.normalized_name))).scalar() or 0
+
+
+def rebuild_all_competitor_names():
+    """
+    Vult competitor_name opnieuw vanuit alle bedrijven (inclusief naamresolutie).
+    Retourneert het aantal rijen.
+    """
+    CompetitorName.query.delete(synchronize_session=False)
+
+    name_index = company_name_index()
+    written = 0
+    for company_id, competitors in db.session.query(Company.company_id, Company.competitors):
+        rows = _competitor_rows(company_id, competitors, name_index)
+        db.session.add_all(rows)
+        written += len(rows)
+
+    db.session.commit()
+    return written
+
+
+# -----------------------------
+# Graafvragen
+# -----------------------------
+
+def _edge(row, source_name=None, target_name=None):
+    return {
+        "source_company_id": row.company_id,
+        "source_name": source_name,
+        "competitor_name": row.competitor_name,
+        "target_company_id": row.target_company_id,
+        "target_name": target_name,
+        "match_score": row.match_score,
+    }
+
+
+def out_edges(company_id):
+    """Competitors die dit bedrijf noemt (ook onopgeloste namen)."""
+    Target = db.aliased(Company)
+    rows = (
+        db.session.query(CompetitorName, Target.name)
+        .outerjoin(Target, Target.company_id == CompetitorName.target_company_id)
+        .filter(CompetitorName.company_id == company_id)
+        .order_by(CompetitorName.normalized_name)
+        .all()
+    )
+    return [_edge(row, target_name=target_name) for row, target_name in rows]
+
+
+def in_edges(company_id):
+    """Bedrijven die dit bedrijf als competitor noemen."""
+    rows = (
+        db.session.query(CompetitorName, Company.name)
+        .join(Company, Company.company_id == CompetitorName.company_id)
+        .filter(CompetitorName.target_company_id == company_id)
+        .order_by(Company.name)
+        .all()
+    )
+    return [_edge(row, source_name=source_name) for row, source_name in rows]
+
+
+def listed_by(name):
+    """Bedrijven die een (mogelijk niet gevolgde) competitor-naam noemen."""
+    rows = (
+        db.session.query(CompetitorName, Company.name)
+        .join(Company, Company.company_id == CompetitorName.company_id)
+        .filter(CompetitorName.normalized_name == normalize_competitor_name(name))
+        .order_by(Company.name)
+        .all()
+    )
+    return [_edge(row, source_name=source_name) for row, source_name in rows]
+
+
+def competitor_neighbourhood(start_ids, k=2, direction="out", max_nodes=GRAPH_MAX_NODES):
+    """
+    Breadth-first k-hop omgeving in de competitor-graaf (enkel opgeloste edges).
+    direction: "out" (wie noemen zij), "in" (wie noemt hen) of "both".
+    Eén query per hop over de geïndexeerde kolommen company_id / target_company_id.
+    Retourneert (nodes {company_id: hop}, edges [(source, target, score)], truncated).
+    """
+    nodes = {cid: 0 for cid in start_ids}
+    edges = set()
+    frontier = set(nodes)
+    truncated = False
+
+    for hop in range(1, k + 1):
+        if not frontier:
+            break
+
+        conditions = []
+        if direction in ("out", "both"):
+            conditions.append(CompetitorName.company_id.in_(frontier))
+        if direction in ("in", "both"):
+            conditions.append(CompetitorName.target_company_id.in_(frontier))
+
+        rows = (
+            db.session.query(CompetitorName.company_id, CompetitorName.target_company_id,
+                             CompetitorName.match_score)
+            .filter(CompetitorName.target_company_id.isnot(None), db.or_(*conditions))
+            .all()
+        )
+
+        next_frontier = set()
+        for source, target, score in rows:
+            edges.add((source, target, score))
+            for cid in (source, target):
+                if cid in nodes:
+                    continue
+                if len(nodes) >= max_nodes:
+                    truncated = True
+                    continue
+                nodes[cid] = hop
+                next_frontier.add(cid)
+        frontier = next_frontier
+
+    # Enkel edges tussen teruggegeven knopen
+    edges = sorted(e for e in edges if e[0] in nodes and e[1] in nodes)
+    return nodes, edges, truncated
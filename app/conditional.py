@@ -0,0 +1,124 @@
+# conditional.py
+#
+# Conditional GETs (ETag / Last-Modified) op basis van de versie van een bedrijf.
+# Company.change_seq en updated_at (zie app/changes.py) veranderen bij elke
+# commit die het bedrijf wijzigt; de scrape- en refresh-writers raken het
+# bedrijf ook aan als enkel metrics, historiek of events veranderden
+# (touch_company). Een route kan zo met één lichte query beslissen dat de
+# client al de juiste versie heeft en meteen 304 Not Modified antwoorden,
+# vóór de zware queries (deferred kolommen, events, rapporten, reeksen).
+
+import hashlib
+import json
+import os
+from datetime import date
+
+from flask import current_app, make_response, request, session
+
+from app import db
+from app.models import AppCounter, Company, CompanySimilarity
+
+_template_token = None
+
+
+def templates_token():
+    """
+    Verandert wanneer een template verandert (nieuwe deploy), zodat een
+    HTML-ETag niet blijft matchen met een pagina in de oude opmaak.
+    """
+    global _template_token
+    if _template_token is None:
+        folder = os.path.join(current_app.root_path, current_app.template_folder)
+        stamps = []
+        for root, _dirs, files in os.walk(folder):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                stamps.append(f"{os.path.relpath(path, folder)}:{os.stat(path).st_mtime_ns}")
+        _template_token = hashlib.sha1("|".join(sorted(stamps)).encode("utf-8")).hexdigest()[:12]
+    return _template_token
+
+
+def company_version(company_id):
+    """(change_seq, updated_at) van een bedrijf, of None als het niet bestaat."""
+    row = (
+        db.session.query(Company.change_seq, Company.updated_at)
+        .filter(Company.company_id == company_id)
+        .first()
+    )
+    return tuple(row) if row else None
+
+
+def data_version():
+    """Globaal volgnummer van de change-feed (verandert bij elke wijziging aan bedrijven/metrics)."""
+    return db.session.execute(
+        db.select(AppCounter.value).where(AppCounter.name == "change_seq")
+    ).scalar()
+
+
+def make_etag(*parts):
+    """Sterke ETag (hex) uit een reeks JSON-serialiseerbare delen."""
+    raw = json.dumps(parts, separators=(",", ":"), default=str).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()
+
+
+def similar_neighbours(company_id, top_n=5):
+    """
+    De bewaarde top N buren als [(neighbour_id, score, naam), ...]: alles wat
+    de detailpagina van de vergelijkbare bedrijven toont, in één lichte query.
+    """
+    rows = (
+        db.session.query(CompanySimilarity.neighbour_id, CompanySimilarity.score, Company.name)
+        .join(Company, Company.company_id == CompanySimilarity.neighbour_id)
+        .filter(CompanySimilarity.company_id == company_id)
+        .order_by(CompanySimilarity.rank.asc())
+        .limit(top_n)
+        .all()
+    )
+    return [tuple(row) for row in rows]
+
+
+def company_detail_etag(company_id, version, neighbours):
+    """
+    ETag van de detailpagina: versie van het bedrijf, de getoonde vergelijkbare
+    bedrijven (die veranderen ook door scrapes van andere bedrijven, zie
+    similar_neighbours), de gebruiker, de templates en de dag (Google-reviews
+    worden live opgehaald).
+    """
+    return make_etag(
+        "company_detail", company_id, version[0], version[1], neighbours,
+        session.get("user_id"), templates_token(), date.today().isoformat(),
+    )
+
+
+def _last_modified_matches(last_modified):
+    since = request.if_modified_since
+    if last_modified is None or since is None:
+        return False
+    if last_modified.tzinfo is None:
+        since = since.replace(tzinfo=None)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(etag, last_modified=None):
+    """
+    304-response als de client deze versie al heeft, anders None.
+    If-None-Match gaat voor op If-Modified-Since (RFC 9110).
+    """
+    if request.if_none_match:
+        hit = request.if_none_match.contains(etag)
+    else:
+        hit = _last_modified_matches(last_modified)
+    if not hit:
+        return None
+    return with_validators(make_response("", 304), etag, last_modified)
+
+
+def with_validators(response, etag, last_modified=None):
+    """ETag, Last-Modified en revalidatie-headers op een (volledige of 304) response."""
+    response = make_response(response)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
@@ -12,5 +12,28 @@ class Config:
     SCHEDULER_API_ENABLED = False
     SCHEDULER_ENABLED = True
 
+    # Similariteit voor "vergelijkbare bedrijven":
+    # "jaccard" (exact), "indexed" (exact, inverted index + bovengrens),
+    # "minhash" (benaderend, voor zeer grote catalogi)
+    # of "tfidf" (cosinus, veelvoorkomende woorden wegen minder)
+    SIMILARITY_MODE = os.environ.get("SIMILARITY_MODE", "jaccard")
+    MINHASH_NUM_PERM = int(os.environ.get("MINHASH_NUM_PERM", 160))
+    MINHASH_BANDS = int(os.environ.get("MINHASH_BANDS", 80))
+    # IDF-snapshot vernieuwen na wijzigingen aan meer dan deze fractie van de bedrijven
+    TFIDF_REFRESH_RATIO = float(os.environ.get("TFIDF_REFRESH_RATIO", 0.1))
 
+    # PDF/PPTX-rapporten: schijfcache en aantal processen om ze te bouwen (0 = in de request zelf).
+    # Leeg = <instance-map>/reports; de map krijgt mode 0700 (zie app/private_files.py)
+    EXPORT_CACHE_DIR = os.environ.get("EXPORT_CACHE_DIR", "")
+    EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", 2))
 
+    # Gerenderde fragmenten van de detailpagina: aantal fragmenten in de LRU per proces (0 = uit)
+    FRAGMENT_CACHE_SIZE = int(os.environ.get("FRAGMENT_CACHE_SIZE", 512))
+
+    # Gedeelde cache tussen de gunicorn-workers (SQLite-bestand, mode 0600; leeg = enkel caches per proces).
+    # Niet ingesteld = <instance-map>/cache/shared.sqlite3; zelf ingesteld: een map van enkel deze gebruiker
+    SHARED_CACHE_PATH = os.environ.get("SHARED_CACHE_PATH")
+    SHARED_CACHE_MAX_BYTES = int(os.environ.get("SHARED_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    SHARED_CACHE_TTL = int(os.environ.get("SHARED_CACHE_TTL", 24 * 3600))
+    # Hoe vaak (seconden) een worker de teller change_seq controleert op wijzigingen uit andere workers
+    CACHE_SYNC_INTERVAL = float(os.environ.get("CACHE_SYNC_INTERVAL", 2.0))
@@ -0,0 +1,88 @@
+# counters.py
+#
+# Bijgehouden tellers in de tabel app_counter. In plaats van bij elke
+# paginaweergave COUNT(*) over een groeiende tabel te doen, wordt de teller
+# aangepast wanneer rijen toegevoegd of verwijderd worden (in dezelfde
+# transactie, vlak voor de commit via SQLAlchemy session-events). Ontbreekt een
+# teller nog, dan wordt hij één keer met COUNT(*) geïnitialiseerd.
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from app.models import AppCounter
+
+_counters = AppCounter.__table__
+
+# INSERT ... ON CONFLICT per dialect (PostgreSQL in productie, SQLite lokaal)
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def bump_counter(connection, name, delta, recount):
+    """
+    Telt delta op bij een teller, op de connection van de session (vlak voor
+    de commit, zodat de tellerrij niet de hele transactie vergrendeld blijft).
+    recount: scalaire SELECT die de juiste waarde oplevert als de teller nog
+    niet bestaat; de wijzigingen van deze transactie zijn dan al geschreven.
+    Eén INSERT ... ON CONFLICT DO UPDATE, dus twee eerste schrijvers tegelijk
+    botsen niet op de unieke naam.
+    """
+    dialect_insert = _INSERTS[connection.dialect.name]
+    connection.execute(
+        dialect_insert(_counters)
+        .values(name=name, value=recount)
+        .on_conflict_do_update(index_elements=[_counters.c.name],
+                               set_={"value": _counters.c.value + delta})
+    )
+
+
+def allocate_counter(connection, name, n):
+    """
+    Reserveert n opeenvolgende waarden; retourneert de hoogste (de eerste is hoogste - n + 1).
+    De rij blijft tot het einde van de transactie vergrendeld, dus gelijktijdige
+    transacties krijgen hun blok in commit-volgorde.
+    """
+    value = connection.execute(
+        update(_counters)
+        .where(_counters.c.name == name)
+        .values(value=_counters.c.value + n)
+        .returning(_counters.c.value)
+    ).scalar()
+    if value is None:
+        connection.execute(insert(_counters).values(name=name, value=n))
+        value = n
+    return value
+
+
+def read_counter(name, recount):
+    """
+    Waarde van een teller; ontbreekt hij, dan wordt hij met recount gevuld en bewaard.
+    Dat gebeurt in een eigen transactie: een commit op db.session zou alle
+    objecten die de aanvraag al geladen heeft laten vervallen (en per rij herladen).
+    """
+    value = db.session.execute(
+        select(_counters.c.value).where(_counters.c.name == name)
+    ).scalar()
+    if value is not None:
+        return value
+
+    with db.engine.begin() as connection:
+        value = connection.execute(recount).scalar() or 0
+        dialect_insert = _INSERTS[connection.dialect.name]
+        connection.execute(
+            dialect_insert(_counters).values(name=name, value=value)
+            .on_conflict_do_nothing(index_elements=[_counters.c.name])
+        )
+    return value
+
+
+def set_counter(name, recount):
+    """Zet een teller opnieuw gelijk aan de telling (recount) en commit."""
+    value = db.session.execute(recount).scalar() or 0
+    counter = db.session.get(AppCounter, name)
+    if counter is None:
+        db.session.add(AppCounter(name=name, value=value))
+    else:
+        counter.value = value
+    db.session.commit()
+    return value
@@ -0,0 +1,118 @@
+# fragment_cache.py
+#
+# Cache voor de gerenderde fragmenten van de detailpagina van een bedrijf
+# (profiel, vergelijkbare bedrijven, grafieken, events). De pagina verandert
+# enkel als het bedrijf opnieuw gescrapet of ververst wordt, maar elke render
+# kost meerdere queries, de Google-reviews en het template-werk.
+#
+# Sleutel: <company_id>:<fragment>:<hash van het token>. Het token bevat de
+# versie van het bedrijf (change_seq + updated_at, zie app/conditional.py) of
+# de getoonde buren, plus de templates; een scrape of refresh geeft dus vanzelf
+# een nieuwe sleutel. De invalidatie-hooks in scrape/refresh/delete ruimen de
+# oude fragmenten meteen op, zodat ze geen plaats innemen tot de LRU ze verdringt.
+#
+# Opslag: TieredCache uit app/cache.py, een LRU per proces vóór de gedeelde
+# SQLite-cache (tussen de gunicorn-workers). Wijzigingen uit andere workers
+# komen via sync_cache_version() binnen (forget_local_fragments).
+
+import threading
+import time
+
+from flask import current_app
+from markupsafe import Markup
+
+from app.cache import TieredCache, shared_cache
+from app.conditional import make_etag, templates_token
+
+
+class FragmentCache:
+    """
+    Gerenderde fragmenten per bedrijf: eerst de LRU van dit proces, dan de
+    gedeelde cache, anders renderen en in beide bewaren.
+    Houdt per fragment hits, misses en de rendertijd van de misses bij.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    @staticmethod
+    def key(company_id, fragment, token):
+        return f"{int(company_id)}:{fragment}:{make_etag(fragment, token, templates_token())[:20]}"
+
+    def _count(self, fragment, field, seconds=0.0):
+        with self._lock:
+            counts = self._counts.setdefault(
+                fragment, {"hits": 0, "shared_hits": 0, "misses": 0, "render_seconds": 0.0}
+            )
+            counts[field] += 1
+            counts["render_seconds"] += seconds
+
+    def render(self, company_id, fragment, token, render):
+        """
+        HTML van een fragment als Markup; render() (zonder argumenten) wordt
+        enkel opgeroepen als het fragment voor dit token nog niet gecachet is.
+        """
+        key = self.key(company_id, fragment, token)
+        html, tier = self.store.lookup(key)
+        if html is not None:
+            self._count(fragment, "hits" if tier == "local" else "shared_hits")
+            return Markup(html)
+
+        started = time.perf_counter()
+        html = str(render())
+        self._count(fragment, "misses", time.perf_counter() - started)
+        self.store.set(key, html)
+        return Markup(html)
+
+    def invalidate(self, company_id=None, local_only=False):
+        """Verwijdert de fragmenten van één bedrijf, of alle fragmenten als company_id None is."""
+        prefix = "" if company_id is None else f"{int(company_id)}:"
+        return self.store.delete_prefix(prefix, local_only=local_only)
+
+    def stats(self):
+        with self._lock:
+            fragments = {}
+            for fragment, counts in self._counts.items():
+                lookups = counts["hits"] + counts["shared_hits"] + counts["misses"]
+                fragments[fragment] = dict(
+                    counts,
+                    render_seconds=round(counts["render_seconds"], 4),
+                    hit_rate=round((lookups - counts["misses"]) / lookups, 4) if lookups else None,
+                )
+        return dict(self.store.stats(), fragments=fragments)
+
+
+_cache = None
+
+
+def fragment_cache():
+    """De fragmentcache van dit proces (FRAGMENT_CACHE_SIZE in de LRU, gedeelde laag uit shared_cache())."""
+    global _cache
+    if _cache is None:
+        _cache = FragmentCache(TieredCache(
+            "fragment",
+            current_app.config["FRAGMENT_CACHE_SIZE"],
+            shared=shared_cache(),
+            ttl=current_app.config["SHARED_CACHE_TTL"],
+        ))
+    return _cache
+
+
+def invalidate_company_fragments(company_id=None):
+    """
+    Verwijdert de gecachete fragmenten van één bedrijf (na scrape/refresh/delete),
+    of van alle bedrijven als company_id None is; ook uit de gedeelde cache.
+    """
+    fragment_cache().invalidate(company_id)
+
+
+def forget_local_fragments(company_id=None):
+    """
+    Listener voor on_company_change: enkel de LRU van dit proces, want de worker
+    die het bedrijf wijzigde, heeft de gedeelde cache al opgeruimd. Bij None
+    (veel wijzigingen of een teruggezette teller) gaat ook de gedeelde cache leeg.
+    """
+    if _cache is not None:
+        _cache.invalidate(company_id, local_only=company_id is not None)
@@ -0,0 +1,380 @@
+# history.py
+#
+# Historiek van metrics voor grafieken.
+# Naast de ruwe MetricHistory-rijen houden we rollups bij per dag/week/maand
+# (laatste, min, max en gemiddelde waarde), zodat grafieken een begrensd
+# aantal punten lezen, hoe lang de historiek ook wordt.
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import case, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from app.models import MetricHistory, MetricRollup
+
+# Van fijn naar grof, met (ongeveer) aantal dagen per bucket
+ROLLUP_RESOLUTIONS = (
+    ("day", 1),
+    ("week", 7),
+    ("month", 30),
+)
+
+DEFAULT_MAX_POINTS = 200
+
+_LABEL_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%Y-%m-%d",
+    "month": "%Y-%m",
+}
+
+
+def to_utc_naive(dt: datetime) -> datetime:
+    """
+    Maakt een tijdstip vergelijkbaar:
+    timezone-aware → omgezet naar UTC en zonder tzinfo, naive → als UTC beschouwd.
+    """
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def bucket_start(dt: datetime, resolution: str) -> datetime:
+    """Begin van de dag/week (maandag)/maand waarin dt valt (UTC, naive)."""
+    dt = to_utc_naive(dt)
+    day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return day
+    if resolution == "week":
+        return day - timedelta(days=day.weekday())
+    if resolution == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Onbekende resolutie: {resolution}")
+
+
+def _bucket_end(start: datetime, resolution: str) -> datetime:
+    if resolution == "day":
+        return start + timedelta(days=1)
+    if resolution == "week":
+        return start + timedelta(days=7)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+_ROLLUP_KEY = ("company_id", "name", "resolution", "bucket_start")
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _upsert_rollups(rows, accumulate):
+    """
+    Schrijft rollup-rijen met één INSERT ... ON CONFLICT (uq_metric_rollup_bucket).
+    accumulate=True: een nieuw punt bij een bestaande bucket optellen (last, min,
+    max, sum, count); anders de bucket overschrijven met de herberekende waarden.
+    Gelijktijdige schrijvers (refresh + /scrape) botsen zo niet op de unieke sleutel.
+    Andere dialecten dan PostgreSQL/SQLite gebruiken _merge_rollups.
+    """
+    insert = _INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is None:
+        _merge_rollups(rows, accumulate)
+        return
+
+    stmt = insert(MetricRollup).values(rows)
+    new = stmt.excluded
+    old = MetricRollup.__table__.c
+
+    if accumulate:
+        newer = (old.last_recorded_at.is_(None)) | (new.last_recorded_at >= old.last_recorded_at)
+        updates = {
+            "last_value": case((newer, new.last_value), else_=old.last_value),
+            "last_recorded_at": case((newer, new.last_recorded_at), else_=old.last_recorded_at),
+            "min_value": case(((old.min_value.is_(None)) | (new.min_value < old.min_value), new.min_value),
+                              else_=old.min_value),
+            "max_value": case(((old.max_value.is_(None)) | (new.max_value > old.max_value), new.max_value),
+                              else_=old.max_value),
+            "sum_value": case((new.sum_value.is_(None), old.sum_value),
+                              else_=func.coalesce(old.sum_value, 0) + new.sum_value),
+            "value_count": old.value_count + new.value_count,
+        }
+    else:
+        updates = {column: getattr(new, column) for column in
+                   ("last_value", "last_recorded_at", "min_value", "max_value", "sum_value", "value_count")}
+
+    db.session.execute(stmt.on_conflict_do_update(index_elements=_ROLLUP_KEY, set_=updates))
+
+
+def _merge_rollups(rows, accumulate):
+    """
+    Terugval voor databases zonder INSERT ... ON CONFLICT: per bucket de rij
+    vergrendeld ophalen (SELECT ... FOR UPDATE) en in Python bijwerken, of toevoegen.
+    Zelfde resultaat als _upsert_rollups, maar één query per bucket.
+    """
+    for row in rows:
+        rollup = (MetricRollup.query
+                  .filter_by(**{column: row[column] for column in _ROLLUP_KEY})
+                  .with_for_update()
+                  .first())
+        if rollup is None:
+            db.session.add(MetricRollup(**row))
+            db.session.flush()
+            continue
+
+        if not accumulate:
+            for column in ("last_value", "last_recorded_at", "min_value", "max_value", "sum_value", "value_count"):
+                setattr(rollup, column, row[column])
+            continue
+
+        if rollup.last_recorded_at is None or row["last_recorded_at"] >= to_utc_naive(rollup.last_recorded_at):
+            rollup.last_value = row["last_value"]
+            rollup.last_recorded_at = row["last_recorded_at"]
+        if row["min_value"] is not None and (rollup.min_value is None or row["min_value"] < rollup.min_value):
+            rollup.min_value = row["min_value"]
+        if row["max_value"] is not None and (rollup.max_value is None or row["max_value"] > rollup.max_value):
+            rollup.max_value = row["max_value"]
+        if row["sum_value"] is not None:
+            rollup.sum_value = (rollup.sum_value or 0) + row["sum_value"]
+        rollup.value_count = (rollup.value_count or 0) + row["value_count"]
+    db.session.flush()
+
+
+def record_rollup_point(company_id: int, name: str, recorded_at: datetime, value):
+    """
+    Verwerkt één nieuw historiekpunt incrementeel in de dag-, week- en maandrollup
+    (één upsert voor de drie resoluties).
+    """
+    recorded_at = to_utc_naive(recorded_at)
+    value = Decimal(value) if value is not None else None
+
+    _upsert_rollups([
+        {
+            "company_id": company_id,
+            "name": name,
+            "resolution": resolution,
+            "bucket_start": bucket_start(recorded_at, resolution),
+            "last_value": value,
+            "last_recorded_at": recorded_at,
+            "min_value": value,
+            "max_value": value,
+            "sum_value": value,
+            "value_count": 0 if value is None else 1,
+        }
+        for resolution, _days in ROLLUP_RESOLUTIONS
+    ], accumulate=True)
+
+
+def rebuild_rollup_point(company_id: int, name: str, recorded_at: datetime):
+    """
+    Herberekent de buckets rond recorded_at vanuit de ruwe historiek.
+    Nodig wanneer een bestaand punt een andere waarde krijgt
+    (min/max kunnen niet incrementeel 'terug' gezet worden).
+    """
+    db.session.flush()
+
+    rows = []
+    for resolution, _days in ROLLUP_RESOLUTIONS:
+        start = bucket_start(recorded_at, resolution)
+        points = (db.session.query(MetricHistory.recorded_at, MetricHistory.value)
+                  .filter(MetricHistory.company_id == company_id,
+                          MetricHistory.name == name,
+                          MetricHistory.recorded_at >= start,
+                          MetricHistory.recorded_at < _bucket_end(start, resolution))
+                  .order_by(MetricHistory.recorded_at.asc(), MetricHistory.id.asc())
+                  .all())
+
+        rollup = MetricRollup(company_id=company_id, name=name, resolution=resolution, bucket_start=start)
+        _fill_rollup(rollup, points)
+        rows.append({column: getattr(rollup, column) for column in
+                     _ROLLUP_KEY + ("last_value", "last_recorded_at", "min_value",
+                                    "max_value", "sum_value", "value_count")})
+
+    _upsert_rollups(rows, accumulate=False)
+
+
+def _fill_rollup(rollup, points):
+    """Zet alle aggregaten van een rollup op basis van (recorded_at, value) in tijdsvolgorde."""
+    values = [v for _t, v in points if v is not None]
+
+    rollup.last_recorded_at = to_utc_naive(points[-1][0]) if points else None
+    rollup.last_value = points[-1][1] if points else None
+    rollup.min_value = min(values) if values else None
+    rollup.max_value = max(values) if values else None
+    rollup.sum_value = sum(values) if values else None
+    rollup.value_count = len(values)
+
+
+def pick_resolution(start: datetime, end: datetime, max_points: int = DEFAULT_MAX_POINTS) -> str:
+    """Fijnste resolutie waarbij de periode in maximaal max_points buckets past."""
+    span_days = max(1, (to_utc_naive(end) - to_utc_naive(start)).days + 1)
+    for resolution, days in ROLLUP_RESOLUTIONS:
+        if span_days / days <= max_points:
+            return resolution
+    return ROLLUP_RESOLUTIONS[-1][0]
+
+
+def rollup_points(company_id: int, name: str, start: datetime = None, end: datetime = None,
+                  max_points: int = DEFAULT_MAX_POINTS, agg: str = "last"):
+    """
+    Geeft (resolution, [(bucket_start, value), ...]) gelezen uit de rollups.
+    De resolutie wordt gekozen op basis van de gevraagde periode;
+    er worden nooit meer dan max_points punten teruggegeven.
+    agg: "last" | "min" | "max" | "avg"
+    """
+    if start is None:
+        start = (db.session.query(db.func.min(MetricRollup.bucket_start))
+                 .filter_by(company_id=company_id, name=name, resolution="month")
+                 .scalar())
+        if start is None:
+            return ROLLUP_RESOLUTIONS[0][0], []
+    if end is None:
+        end = datetime.utcnow()
+
+    resolution = pick_resolution(start, end, max_points)
+
+    rows = (MetricRollup.query
+            .filter(MetricRollup.company_id == company_id,
+                    MetricRollup.name == name,
+                    MetricRollup.resolution == resolution,
+                    MetricRollup.bucket_start >= bucket_start(start, resolution),
+                    MetricRollup.bucket_start <= to_utc_naive(end))
+            .order_by(MetricRollup.bucket_start.desc())
+            .limit(max_points)
+            .all())
+    rows.reverse()
+
+    return resolution, [(r.bucket_start, _rollup_value(r, agg)) for r in rows]
+
+
+def rollup_series(company_id: int, name: str, start: datetime = None, end: datetime = None,
+                  max_points: int = DEFAULT_MAX_POINTS, agg: str = "last"):
+    """
+    Geeft (labels, values) voor een grafiek, gelezen uit de rollups
+    (zie rollup_points).
+    """
+    resolution, points = rollup_points(company_id, name, start, end, max_points, agg)
+
+    fmt = _LABEL_FORMATS[resolution]
+    labels = [t.strftime(fmt) for t, _v in points]
+    values = [v for _t, v in points]
+    return labels, values
+
+
+def series_range_start(company_id: int, names):
+    """Vroegste (maand)bucket over alle gevraagde metrics, of None zonder historiek."""
+    return (db.session.query(db.func.min(MetricRollup.bucket_start))
+            .filter(MetricRollup.company_id == company_id,
+                    MetricRollup.name.in_(list(names)),
+                    MetricRollup.resolution == "month")
+            .scalar())
+
+
+def _epoch(dt: datetime) -> float:
+    return to_utc_naive(dt).replace(tzinfo=timezone.utc).timestamp()
+
+
+def load_series_columns(company_id: int, names, resolution: str = None,
+                        start: datetime = None, end: datetime = None, agg: str = "last"):
+    """
+    Laadt alle gevraagde reeksen van één bedrijf in ÉÉN query.
+    - resolution=None → ruwe MetricHistory (index op company_id, name, recorded_at)
+    - resolution="day"/"week"/"month" → rollups van die resolutie
+
+    Retourneert {name: (timestamps, values)} als compacte NumPy-kolommen:
+    timestamps = epoch-seconden (UTC), values = float64 met NaN voor lege waarden.
+    Metrics zonder data krijgen lege arrays.
+    """
+    names = list(dict.fromkeys(names))
+
+    if resolution is None:
+        time_col = MetricHistory.recorded_at
+        query = (db.session.query(MetricHistory.name, time_col, MetricHistory.value)
+                 .filter(MetricHistory.company_id == company_id,
+                         MetricHistory.name.in_(names)))
+    else:
+        time_col = MetricRollup.bucket_start
+        query = (db.session.query(MetricRollup)
+                 .filter(MetricRollup.company_id == company_id,
+                         MetricRollup.name.in_(names),
+                         MetricRollup.resolution == resolution))
+
+    if start is not None:
+        query = query.filter(time_col >= to_utc_naive(start))
+    if end is not None:
+        query = query.filter(time_col <= to_utc_naive(end))
+
+    collected = {name: ([], []) for name in names}
+    for row in query.order_by(time_col.asc()):
+        if resolution is None:
+            name, recorded_at, value = row
+            value = float(value) if value is not None else None
+        else:
+            name, recorded_at, value = row.name, row.bucket_start, _rollup_value(row, agg)
+
+        ts, vals = collected[name]
+        ts.append(_epoch(recorded_at))
+        vals.append(np.nan if value is None else value)
+
+    return {
+        name: (np.array(ts, dtype=float), np.array(vals, dtype=float))
+        for name, (ts, vals) in collected.items()
+    }
+
+
+def _rollup_value(rollup, agg: str):
+    if agg == "min":
+        value = rollup.min_value
+    elif agg == "max":
+        value = rollup.max_value
+    elif agg == "avg":
+        value = rollup.sum_value / rollup.value_count if rollup.value_count else None
+    else:
+        value = rollup.last_value
+    return float(value) if value is not None else None
+
+
+def rebuild_all_rollups():
+    """
+    Bouwt alle rollups opnieuw op vanuit de ruwe historiek.
+    Leest de historiek gestreamd per (bedrijf, metric) in tijdsvolgorde.
+    Retourneert het aantal geschreven rollup-rijen.
+    """
+    MetricRollup.query.delete(synchronize_session=False)
+
+    rows = (db.session.query(MetricHistory.company_id, MetricHistory.name,
+                             MetricHistory.recorded_at, MetricHistory.value)
+            .order_by(MetricHistory.company_id, MetricHistory.name,
+                      MetricHistory.recorded_at, MetricHistory.id)
+            .yield_per(1000))
+
+    written = 0
+    current = None
+    buckets = {}
+
+    def flush_group():
+        # Eén (bedrijf, metric) is volledig gelezen → buckets wegschrijven
+        for (resolution, start), points in buckets.items():
+            rollup = MetricRollup(company_id=current[0], name=current[1],
+                                  resolution=resolution, bucket_start=start)
+            _fill_rollup(rollup, points)
+            db.session.add(rollup)
+        return len(buckets)
+
+    for company_id, name, recorded_at, value in rows:
+        if recorded_at is None:
+            continue
+        if (company_id, name) != current:
+            if current is not None:
+                written += flush_group()
+            current = (company_id, name)
+            buckets = {}
+        for resolution, _days in ROLLUP_RESOLUTIONS:
+            key = (resolution, bucket_start(recorded_at, resolution))
+            buckets.setdefault(key, []).append((recorded_at, value))
+
+    if current is not None:
+        written += flush_group()
+
+    db.session.commit()
+    return written
@@ -0,0 +1,44 @@
+# load_profiles.py
+#
+# Laadprofielen voor Company. De zware tekst/JSON-kolommen zijn in models.py
+# uitgesteld (deferred, groepen "similarity" en "profile"); elke use case
+# vraagt hier expliciet op wat ze nodig heeft, zodat een lijst- of
+# similariteitsquery geen kilobytes aan ai_summary/funding_history meesleept.
+#
+#   name       - enkel id + naam (selectielijsten, namen bij events/logs)
+#   list       - kolommen van de bedrijvenlijst
+#   similarity - lichte kolommen + de velden van similarity.py
+#   detail     - alles (detailpagina, scraper-vergelijking, watchlist)
+#   export     - alles (PDF, slides, JSON-profiel)
+
+from sqlalchemy.orm import load_only, undefer_group
+
+from app.models import Company
+
+LIST_COLUMNS = (
+    Company.company_id,
+    Company.name,
+    Company.website_url,
+    Company.headquarters,
+    Company.team_size,
+    Company.funding,
+    Company.sector_id,
+)
+
+COMPANY_LOAD_PROFILES = {
+    "name": (load_only(Company.company_id, Company.name),),
+    "list": (load_only(*LIST_COLUMNS),),
+    "similarity": (undefer_group("similarity"),),
+    "detail": (undefer_group("similarity"), undefer_group("profile")),
+    "export": (undefer_group("similarity"), undefer_group("profile")),
+}
+
+
+def company_options(profile):
+    """Loader-opties van een profiel, voor query(Company, ...).options(*...)."""
+    return COMPANY_LOAD_PROFILES[profile]
+
+
+def company_query(profile):
+    """Company.query met het gevraagde laadprofiel."""
+    return Company.query.options(*company_options(profile))
@@ -1,3 +1,5 @@
+from sqlalchemy.orm import deferred
+
 from app import db
 
 # ======================================
@@ -14,18 +16,23 @@ class Company(db.Model):
     headquarters = db.Column(db.Text)
     team_size = db.Column(db.Integer)
     funding = db.Column(db.Text)
-    office_locations = db.Column(db.Text)
-    traction_signals = db.Column(db.Text)
-    funding_history = db.Column(db.Text)
+
+    # Zware tekst/JSON-velden worden uitgesteld geladen (deferred) in twee groepen:
+    #   "similarity" - velden voor similarity.py
+    #   "profile"    - overige baseline-velden (detailpagina, exports)
+    # Zie app/load_profiles.py voor de laadprofielen per use case.
+    office_locations = deferred(db.Column(db.Text), group="profile")
+    traction_signals = deferred(db.Column(db.Text), group="profile")
+    funding_history = deferred(db.Column(db.Text), group="profile")
 
     # AI-baseline velden
-    ai_summary = db.Column(db.Text)
-    value_proposition = db.Column(db.Text)
-    product_description = db.Column(db.Text)
-    target_segment = db.Column(db.Text)
-    pricing = db.Column(db.Text)
-    key_features = db.Column(db.JSON)   # JSONB in database
-    competitors = db.Column(db.JSON)    # JSONB in database
+    ai_summary = deferred(db.Column(db.Text), group="profile")
+    value_proposition = deferred(db.Column(db.Text), group="profile")
+    product_description = deferred(db.Column(db.Text), group="similarity")
+    target_segment = deferred(db.Column(db.Text), group="similarity")
+    pricing = deferred(db.Column(db.Text), group="similarity")
+    key_features = deferred(db.Column(db.JSON), group="similarity")   # JSONB in database
+    competitors = deferred(db.Column(db.JSON), group="profile")       # JSONB in database
 
     # Link naar de sectors tabel (FK → sectors.sector_id)
     sector_id = db.Column(
@@ -39,6 +46,10 @@ class Company(db.Model):
         server_default=db.func.now()
     )
 
+    # Change data capture (zie app/changes.py): tijdstip en volgnummer van de laatste wijziging
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), onupdate=db.func.now())
+    change_seq = db.Column(db.BigInteger, index=True)
+
     # Relaties
     metrics = db.relationship('Metric', back_populates='company', cascade="all, delete")
     audit_logs = db.relationship('AuditLog', back_populates='company', cascade="all, delete")
@@ -47,6 +58,12 @@ class Company(db.Model):
     # Sector-relatie (inverse van Sector.companies)
     sector = db.relationship('Sector', back_populates='companies')
 
+    __table_args__ = (
+        # Keyset paginering van de bedrijvenlijst (name, company_id), met en zonder sectorfilter
+        db.Index('ix_company_name_id', 'name', 'company_id'),
+        db.Index('ix_company_sector_name_id', 'sector_id', 'name', 'company_id'),
+    )
+
     def __repr__(self):
         return f"<Company {self.name}>"
 
@@ -90,8 +107,17 @@ class Metric(db.Model):
     active = db.Column(db.Boolean, default=True)
     last_updated = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
 
+    # Change data capture (zie app/changes.py)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), onupdate=db.func.now())
+    change_seq = db.Column(db.BigInteger, index=True)
+
     company = db.relationship('Company', back_populates='metrics')
 
+    __table_args__ = (
+        # Watchlist: jongste metric per (bedrijf, naam)
+        db.Index('ix_metric_company_name_updated', 'company_id', 'name', 'last_updated'),
+    )
+
     def __repr__(self):
         return f"<Metric {self.name} ({self.company_id})>"
 
@@ -113,6 +139,11 @@ class AuditLog(db.Model):
     )
     company = db.relationship('Company', back_populates='audit_logs')
 
+    __table_args__ = (
+        # Laatste logs per bedrijf (watchlist, exports)
+        db.Index('ix_audit_log_company_retrieved', 'company_id', 'retrieved_at'),
+    )
+
     def __repr__(self):
         return f"<AuditLog {self.source_name}>"
 
@@ -134,6 +165,12 @@ class ChangeEvent(db.Model):
     )
     company = db.relationship('Company', back_populates='change_events')
 
+    __table_args__ = (
+        # Keyset paginering op (detected_at, event_id): alle meldingen / per bedrijf
+        db.Index('ix_change_event_detected', 'detected_at', 'event_id'),
+        db.Index('ix_change_event_company_detected', 'company_id', 'detected_at', 'event_id'),
+    )
+
     def __repr__(self):
         return f"<ChangeEvent {self.event_type}>"
 
@@ -144,6 +181,20 @@ class ChangeEvent(db.Model):
 class MetricHistory(db.Model):
     __tablename__ = 'metric_history'
 
+    # Natuurlijke sleutel voor AI-backfill: één inferred punt per
+    # (company_id, name, recorded_at). Snapshots krijgen altijd een nieuw tijdstip.
+    __table_args__ = (
+        # Reeksen per bedrijf + metric in tijdsvolgorde (grafieken, laatste waarde)
+        db.Index('ix_metric_history_company_name_recorded', 'company_id', 'name', 'recorded_at'),
+        db.Index(
+            'uq_metric_history_inferred',
+            'company_id', 'name', 'recorded_at',
+            unique=True,
+            postgresql_where=db.text("source = 'inferred'"),
+            sqlite_where=db.text("source = 'inferred'"),
+        ),
+    )
+
     id = db.Column(db.BigInteger, primary_key=True)
 
     company_id = db.Column(
@@ -164,6 +215,10 @@ class MetricHistory(db.Model):
     # "snapshot" (live scrape) of "inferred" (AI backfill)
     source = db.Column(db.Text, default="snapshot")
 
+    # Change data capture (zie app/changes.py)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), onupdate=db.func.now())
+    change_seq = db.Column(db.BigInteger, index=True)
+
     company = db.relationship(
         'Company',
         backref=db.backref('metric_history', cascade="all, delete", lazy=True)
@@ -173,6 +228,140 @@ class MetricHistory(db.Model):
         return f"<MetricHistory {self.name} ({self.company_id}) [{self.source}]>"
 
 
+# ======================================
+# TABLE: MetricRollup
+# ======================================
+class MetricRollup(db.Model):
+    __tablename__ = 'metric_rollup'
+
+    id = db.Column(db.BigInteger, primary_key=True)
+
+    company_id = db.Column(
+        db.BigInteger,
+        db.ForeignKey('company.company_id', ondelete="CASCADE"),
+        nullable=False
+    )
+
+    name = db.Column(db.Text, nullable=False)
+
+    # "day" | "week" | "month"
+    resolution = db.Column(db.Text, nullable=False)
+    bucket_start = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    # Aggregaten van de ruwe MetricHistory-punten in deze bucket
+    last_value = db.Column(db.Numeric)
+    last_recorded_at = db.Column(db.DateTime(timezone=True))
+    min_value = db.Column(db.Numeric)
+    max_value = db.Column(db.Numeric)
+    sum_value = db.Column(db.Numeric)
+    value_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('company_id', 'name', 'resolution', 'bucket_start',
+                            name='uq_metric_rollup_bucket'),
+    )
+
+    def __repr__(self):
+        return f"<MetricRollup {self.name} ({self.company_id}) {self.resolution} {self.bucket_start}>"
+
+
+# ======================================
+# TABLE: CompanySimilarity
+# ======================================
+class CompanySimilarity(db.Model):
+    __tablename__ = 'company_similarity'
+
+    # Top-K vergelijkbare bedrijven per bedrijf (gematerialiseerd)
+    company_id = db.Column(
+        db.BigInteger,
+        db.ForeignKey('company.company_id', ondelete="CASCADE"),
+        primary_key=True
+    )
+    neighbour_id = db.Column(
+        db.BigInteger,
+        db.ForeignKey('company.company_id', ondelete="CASCADE"),
+        primary_key=True
+    )
+
+    rank = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
+
+    __table_args__ = (
+        db.Index('ix_company_similarity_rank', 'company_id', 'rank'),
+        db.Index('ix_company_similarity_neighbour', 'neighbour_id'),
+    )
+
+    def __repr__(self):
+        return f"<CompanySimilarity {self.company_id} → {self.neighbour_id} ({self.score})>"
+
+
+# ======================================
+# TABLE: CompetitorName
+# ======================================
+class CompetitorName(db.Model):
+    __tablename__ = 'competitor_name'
+
+    # Genormaliseerde competitor-namen uit Company.competitors (één rij per naam per bedrijf)
+    id = db.Column(db.BigInteger, primary_key=True)
+
+    company_id = db.Column(
+        db.BigInteger,
+        db.ForeignKey('company.company_id', ondelete="CASCADE"),
+        nullable=False
+    )
+
+    competitor_name = db.Column(db.Text, nullable=False)   # zoals gescrapet
+    normalized_name = db.Column(db.Text, nullable=False)   # zie competitors.normalize_competitor_name
+
+    # Competitor-graaf: opgeloste link naar een gevolgd bedrijf (NULL = niet gevonden)
+    target_company_id = db.Column(
+        db.BigInteger,
+        db.ForeignKey('company.company_id', ondelete="SET NULL"),
+        nullable=True
+    )
+    match_score = db.Column(db.Float)      # 1.0 = exact (naam/domein), lager = fuzzy
+
+    __table_args__ = (
+        db.UniqueConstraint('company_id', 'normalized_name', name='uq_competitor_name_company'),
+        db.Index('ix_competitor_name_normalized', 'normalized_name', 'competitor_name'),
+        db.Index('ix_competitor_name_target', 'target_company_id'),
+    )
+
+    def __repr__(self):
+        return f"<CompetitorName {self.competitor_name} ({self.company_id})>"
+
+
+# ======================================
+# TABLE: AppCounter
+# ======================================
+class AppCounter(db.Model):
+    __tablename__ = 'app_counter'
+
+    # Bijgehouden tellers (bv. aantal change events) zodat pagina's geen COUNT(*) moeten doen
+    name = db.Column(db.Text, primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<AppCounter {self.name}={self.value}>"
+
+
+# ======================================
+# TABLE: ChangeTombstone
+# ======================================
+class ChangeTombstone(db.Model):
+    __tablename__ = 'change_tombstone'
+
+    # Verwijderde rijen van company / metric / metric_history voor de change-feed
+    change_seq = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    table_name = db.Column(db.Text, nullable=False)
+    row_id = db.Column(db.BigInteger, nullable=False)
+    deleted_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
+
+    def __repr__(self):
+        return f"<ChangeTombstone {self.table_name} {self.row_id}>"
+
+
 # ======================================
 # TABLE: Sector
 # ======================================
@@ -0,0 +1,51 @@
+# private_files.py
+#
+# Caches op schijf (rapporten, gedeelde SQLite-cache) bevatten inhoud die we
+# later ongecontroleerd teruggeven. Ze horen dus in een map waar enkel de
+# gebruiker van de app in kan lezen of schrijven: niet in een voorspelbaar pad
+# in een gedeelde map als /tmp, waar een andere gebruiker ze vooraf kan
+# aanmaken, lezen of vervangen.
+
+import os
+import stat
+
+
+def _check_owner(path, st):
+    # Geen getuid (Windows): geen eigenaarscontrole mogelijk
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        raise PermissionError(f"{path} is van een andere gebruiker (uid {st.st_uid})")
+
+
+def ensure_private_dir(path):
+    """
+    Maakt de map aan (mode 0700) of controleert een bestaande: ze moet van
+    deze gebruiker zijn; rechten voor groep/anderen worden weggehaald.
+    Retourneert path.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if not stat.S_ISDIR(st.st_mode):
+        raise NotADirectoryError(path)
+    _check_owner(path, st)
+    if st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+def ensure_private_file(path):
+    """
+    Maakt het bestand aan (mode 0600) of controleert een bestaand: een gewoon
+    bestand (geen symlink) van deze gebruiker; rechten voor groep/anderen
+    worden weggehaald. Retourneert path.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+    try:
+        st = os.fstat(fd)
+        if not stat.S_ISREG(st.st_mode):
+            raise PermissionError(f"{path} is geen gewoon bestand")
+        _check_owner(path, st)
+        if st.st_mode & 0o077:
+            os.chmod(path, 0o600)
+    finally:
+        os.close(fd)
+    return path
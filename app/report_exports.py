@@ -0,0 +1,343 @@
+# report_exports.py
+#
+# PDF- (reportlab) en PPTX-rapporten (python-pptx) per bedrijf.
+# Het opbouwen is CPU-werk en het resultaat verandert pas als het bedrijf
+# opnieuw gescrapet wordt, dus:
+#   - gegenereerde bestanden worden op schijf bewaard, met als sleutel
+#     company_id + versie van het bedrijf (change_seq, zie app/changes.py)
+#     + REPORT_LAYOUT_VERSION; een update van het bedrijf geeft een nieuwe
+#     sleutel, oudere bestanden van dat bedrijf worden bij het schrijven opgeruimd
+#   - bij een cache miss wordt het rapport in een process pool gebouwd, niet
+#     in de webworker; de watchlist-zip bouwt alle ontbrekende rapporten parallel.
+#
+# De builders krijgen een gewone dict (report_snapshot), zodat het werk
+# naar een ander proces gestuurd kan worden.
+
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+
+from app import db
+from app.load_profiles import company_query
+from app.models import Company
+from app.private_files import ensure_private_dir
+
+# Verhogen bij een wijziging aan de opmaak: alle gecachte rapporten vervallen dan
+REPORT_LAYOUT_VERSION = 1
+
+# soort → (mimetype, bestandsextensie, achtervoegsel van de downloadnaam)
+REPORT_KINDS = {
+    "pdf": ("application/pdf", "pdf", "Report"),
+    "pptx": ("application/vnd.openxmlformats-officedocument.presentationml.presentation", "pptx", "Slides"),
+}
+
+_SNAPSHOT_FIELDS = (
+    "name", "website_url", "value_proposition", "product_description", "target_segment",
+    "pricing", "funding", "team_size", "traction_signals", "key_features", "competitors",
+)
+
+
+def report_snapshot(company):
+    """De velden die in een rapport komen, als dict (doorgeefbaar aan een ander proces)."""
+    return {veld: getattr(company, veld) for veld in _SNAPSHOT_FIELDS}
+
+
+def report_filename(name, kind):
+    _mimetype, extension, suffix = REPORT_KINDS[kind]
+    return f"{name}_{suffix}.{extension}"
+
+
+# -----------------------------
+# Builders
+# -----------------------------
+
+def build_pdf(data):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    styles = getSampleStyleSheet()
+    story = []
+
+    # Title
+    story.append(Paragraph(f"<b>{data['name']}</b>", styles['Title']))
+    story.append(Spacer(1, 16))
+
+    fields = [
+        ("Website", data["website_url"]),
+        ("Value Proposition", data["value_proposition"]),
+        ("Product Description", data["product_description"]),
+        ("Target Segment", data["target_segment"]),
+        ("Pricing", data["pricing"]),
+        ("Funding", str(data["funding"])),
+        ("Team Size", str(data["team_size"])),
+        ("Traction signals", data["traction_signals"]),
+    ]
+
+    for title, value in fields:
+        story.append(Paragraph(f"<b>{title}</b><br/>{value or '—'}", styles['BodyText']))
+        story.append(Spacer(1, 12))
+
+    # Features
+    if data["key_features"]:
+        story.append(Paragraph("<b>Key Features</b>", styles['Heading2']))
+        for f in data["key_features"]:
+            story.append(Paragraph(f"- {f}", styles['BodyText']))
+        story.append(Spacer(1, 12))
+
+    # Competitors
+    if data["competitors"]:
+        story.append(Paragraph("<b>Competitors</b>", styles['Heading2']))
+        for comp in data["competitors"]:
+            story.append(Paragraph(f"- {comp}", styles['BodyText']))
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def build_slides(data):
+    from pptx import Presentation
+
+    prs = Presentation()
+    title_slide_layout = prs.slide_layouts[0]
+    slide = prs.slides.add_slide(title_slide_layout)
+
+    # Title Page
+    slide.shapes.title.text = data["name"]
+    slide.placeholders[1].text = "Baseline Analysis"
+
+    # Content slides
+    def add_slide(title, content_list):
+        layout = prs.slide_layouts[1]
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = title
+        body = slide.placeholders[1].text_frame
+
+        for c in (content_list or []):
+            if isinstance(c, dict):
+                name = c.get("name") or c.get("company_name") or ""
+                desc = c.get("description") or ""
+                text = name.strip()
+                if desc and desc.strip():
+                    text = f"{text} — {desc.strip()}" if text else desc.strip()
+                if not text:
+                    text = str(c)
+            else:
+                text = str(c)
+
+            body.add_paragraph().text = text
+
+    add_slide("What they do", [
+        data["value_proposition"] or "—",
+        data["product_description"] or "—"
+    ])
+
+    add_slide("Target Segment", [data["target_segment"] or "—"])
+    add_slide("Pricing", [data["pricing"] or "—"])
+
+    if data["key_features"]:
+        add_slide("Key Features", data["key_features"])
+
+    if data["competitors"]:
+        add_slide("Competitors", data["competitors"])
+
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
+
+
+_BUILDERS = {"pdf": build_pdf, "pptx": build_slides}
+
+
+def build_report(kind, data):
+    """Bouwt één rapport (functie op moduleniveau, zodat de process pool ze kan oproepen)."""
+    return _BUILDERS[kind](data)
+
+
+# -----------------------------
+# Schijfcache
+# -----------------------------
+
+class ReportCache:
+    """
+    Rapporten op schijf: <map>/<company_id>/<soort>-<versie>-v<layout>.<ext>.
+    Schrijven gaat via een tijdelijk bestand + os.replace, zodat een lezer nooit
+    een half bestand ziet. De map moet van deze gebruiker zijn en krijgt mode
+    0700 (gecontroleerd vóór de eerste lees- of schrijfbewerking), zodat andere
+    gebruikers geen rapporten kunnen lezen of vervangen.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._checked = False
+
+    def _root(self):
+        if not self._checked:
+            ensure_private_dir(self.directory)
+            self._checked = True
+        return self.directory
+
+    def _company_dir(self, company_id):
+        return os.path.join(self._root(), str(int(company_id)))
+
+    def path(self, company_id, version, kind):
+        extension = REPORT_KINDS[kind][1]
+        return os.path.join(self._company_dir(company_id),
+                            f"{kind}-{version}-v{REPORT_LAYOUT_VERSION}.{extension}")
+
+    def get(self, company_id, version, kind):
+        try:
+            with open(self.path(company_id, version, kind), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, company_id, version, kind, content):
+        target = self.path(company_id, version, kind)
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp, target)
+
+        # Oudere versies van dit rapport opruimen
+        keep = os.path.basename(target)
+        for name in os.listdir(directory):
+            if name.startswith(f"{kind}-") and name != keep and not name.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def invalidate(self, company_id):
+        shutil.rmtree(self._company_dir(company_id), ignore_errors=True)
+
+
+def report_cache():
+    directory = current_app.config["EXPORT_CACHE_DIR"] or os.path.join(current_app.instance_path, "reports")
+    return ReportCache(directory)
+
+
+# -----------------------------
+# Process pool
+# -----------------------------
+
+_executor = None
+
+
+def _mp_context():
+    # Met spawn/forkserver voert elke worker het startscript opnieuw uit (run.py →
+    # create_app() → een tweede scheduler). Met fork niet; de workers raken de
+    # geërfde DB-connecties niet aan en sluiten af met os._exit.
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+def _report_executor():
+    """Gedeelde process pool voor het bouwen van rapporten."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=current_app.config["EXPORT_WORKERS"],
+            mp_context=_mp_context(),
+        )
+    return _executor
+
+
+def _discard_report_executor(executor):
+    """Sluit een kapotte pool af; de volgende export start een nieuwe."""
+    global _executor
+    if _executor is executor:
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _build_reports(jobs):
+    """
+    Bouwt de rapporten van jobs in de process pool. Crasht een worker
+    (BrokenProcessPool), dan is de hele pool onbruikbaar: die wordt weggegooid
+    en de rapporten worden één keer opnieuw gebouwd in dit proces.
+    """
+    executor = _report_executor()
+    try:
+        futures = [executor.submit(build_report, kind, data) for _cid, kind, _version, data in jobs]
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        print("Rapporten: process pool gecrasht, opnieuw opbouwen in dit proces.")
+        _discard_report_executor(executor)
+        return [build_report(kind, data) for _cid, kind, _version, data in jobs]
+
+
+def _snapshot_version(data):
+    # Voor rijen zonder change_seq (nog niet genummerd): versie uit de inhoud
+    raw = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return "h" + hashlib.sha1(raw).hexdigest()[:16]
+
+
+def company_reports(company_ids, kinds):
+    """
+    Rapporten voor meerdere bedrijven: {(company_id, soort): (naam, bytes)}.
+    Cache hits lezen enkel (id, naam, change_seq); enkel voor de missers worden
+    de volledige bedrijven geladen en de rapporten parallel gebouwd.
+    Onbekende company_ids worden overgeslagen.
+    """
+    cache = report_cache()
+    rows = (
+        db.session.query(Company.company_id, Company.name, Company.change_seq)
+        .filter(Company.company_id.in_(company_ids))
+        .all()
+    )
+
+    reports = {}
+    misses = []
+    for company_id, name, change_seq in rows:
+        for kind in kinds:
+            content = cache.get(company_id, change_seq, kind) if change_seq is not None else None
+            if content is None:
+                misses.append((company_id, kind))
+            else:
+                reports[(company_id, kind)] = (name, content)
+
+    if not misses:
+        return reports
+
+    companies = {
+        c.company_id: c
+        for c in company_query("export").filter(Company.company_id.in_({cid for cid, _ in misses}))
+    }
+
+    jobs = []
+    for company_id, kind in misses:
+        company = companies.get(company_id)
+        if company is None:
+            continue
+        data = report_snapshot(company)
+        version = company.change_seq if company.change_seq is not None else _snapshot_version(data)
+        content = cache.get(company_id, version, kind) if company.change_seq is None else None
+        if content is not None:
+            reports[(company_id, kind)] = (company.name, content)
+        else:
+            jobs.append((company_id, kind, version, data))
+
+    if current_app.config["EXPORT_WORKERS"] > 0 and jobs:
+        results = _build_reports(jobs)
+    else:
+        results = [build_report(kind, data) for _cid, kind, _version, data in jobs]
+
+    for (company_id, kind, version, data), content in zip(jobs, results):
+        cache.put(company_id, version, kind, content)
+        reports[(company_id, kind)] = (data["name"], content)
+    return reports
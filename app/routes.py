@@ -1,16 +1,52 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, Response, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, session, Response, jsonify, stream_with_context, abort
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
 from app.models import AppUser, Company, Metric, AuditLog, ChangeEvent, MetricHistory, Sector
 from decimal import Decimal
 import csv
 import io
+import zipfile
+import click
 from app.scraper import scrape_website
-from datetime import datetime
+from app.history import (to_utc_naive, record_rollup_point, rebuild_rollup_point, rebuild_all_rollups,
+                         pick_resolution, series_range_start, load_series_columns)
+from app.charts import downsample_columns
+from app.similarity import invalidate_company_features
+from app.company_listing import company_page, COMPANY_PAGE_SIZE
+from app.load_profiles import company_query
+from app.watchlist import latest_metrics, recent_audit_logs
+from app.report_exports import company_reports, report_cache, report_filename, REPORT_KINDS, REPORT_LAYOUT_VERSION
+from app.changes import change_page, backfill_change_seq, touch_company, CHANGES_PAGE_SIZE
+from app.conditional import (company_version, company_detail_etag, data_version, make_etag,
+                             not_modified, similar_neighbours, with_validators)
+from app.fragment_cache import fragment_cache, invalidate_company_fragments, forget_local_fragments
+from app.cache import on_company_change, sync_cache_version, cache_sync_stats
+from app.audit_export import (audit_log_query, audit_export_chunks, gzip_chunks, parse_export_bound,
+                              AUDIT_EXPORT_FORMATS)
+from app.alerts import (alert_page, change_event_count, recount_change_events, ALERT_PAGE_SIZE,
+                        event_feed_query, stream_event_records, EVENT_FEED_PAGE_SIZE, EVENT_FEED_PAGE_MAX)
+from app.competitors import (sync_company_competitors, distinct_competitor_names, competitor_name_count,
+                             rebuild_all_competitor_names, COMPETITOR_PAGE_SIZE,
+                             out_edges, in_edges, listed_by, competitor_neighbourhood)
+from app.similarity_store import (find_similar_companies, find_similar_companies_batch, refresh_company_similarity,
+                                  remove_company_similarity, rebuild_all_similarity, stored_similar_companies)
+import hashlib
+import json
+from datetime import date, datetime
 from app.auth import login_required
 from app.auth import admin_required
 
-bp = Blueprint('main', __name__)
+bp = Blueprint('main', __name__, cli_group=None)
+
+# Caches per proces die wijzigingen uit andere workers moeten volgen (zie app/cache.py)
+on_company_change(invalidate_company_features)
+on_company_change(forget_local_fragments)
+
+
+@bp.before_app_request
+def sync_process_caches():
+    sync_cache_version()
+
 
 METRIC_OPTIONS = ["Pricing", "Features", "Reviews", "Funding", "Hiring"]
 
@@ -190,17 +226,19 @@ def features_from_company(company):
     return 0, "Geen features"
 
 
-def extract_positive_reviews(company):
+def extract_positive_reviews(company, use_google=True):
     from app.google_reviews import get_google_reviews
 
     """
     Eerst proberen we officiële Google Reviews API.
     Als er niks is → fallback op AI / tekstdetectie.
+    use_google=False: enkel de tekstdetectie (geen externe calls, bv. tijdens renderen).
     """
     # 1) Google API proberen
-    count, label = get_google_reviews(company.name)
-    if count > 0:
-        return count, label
+    if use_google:
+        count, label = get_google_reviews(company.name)
+        if count > 0:
+            return count, label
 
     # 2) fallback
     text = ((company.traction_signals or "") + " " + (company.ai_summary or "")).lower()
@@ -296,7 +334,13 @@ def backfill_historical_metrics(company_id: int, historical_list: list):
       date: "YYYY-MM-DD"
       value: numeriek
       source: "explicit" | "inferred" (we slaan het als 'inferred' op)
+
+    Idempotent: upsert op de natuurlijke sleutel
+    (company_id, name, recorded_at, source). Een bestaand punt krijgt de
+    meest recente schatting, ongewijzigde punten worden niet opnieuw geschreven.
     """
+    # Laatste schatting per sleutel wint (ook binnen dezelfde AI-output)
+    incoming = {}
     for item in historical_list or []:
         name = item.get("name")
         date_str = item.get("date")
@@ -317,14 +361,34 @@ def backfill_historical_metrics(company_id: int, historical_list: list):
             except Exception:
                 pass
 
-        hist = MetricHistory(
-            company_id=company_id,
-            name=name,
-            value=num_value,
-            recorded_at=recorded_at,
-            source="inferred"
-        )
-        db.session.add(hist)
+        incoming[(name, to_utc_naive(recorded_at))] = (recorded_at, num_value)
+
+    if not incoming:
+        return
+
+    # Bestaande inferred punten van dit bedrijf in één query ophalen
+    existing_rows = (MetricHistory.query
+                     .filter_by(company_id=company_id, source="inferred")
+                     .filter(MetricHistory.name.in_({name for name, _ in incoming}))
+                     .order_by(MetricHistory.id.asc())
+                     .all())
+    existing = {(r.name, to_utc_naive(r.recorded_at)): r for r in existing_rows}
+
+    for key, (recorded_at, num_value) in incoming.items():
+        hist = existing.get(key)
+
+        if hist is None:
+            db.session.add(MetricHistory(
+                company_id=company_id,
+                name=key[0],
+                value=num_value,
+                recorded_at=recorded_at,
+                source="inferred"
+            ))
+            record_rollup_point(company_id, key[0], recorded_at, num_value)
+        elif hist.value != num_value:
+            hist.value = num_value
+            rebuild_rollup_point(company_id, key[0], recorded_at)
 
 
 def track_metric_history(company_id: int, name: str, value, source: str = "snapshot"):
@@ -344,13 +408,16 @@ def track_metric_history(company_id: int, name: str, value, source: str = "snaps
         except Exception:
             num_value = None
 
+    recorded_at = datetime.utcnow()
     hist = MetricHistory(
         company_id=company_id,
         name=name,
         value=num_value,
+        recorded_at=recorded_at,
         source=source
     )
     db.session.add(hist)
+    record_rollup_point(company_id, name, recorded_at, num_value)
 
 
 
@@ -465,7 +532,7 @@ def refresh_all_companies():
     app = create_app()
     with app.app_context():
         
-        companies_to_refresh = Company.query.all()
+        companies_to_refresh = company_query("detail").all()
         
         if not companies_to_refresh:
             print("Scheduler: Geen bedrijven gevonden om te verversen.")
@@ -586,6 +653,9 @@ def refresh_all_companies():
                 existing.pricing = result.get("pricing")
                 existing.key_features = result.get("key_features")
                 existing.competitors = result.get("competitors")
+                touch_company(existing)
+                invalidate_company_features(existing.company_id)
+                invalidate_company_fragments(existing.company_id)
                 
                 # 3) METRICS UPDATEN & GESCHIEDENIS TRACKEN
                 update_company_metrics(existing)
@@ -609,6 +679,12 @@ def refresh_all_companies():
         db.session.commit()
         print(f"Scheduler: Succesvol {refreshed_count} bedrijven ververst.")
 
+        # Vergelijkbare bedrijven en competitor-graaf in één keer herberekenen
+        # (namen, domeinen en competitor-lijsten kunnen allemaal gewijzigd zijn)
+        if refreshed_count:
+            rebuild_all_similarity()
+            rebuild_all_competitor_names()
+
     return # Geen return code of jsonify nodig
 
 # =====================================================
@@ -667,8 +743,11 @@ def dashboard():
             ]
 
         # --- COMPETITOR CONFIG
+        # Enkel de competitors van de getoonde pagina worden overschreven
         elif form_type == 'competitor_config':
-            session['tracked_competitors'] = request.form.getlist('competitors')
+            shown = set(request.form.getlist('competitors_shown'))
+            kept = [c for c in session.get('tracked_competitors', []) if c not in shown]
+            session['tracked_competitors'] = kept + request.form.getlist('competitors')
 
         # --- SCRAPE
         elif form_type == 'scrape':
@@ -683,34 +762,22 @@ def dashboard():
     competitors_selected = session.get('tracked_competitors', [])
 
     companies_watchlist = (
-        Company.query.filter(Company.company_id.in_(watchlist_ids)).all()
+        company_query("name").filter(Company.company_id.in_(watchlist_ids)).all()
         if watchlist_ids else []
     )
 
-    all_companies = Company.query.all()
+    # Enkel id + naam nodig voor de watchlist-selectie
+    all_companies = company_query("name").all()
 
     # ----------------------------------------
-    # ALLE DETECTEERDE COMPETITORS UIT DATABASE
+    # ALLE DETECTEERDE COMPETITORS (competitor_name tabel, gepagineerd)
     # ----------------------------------------
-    all_detected_competitors = set()
-
-    for comp in all_companies:
-        if comp.competitors:
-            for c in comp.competitors:
-                competitor_name = ""
-
-                if isinstance(c, dict):
-                    competitor_name = c.get('name') or c.get('company_name') or ""
-                    if not competitor_name:
-                        print(f"DEBUG: Found a competitor dict without a 'name': {c}")
-
-                elif isinstance(c, str):
-                    competitor_name = c
-
-                if competitor_name and competitor_name.strip() != "":
-                    all_detected_competitors.add(competitor_name)
-
-    all_detected_competitors = sorted(all_detected_competitors)
+    competitor_page = max(1, request.args.get('competitor_page', 1, type=int))
+    competitor_total = competitor_name_count()
+    all_detected_competitors = distinct_competitor_names(
+        limit=COMPETITOR_PAGE_SIZE,
+        offset=(competitor_page - 1) * COMPETITOR_PAGE_SIZE,
+    )
 
     # ----------------------------------------
     # ALERTS = CHANGEEVENTS VAN GEMONITORDE COMPANIES (WATCHLIST)
@@ -734,7 +801,7 @@ def dashboard():
     # ✅ N+1 FIX: companies in bulk ophalen
     company_ids = {e.company_id for e in recent_events_raw}
     companies_bulk = (
-        Company.query.filter(Company.company_id.in_(company_ids)).all()
+        company_query("name").filter(Company.company_id.in_(company_ids)).all()
         if company_ids else []
     )
     company_name_by_id = {c.company_id: c.name for c in companies_bulk}
@@ -760,8 +827,10 @@ def dashboard():
         metrics_selected=metrics_selected,
         competitors_selected=competitors_selected,
         all_competitors=all_detected_competitors,
+        competitor_page=competitor_page,
+        competitor_has_next=competitor_page * COMPETITOR_PAGE_SIZE < competitor_total,
         companies=all_companies,
-        more_alerts_count=max(0, ChangeEvent.query.count() - 3)
+        more_alerts_count=max(0, change_event_count() - 3)
     )
 
 # =====================================================
@@ -771,31 +840,60 @@ def dashboard():
 @bp.route('/company/<int:company_id>')
 @login_required
 def company_detail(company_id):
-    company = Company.query.get_or_404(company_id)
+    # Eerst enkel de versie: ongewijzigd → 304 zonder de zware queries hieronder
+    version = company_version(company_id)
+    if version is None:
+        abort(404)
+    neighbours = similar_neighbours(company_id, top_n=5)
+    etag = company_detail_etag(company_id, version, neighbours)
+    cached = not_modified(etag, version[1])
+    if cached is not None:
+        return cached
+
+    # Titel en exportknoppen hebben enkel id + naam nodig; de rest van de
+    # pagina komt uit de fragmentcache en wordt enkel bij een miss opgebouwd
+    company = company_query("name").get_or_404(company_id)
+    cache = fragment_cache()
+    loaded = {}
+
+    def detail_company():
+        # Volledig profiel pas laden als een fragment effectief gerenderd wordt
+        if "company" not in loaded:
+            loaded["company"] = company_query("detail").populate_existing().get(company_id)
+        return loaded["company"]
 
-    # --------- WIJZIGINGEN / EVENTS ---------
-    events = (ChangeEvent.query
-              .filter_by(company_id=company_id)
-              .order_by(ChangeEvent.detected_at.desc())
-              .all())
+    # --------- PRICING TIER (badge + chart) ---------
+    def pricing_tier():
+        if "pricing_tier" in loaded:
+            return loaded["pricing_tier"]
+
+        latest_pricing = (db.session.query(MetricHistory.value)
+                          .filter(MetricHistory.company_id == company_id,
+                                  MetricHistory.name == "Pricing",
+                                  MetricHistory.value.isnot(None))
+                          .order_by(MetricHistory.recorded_at.desc())
+                          .limit(1)
+                          .scalar())
+
+        pricing_tier_code = 0
+        if latest_pricing is not None:
+            try:
+                pricing_tier_code = int(round(float(latest_pricing)))
+            except Exception:
+                pricing_tier_code = 0
 
-    # --------- HISTORIEK VOOR GRAFIEKEN ---------
-    def history_series(metric_name: str):
-        rows = (MetricHistory.query
-                .filter_by(company_id=company_id, name=metric_name)
-                .order_by(MetricHistory.recorded_at.asc())
-                .all())
-        labels = [r.recorded_at.strftime("%Y-%m-%d %H:%M") for r in rows]
-        values = [float(r.value) if r.value is not None else None for r in rows]
-        return labels, values
-    pricing_labels, pricing_values = history_series("Pricing")
-    # Hiring chart gebruikt in de template de variabelen hiring_labels/hiring_values,
-    # maar we willen daar eigenlijk Team Size tonen.
-    hiring_labels, hiring_values = history_series("TeamSize")
-
-    # Fallback: als TeamSize niet in je DB zit, pak dan Hiring
-    if not hiring_labels and not hiring_values:
-        hiring_labels, hiring_values = history_series("Hiring")
+        pricing_tier_code = max(0, min(5, pricing_tier_code))
+
+        tier_labels = {
+            0: "Onbekend",
+            1: "Gratis / Freemium",
+            2: "Lage prijsklasse",
+            3: "Midden segment",
+            4: "Hoge prijsklasse",
+            5: "Enterprise",
+        }
+        loaded["pricing_tier"] = (pricing_tier_code, tier_labels.get(pricing_tier_code, "Onbekend"))
+        return loaded["pricing_tier"]
 
     # --------- REVIEW DISTRIBUTIE (zoals gisteren) ---------
     def review_distribution(company):
@@ -821,59 +919,159 @@ def company_detail(company_id):
 
         return dist
 
-    review_distribution_values = review_distribution(company)
-
-    # --------- PRICING TIER (badge + chart) ---------
-    pricing_tier_code = 0
-    if pricing_values:
-        for v in reversed(pricing_values):
-            if v is not None:
-                try:
-                    pricing_tier_code = int(round(float(v)))
-                except Exception:
-                    pricing_tier_code = 0
-                break
-
-    pricing_tier_code = max(0, min(5, pricing_tier_code))
-
-    tier_labels = {
-        0: "Onbekend",
-        1: "Gratis / Freemium",
-        2: "Lage prijsklasse",
-        3: "Midden segment",
-        4: "Hoge prijsklasse",
-        5: "Enterprise",
-    }
-    pricing_tier_label = tier_labels.get(pricing_tier_code, "Onbekend")
+    def render_profile():
+        pricing_tier_code, pricing_tier_label = pricing_tier()
+        return render_template("includes/company_profile.html", company=detail_company(),
+                               pricing_tier_label=pricing_tier_label, pricing_tier_code=pricing_tier_code)
 
     # --------- SIMILAR COMPANIES (SECTOR-FILTER) ---------
-    from app.similarity import top_similar_companies_in_same_sector
-    all_companies = Company.query.all()
-    similar = top_similar_companies_in_same_sector(company, all_companies, top_n=5)
+    # Gematerialiseerd in company_similarity; nog niet berekend → live berekenen
+    def render_similar():
+        similar = stored_similar_companies(company_id, top_n=5)
+        if not similar:
+            similar = find_similar_companies(detail_company(), company_query("similarity").all(), top_n=5)
+        return render_template("includes/company_similar.html", similar=similar)
+
+    # --------- HISTORIEK VOOR GRAFIEKEN ---------
+    # De reeksen zelf worden na de eerste paint asynchroon opgehaald
+    # via company_chart_data; hier enkel reviews en het laatste pricing-niveau.
+    def render_trends():
+        return render_template("includes/company_trends.html", company=company,
+                               review_distribution_values=review_distribution(company),
+                               pricing_tier_code=pricing_tier()[0])
+
+    # --------- WIJZIGINGEN / EVENTS ---------
+    # Het fragment toont er 3 en een link als er meer zijn
+    def render_events():
+        events = (ChangeEvent.query
+                  .filter_by(company_id=company_id)
+                  .order_by(ChangeEvent.detected_at.desc())
+                  .limit(4)
+                  .all())
+        return render_template("includes/company_events.html", company=company, events=events)
+
+    # Buren komen uit company_similarity; zonder bewaarde buren wordt live
+    # berekend en hangt het resultaat af van alle bedrijven (data_version)
+    similar_token = neighbours or ["live", data_version()]
+    fragments = {
+        "profile": cache.render(company_id, "profile", version, render_profile),
+        "similar": cache.render(company_id, "similar", similar_token, render_similar),
+        "trends": cache.render(company_id, "trends", [version, date.today().isoformat()], render_trends),
+        "events": cache.render(company_id, "events", version, render_events),
+    }
 
     # --------- RENDER ---------
-    return render_template(
-        "company_detail.html",
-        company=company,
-        events=events,
+    page = render_template("company_detail.html", company=company, fragments=fragments)
+    return with_validators(page, etag, version[1])
 
-        # grafieken
-        pricing_labels=pricing_labels,
-        pricing_values=pricing_values,
-        hiring_labels=hiring_labels,
-        hiring_values=hiring_values,
 
-        # reviews
-        review_distribution_values=review_distribution_values,
 
-        # pricing badge
-        pricing_tier_label=pricing_tier_label,
-        pricing_tier_code=pricing_tier_code,
+# =====================================================
+# COMPANY DETAIL: GRAFIEKDATA (JSON, ASYNC GELADEN)
+# =====================================================
 
-        # vergelijkbare bedrijven
-        similar=similar,
-    )
+# Maximum aantal rollup-punten per reeks dat we lezen vóór LTTB-downsampling
+CHART_SOURCE_POINTS = 2000
+
+
+def chart_series_payload(company_id: int, metric_names, max_points: int):
+    """
+    Laadt alle gevraagde reeksen in één query (zelfde resolutie voor allemaal)
+    en downsampelt elke reeks met LTTB tot max_points punten.
+    """
+    start = series_range_start(company_id, metric_names)
+    if start is None:
+        columns = {name: ([], []) for name in metric_names}
+    else:
+        resolution = pick_resolution(start, datetime.utcnow(), CHART_SOURCE_POINTS)
+        columns = load_series_columns(company_id, metric_names, resolution=resolution)
 
+    series = {}
+    for name, (timestamps, values) in columns.items():
+        timestamps, values = downsample_columns(timestamps, values, max_points)
+        series[name] = {
+            "labels": [datetime.utcfromtimestamp(t).strftime("%Y-%m-%d") for t in timestamps],
+            "values": [float(v) for v in values],
+        }
+    return series
+
+
+def conditional_json(payload, etag=None, last_modified=None):
+    """
+    JSON-response met ETag; If-None-Match → 304 Not Modified.
+    Zonder etag wordt die uit de inhoud berekend.
+    """
+    body = json.dumps(payload, separators=(",", ":"))
+    response = Response(body, mimetype="application/json")
+    if etag is None:
+        etag = hashlib.sha1(body.encode("utf-8")).hexdigest()
+    return with_validators(response, etag, last_modified).make_conditional(request)
+
+
+def chart_precondition(company_id, metric_names, max_points):
+    """
+    (etag, last_modified, 304-response of None) voor de grafiekdata van een bedrijf,
+    op basis van de bedrijfsversie (de scrape/refresh-writers raken het bedrijf aan).
+    Onbekend bedrijf → (None, None, None): dan geldt de content-ETag.
+    """
+    version = company_version(company_id)
+    if version is None:
+        return None, None, None
+    etag = make_etag("charts", company_id, version[0], version[1], metric_names, max_points)
+    return etag, version[1], not_modified(etag, version[1])
+
+
+def _chart_max_points():
+    max_points = request.args.get("max_points", 200, type=int)
+    return max(3, min(CHART_SOURCE_POINTS, max_points))
+
+
+@bp.route('/company/<int:company_id>/charts')
+@login_required
+def company_charts_data(company_id):
+    """
+    Meerdere tijdreeksen van één bedrijf in één request (en één historiek-query).
+    Parameters:
+      ?metrics=Pricing,TeamSize,Hiring
+      ?max_points=200  (LTTB-downsampling, tussen 3 en CHART_SOURCE_POINTS)
+    """
+    metric_names = [m.strip() for m in request.args.get("metrics", "").split(",") if m.strip()]
+    if not metric_names:
+        return jsonify({"error": "Geef minstens één metric op via ?metrics=..."}), 400
+
+    max_points = _chart_max_points()
+    etag, last_modified, cached = chart_precondition(company_id, metric_names, max_points)
+    if cached is not None:
+        return cached
+
+    return conditional_json({
+        "company_id": company_id,
+        "series": chart_series_payload(company_id, metric_names, max_points),
+    }, etag, last_modified)
+
+
+@bp.route('/company/<int:company_id>/charts/<metric_name>')
+@login_required
+def company_chart_data(company_id, metric_name):
+    """
+    Tijdreeks van één metric voor de grafieken op de detailpagina.
+    Optionele parameter:
+      ?max_points=200  (LTTB-downsampling, tussen 3 en CHART_SOURCE_POINTS)
+    Antwoordt met een ETag zodat ongewijzigde reeksen niet opnieuw
+    gedownload worden (304 Not Modified).
+    """
+    max_points = _chart_max_points()
+    etag, last_modified, cached = chart_precondition(company_id, [metric_name], max_points)
+    if cached is not None:
+        return cached
+
+    series = chart_series_payload(company_id, [metric_name], max_points)[metric_name]
+    return conditional_json({
+        "company_id": company_id,
+        "metric": metric_name,
+        "labels": series["labels"],
+        "values": series["values"],
+    }, etag, last_modified)
 
 
 # =====================================================
@@ -890,7 +1088,10 @@ def watchlist():
         ids = []
 
     metrics_selected = session.get('watchlist_metrics', [])
-    companies = Company.query.filter(Company.company_id.in_(ids)).all() if ids else []
+    companies = company_query("detail").filter(Company.company_id.in_(ids)).all() if ids else []
+
+    # Eén query voor alle (bedrijf, metric)-combinaties i.p.v. één per cel
+    metrics_by_key = latest_metrics([c.company_id for c in companies], metrics_selected)
 
     comparison_rows = []
     for c in companies:
@@ -899,16 +1100,9 @@ def watchlist():
         for m_label in metrics_selected:
             label_lower = m_label.lower()
 
-            # Haal eventueel een bijhorende Metric op
-            metric = (
-                Metric.query
-                .filter(
-                    Metric.company_id == c.company_id,
-                    db.func.lower(Metric.name) == label_lower
-                )
-                .order_by(Metric.last_updated.desc())
-                .first()
-            )
+            # Eventueel bijhorende Metric: (description, value) of None
+            metric = metrics_by_key.get((c.company_id, label_lower))
+            metric_description, metric_value = metric if metric else (None, None)
 
             # -----------------------------
             # SPECIALE CASE: PRICING
@@ -919,11 +1113,11 @@ def watchlist():
                 # Categorie uit Metric (bijv. "Lage prijsklasse")
                 metric_label = None
                 if metric:
-                    if metric.description and metric.description.strip().lower() != "onbekend":
-                        metric_label = metric.description.strip()
+                    if metric_description and metric_description.strip().lower() != "onbekend":
+                        metric_label = metric_description.strip()
                     # → FIX: toon '0' NIET
-                    elif metric.value is not None and metric.value != 0:
-                        metric_label = str(metric.value)
+                    elif metric_value is not None and metric_value != 0:
+                        metric_label = str(metric_value)
 
                 # Combineer categorie + tekst, MAAR ‘0 – ...’ mag niet meer voorkomen
                 if company_pricing and metric_label:
@@ -940,15 +1134,16 @@ def watchlist():
             # ANDERE METRICS
             # -----------------------------
             else:
-                if metric and (metric.description or metric.value is not None):
+                if metric and (metric_description or metric_value is not None):
                     # Gebruik description als die bestaat, anders numeric value
-                    display = metric.description or str(metric.value)
+                    display = metric_description or str(metric_value)
                 else:
                     # Fallback op basis van company-velden
+                    # (reviews zonder Google-call: geen externe requests tijdens het renderen)
                     if label_lower == "features":
                         _, display = features_from_company(c)
                     elif label_lower == "reviews":
-                        _, display = extract_positive_reviews(c)
+                        _, display = extract_positive_reviews(c, use_google=False)
                     elif label_lower == "funding":
                         _, display = format_funding_for_metric(c)
                     elif label_lower == "hiring":
@@ -960,12 +1155,8 @@ def watchlist():
 
         comparison_rows.append({'company': c, 'metrics': metric_values})
 
-    # Audit logs per bedrijf
-    logs_by_company = {
-        c.company_id: AuditLog.query.filter_by(company_id=c.company_id)
-        .order_by(AuditLog.retrieved_at.desc()).all()
-        for c in companies
-    }
+    # Laatste audit logs per bedrijf (één gewindowde query)
+    logs_by_company = recent_audit_logs([c.company_id for c in companies])
 
     return render_template(
         'watchlist.html',
@@ -980,11 +1171,38 @@ def watchlist():
 # EXPORT WATCHLIST AUDIT (CSV / JSON)
 # =====================================================
 
+def audit_export_response(company_ids, filename):
+    """
+    Streaming audit-export voor de huidige request.
+    Parameters:
+      ?format=csv|json|ndjson   (standaard csv)
+      ?since=2025-12-01         (inclusief)
+      ?until=2025-12-31         (een datum telt de hele dag mee)
+      ?gzip=1                   (Content-Encoding: gzip)
+    """
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in AUDIT_EXPORT_FORMATS:
+        fmt = "csv"
+    mimetype, extension = AUDIT_EXPORT_FORMATS[fmt]
+
+    try:
+        since = parse_export_bound(request.args.get("since"))
+        until = parse_export_bound(request.args.get("until"), end=True)
+    except ValueError:
+        return "Ongeldige datum voor since/until.", 400
+
+    chunks = audit_export_chunks(audit_log_query(company_ids, since, until), fmt)
+    headers = {"Content-Disposition": f"attachment; filename={filename}.{extension}"}
+    if request.args.get("gzip") == "1":
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+
 @bp.route('/export-watchlist-audit')
 @login_required
 def export_watchlist_audit():
-    fmt = request.args.get("format", "csv").lower()
-
     ids = session.get('watchlist_companies', [])
     if not ids:
         return "Geen bedrijven in watchlist.", 400
@@ -994,48 +1212,7 @@ def export_watchlist_audit():
     except Exception:
         return "Ongeldige watchlist IDs.", 400
 
-    logs = (
-        AuditLog.query
-        .filter(AuditLog.company_id.in_(ids))
-        .order_by(AuditLog.retrieved_at.desc())
-        .all()
-    )
-
-    # ✅ N+1 FIX: company names in bulk ophalen
-    company_ids = {log.company_id for log in logs}
-    companies_bulk = Company.query.filter(Company.company_id.in_(company_ids)).all() if company_ids else []
-    company_name_by_id = {c.company_id: c.name for c in companies_bulk}
-
-    # JSON export
-    if fmt == "json":
-        out = []
-        for log in logs:
-            out.append({
-                "company": company_name_by_id.get(log.company_id, "Onbekend"),
-                "source_name": log.source_name,
-                "source_url": log.source_url,
-                "retrieved_at": log.retrieved_at.isoformat() if log.retrieved_at else None
-            })
-        return jsonify(out)
-
-    # CSV export
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["Company", "Source Name", "Source URL", "Retrieved At"])
-
-    for log in logs:
-        writer.writerow([
-            company_name_by_id.get(log.company_id, "Onbekend"),
-            log.source_name,
-            log.source_url,
-            log.retrieved_at.isoformat() if log.retrieved_at else ""
-        ])
-
-    return Response(
-        output.getvalue(),
-        mimetype="text/csv",
-        headers={"Content-Disposition": "attachment; filename=audit_export.csv"}
-    )
+    return audit_export_response(ids, "audit_export")
 
 
 
@@ -1065,15 +1242,20 @@ def companies():
             except Exception:
                 message = "❌ Kon niet aan watchlist toevoegen."
 
-    # --- Sectorfilter uit querystring ---
+    # --- Sector- en naamfilter uit querystring ---
     selected_sector_id = request.args.get('sector_id', type=int)
+    name_filter = (request.args.get('q') or '').strip()
 
-    query = Company.query
-
-    if selected_sector_id:
-        query = query.filter(Company.sector_id == selected_sector_id)
-
-    companies = query.all()
+    # --- Keyset paginering op (naam, id), enkel de lijstkolommen ---
+    try:
+        companies, prev_cursor, next_cursor = company_page(
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            name_filter=name_filter,
+            sector_id=selected_sector_id,
+        )
+    except ValueError:
+        return redirect(url_for('main.companies', sector_id=selected_sector_id, q=name_filter or None))
 
     # Alle sectoren voor de dropdown
     sectors = Sector.query.order_by(Sector.name.asc()).all()
@@ -1083,135 +1265,155 @@ def companies():
         companies=companies,
         sectors=sectors,
         selected_sector_id=selected_sector_id,
+        name_filter=name_filter,
+        prev_cursor=prev_cursor,
+        next_cursor=next_cursor,
         message=message
     )
 
 
+@bp.route('/api/companies')
+@login_required
+def api_companies():
+    """
+    Bedrijvenlijst als JSON met keyset paginering.
+    Optionele parameters:
+      ?q=nike          (naam bevat, hoofdletterongevoelig)
+      ?sector_id=4
+      ?limit=50        (max COMPANY_PAGE_MAX)
+      ?after=<cursor>  (next_cursor van de vorige pagina)
+    """
+    # Zelfde query + geen enkele wijziging aan bedrijven sinds de vorige keer → 304
+    version = data_version()
+    etag = make_etag("api_companies", version, request.query_string.decode("utf-8")) if version is not None else None
+    if etag is not None:
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+
+    try:
+        rows, _prev_cursor, next_cursor = company_page(
+            after=request.args.get('after'),
+            limit=request.args.get('limit', COMPANY_PAGE_SIZE, type=int),
+            name_filter=(request.args.get('q') or '').strip(),
+            sector_id=request.args.get('sector_id', type=int),
+        )
+    except ValueError:
+        return jsonify({"error": "Ongeldige cursor."}), 400
+
+    response = jsonify({
+        "companies": [
+            {
+                "company_id": c.company_id,
+                "name": c.name,
+                "website_url": c.website_url,
+                "sector_id": c.sector_id,
+                "sector_name": sector_name,
+                "headquarters": c.headquarters,
+                "team_size": c.team_size,
+                "funding": c.funding,
+            }
+            for c, sector_name in rows
+        ],
+        "next_cursor": next_cursor,
+    })
+    return with_validators(response, etag) if etag is not None else response
+
+
 # =====================================================
 # EXPORT: One-click company profile (VC analyst)
 # =====================================================
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4
-from pptx import Presentation
-from pptx.util import Inches, Pt
 
-@bp.route('/company/<int:company_id>/export-pdf')
-@login_required
-def export_pdf(company_id):
-    company = Company.query.get_or_404(company_id)
+def report_response(company_id, kind):
+    """Gecacht (of in de process pool gebouwd) rapport van één bedrijf als download."""
+    version = company_version(company_id)
+    if version is None:
+        abort(404)
+    etag = make_etag("report", company_id, kind, version[0], version[1], REPORT_LAYOUT_VERSION)
+    cached = not_modified(etag, version[1])
+    if cached is not None:
+        return cached
 
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    story = []
-
-    # Title
-    story.append(Paragraph(f"<b>{company.name}</b>", styles['Title']))
-    story.append(Spacer(1, 16))
-
-    fields = [
-        ("Website", company.website_url),
-        ("Value Proposition", company.value_proposition),
-        ("Product Description", company.product_description),
-        ("Target Segment", company.target_segment),
-        ("Pricing", company.pricing),
-        ("Funding", str(company.funding)),
-        ("Team Size", str(company.team_size)),
-        ("Traction signals", company.traction_signals),
-    ]
-
-    for title, value in fields:
-        story.append(Paragraph(f"<b>{title}</b><br/>{value or '—'}", styles['BodyText']))
-        story.append(Spacer(1, 12))
-
-    # Features
-    if company.key_features:
-        story.append(Paragraph("<b>Key Features</b>", styles['Heading2']))
-        for f in company.key_features:
-            story.append(Paragraph(f"- {f}", styles['BodyText']))
-        story.append(Spacer(1, 12))
+    reports = company_reports([company_id], [kind])
+    if (company_id, kind) not in reports:
+        abort(404)
 
-    # Competitors
-    if company.competitors:
-        story.append(Paragraph("<b>Competitors</b>", styles['Heading2']))
-        for comp in company.competitors:
-            story.append(Paragraph(f"- {comp}", styles['BodyText']))
+    name, content = reports[(company_id, kind)]
+    return with_validators(Response(
+        content,
+        mimetype=REPORT_KINDS[kind][0],
+        headers={"Content-Disposition": f"attachment; filename={report_filename(name, kind)}"}
+    ), etag, version[1])
 
-    doc.build(story)
-    buffer.seek(0)
 
-    return Response(
-        buffer,
-        mimetype="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={company.name}_Report.pdf"}
-    )
+@bp.route('/company/<int:company_id>/export-pdf')
+@login_required
+def export_pdf(company_id):
+    return report_response(company_id, "pdf")
 
 @bp.route('/company/<int:company_id>/export-slides')
 @login_required
 def export_slides(company_id):
-    company = Company.query.get_or_404(company_id)
-
-    prs = Presentation()
-    title_slide_layout = prs.slide_layouts[0]
-    slide = prs.slides.add_slide(title_slide_layout)
-
-    # Title Page
-    slide.shapes.title.text = company.name
-    slide.placeholders[1].text = "Baseline Analysis"
-
-    # Content slides
-    def add_slide(title, content_list):
-        layout = prs.slide_layouts[1]
-        slide = prs.slides.add_slide(layout)
-        slide.shapes.title.text = title
-        body = slide.placeholders[1].text_frame
-
-        for c in (content_list or []):
-            if isinstance(c, dict):
-                name = c.get("name") or c.get("company_name") or ""
-                desc = c.get("description") or ""
-                text = name.strip()
-                if desc and desc.strip():
-                    text = f"{text} — {desc.strip()}" if text else desc.strip()
-                if not text:
-                    text = str(c)
-            else:
-                text = str(c)
+    return report_response(company_id, "pptx")
 
-            body.add_paragraph().text = text
 
-    add_slide("What they do", [
-        company.value_proposition or "—",
-        company.product_description or "—"
-    ])
+@bp.route('/watchlist/export-reports')
+@login_required
+def export_watchlist_reports():
+    """
+    Zip met de rapporten van alle bedrijven op de watchlist.
+      ?format=pdf | pptx | all   (standaard all)
+    Ontbrekende rapporten worden parallel gebouwd.
+    """
+    ids = session.get('watchlist_companies', [])
+    if not ids:
+        return "Geen bedrijven in watchlist.", 400
 
-    add_slide("Target Segment", [company.target_segment or "—"])
-    add_slide("Pricing", [company.pricing or "—"])
+    try:
+        ids = [int(cid) for cid in ids]
+    except Exception:
+        return "Ongeldige watchlist IDs.", 400
 
-    if company.key_features:
-        add_slide("Key Features", company.key_features)
+    fmt = request.args.get("format", "all").lower()
+    kinds = [fmt] if fmt in REPORT_KINDS else list(REPORT_KINDS)
 
-    if company.competitors:
-        add_slide("Competitors", company.competitors)
+    reports = company_reports(ids, kinds)
 
-    # Save file to memory
     buffer = io.BytesIO()
-    prs.save(buffer)
-    buffer.seek(0)
+    # PDF en PPTX zijn zelf al gecomprimeerd
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for (company_id, kind), (name, content) in sorted(reports.items()):
+            safe_name = (name or str(company_id)).replace("/", "-").replace("\\", "-")
+            archive.writestr(f"{company_id}_{report_filename(safe_name, kind)}", content)
 
     return Response(
-        buffer,
-        mimetype="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-        headers={"Content-Disposition": f"attachment; filename={company.name}_Slides.pptx"}
+        buffer.getvalue(),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=watchlist_reports.zip"}
     )
 
 @bp.route('/company/<int:company_id>/export')
 @login_required
 def export_company(company_id):
-    c = Company.query.get_or_404(company_id)
     format = request.args.get("format", "json").lower()
 
+    version = company_version(company_id)
+    if version is None:
+        abort(404)
+    etag = make_etag("export_company", company_id, format, version[0], version[1])
+    cached = not_modified(etag, version[1])
+    if cached is not None:
+        return cached
+
+    response = _export_company_response(company_id, format)
+    if response.status_code != 200:
+        return response
+    return with_validators(response, etag, version[1])
+
+
+def _export_company_response(company_id, format):
+    c = company_query("export").get_or_404(company_id)
+
     profile = {
         "company_name": c.name,
         "website": c.website_url,
@@ -1278,7 +1480,7 @@ def export_company(company_id):
             headers={"Content-Disposition": f"attachment; filename={c.name}_memo.txt"}
         )
 
-    return "Unsupported format", 400
+    return Response("Unsupported format", status=400)
 
 
 # =====================================================
@@ -1323,7 +1525,7 @@ def scrape():
         return render_template('scrape.html', result=result, sectors=sectors)
 
     # --- CHECK OF BEDRIJF BESTAAT ---
-    existing = Company.query.filter_by(website_url=url).first()
+    existing = company_query("detail").filter_by(website_url=url).first()
 
     # ============================================
     # UPDATE BESTAAND BEDRIJF
@@ -1415,10 +1617,16 @@ def scrape():
             existing.sector_id = sector_id
             print("DEBUG: existing.company.sector_id ná:", existing.sector_id)
 
+        sync_company_competitors(existing)
+        touch_company(existing)
+        invalidate_company_features(existing.company_id)
+        invalidate_company_fragments(existing.company_id)
+
         # METRICS + HISTORIEK
         update_company_metrics(existing)
         historical = result.get("historical_metrics", [])
         backfill_historical_metrics(existing.company_id, historical)
+        refresh_company_similarity(existing)
 
         db.session.commit()
         print("DEBUG: commit gedaan (bestaand bedrijf)")
@@ -1460,9 +1668,11 @@ def scrape():
         source_url=url
     ))
 
+    sync_company_competitors(new_company)
     update_company_metrics(new_company)
     historical = result.get("historical_metrics", [])
     backfill_historical_metrics(new_company.company_id, historical)
+    refresh_company_similarity(new_company)
 
     db.session.commit()
     print("DEBUG: commit gedaan (nieuw bedrijf)")
@@ -1483,7 +1693,7 @@ def audit_logs():
 
     # ✅ N+1 FIX: company names in bulk ophalen
     company_ids = {log.company_id for log in logs}
-    companies_bulk = Company.query.filter(Company.company_id.in_(company_ids)).all() if company_ids else []
+    companies_bulk = company_query("name").filter(Company.company_id.in_(company_ids)).all() if company_ids else []
     company_name_by_id = {c.company_id: c.name for c in companies_bulk}
 
     enriched_logs = []
@@ -1505,45 +1715,7 @@ def audit_logs():
 @bp.route('/audit-logs/export')
 @admin_required
 def export_all_audit_logs():
-    fmt = request.args.get("format", "csv").lower()
-
-    logs = AuditLog.query.order_by(AuditLog.retrieved_at.desc()).all()
-
-    # ✅ N+1 FIX: company names in bulk ophalen
-    company_ids = {log.company_id for log in logs}
-    companies_bulk = Company.query.filter(Company.company_id.in_(company_ids)).all() if company_ids else []
-    company_name_by_id = {c.company_id: c.name for c in companies_bulk}
-
-    # JSON export
-    if fmt == "json":
-        out = []
-        for log in logs:
-            out.append({
-                "company": company_name_by_id.get(log.company_id, "Onbekend"),
-                "source_name": log.source_name,
-                "source_url": log.source_url,
-                "retrieved_at": log.retrieved_at.isoformat() if log.retrieved_at else None
-            })
-        return jsonify(out)
-
-    # CSV export
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["Company", "Source Name", "Source URL", "Retrieved At"])
-
-    for log in logs:
-        writer.writerow([
-            company_name_by_id.get(log.company_id, "Onbekend"),
-            log.source_name,
-            log.source_url,
-            log.retrieved_at.isoformat() if log.retrieved_at else ""
-        ])
-
-    return Response(
-        output.getvalue(),
-        mimetype="text/csv",
-        headers={"Content-Disposition": "attachment; filename=all_audit_logs.csv"}
-    )
+    return audit_export_response(None, "all_audit_logs")
 
 # =====================================================
 # WEEKLY MAIL SETTINGS
@@ -1587,31 +1759,55 @@ def update_weekly_mail():
 @bp.route("/all-alerts")
 @login_required
 def all_alerts():
-    events = ChangeEvent.query.order_by(
-        ChangeEvent.detected_at.desc()
-    ).all()
-
-    # ✅ N+1 FIX: company names in bulk ophalen
-    company_ids = {e.company_id for e in events}
-    companies_bulk = Company.query.filter(Company.company_id.in_(company_ids)).all() if company_ids else []
-    company_name_by_id = {c.company_id: c.name for c in companies_bulk}
-
-    alerts = []
-    for e in events:
-        alerts.append({
-            "company_id": e.company_id,
-            "company": company_name_by_id.get(e.company_id, "Onbekend bedrijf"),
-            "type": e.event_type,
-            "description": e.description,
-            "time": e.detected_at
-        })
+    # Eerste pagina; de rest via "Meer laden" (api_alerts)
+    alerts, next_cursor = alert_page(limit=ALERT_PAGE_SIZE)
 
     return render_template(
         "all_alerts.html",
         alerts=alerts,
+        next_cursor=next_cursor,
+        total_alerts=change_event_count(),
         company=None
     )
 
+
+@bp.route("/api/alerts")
+@login_required
+def api_alerts():
+    """
+    Volgende pagina meldingen als JSON ("Meer laden").
+    Parameters:
+      ?after=<cursor>   (next_cursor van de vorige pagina)
+      ?company_id=12    (enkel meldingen van dit bedrijf)
+      ?limit=50         (max ALERT_PAGE_MAX)
+    """
+    company_id = request.args.get("company_id", type=int)
+    try:
+        alerts, next_cursor = alert_page(
+            company_id=company_id,
+            after=request.args.get("after"),
+            limit=request.args.get("limit", ALERT_PAGE_SIZE, type=int),
+        )
+    except ValueError:
+        return jsonify({"error": "Ongeldige cursor."}), 400
+
+    return jsonify({
+        "alerts": [
+            {
+                "event_id": a["id"],
+                "company_id": a["company_id"],
+                "company": a["company"],
+                "type": a["type"],
+                "description": a["description"],
+                "detected_at": a["time"].isoformat(),
+                "time_label": a["time"].strftime('%Y-%m-%d %H:%M'),
+                "company_url": url_for("main.company_detail", company_id=a["company_id"]),
+            }
+            for a in alerts
+        ],
+        "next_cursor": next_cursor,
+    })
+
 # =====================================================
 # API: FEED VAN ALLE CHANGE EVENTS (voor BI / analytics)
 # =====================================================
@@ -1628,44 +1824,246 @@ def api_events():
       ?company_id=...
       ?type=pricing_change
       ?since=2025-12-01
+    Incrementeel ophalen (nieuwste eerst, op (detected_at, event_id)):
+      ?limit=500            pagina als {"events": [...], "next_cursor": ...}
+      ?after=<cursor>       verder na dit event (cursor van een vorig event)
+      ?format=ndjson        stream: één event per regel, elk met zijn eigen cursor;
+                            zonder limit de volledige feed via een server-side cursor
+    Zonder limit, after of format: de volledige lijst zoals voorheen.
     """
+    since = None
+    since_str = request.args.get("since")
+    if since_str:
+        try:
+            since = datetime.fromisoformat(since_str)
+        except ValueError:
+            pass
+
+    after = request.args.get("after")
+    limit = request.args.get("limit", type=int)
+    if limit is not None:
+        limit = max(1, min(EVENT_FEED_PAGE_MAX, limit))
+
+    try:
+        query = event_feed_query(
+            company_id=request.args.get("company_id", type=int),
+            event_type=request.args.get("type"),
+            since=since,
+            after=after,
+        )
+    except ValueError:
+        return jsonify({"error": "Ongeldige cursor."}), 400
+
+    if request.args.get("format") == "ndjson":
+        def generate():
+            for record in stream_event_records(query, limit):
+                yield json.dumps(record) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    if limit is None and after is None:
+        return jsonify(list(stream_event_records(query)))
 
-    # ✅ N+1 FIX: query levert meteen Company.name mee
-    query = (
-        db.session.query(ChangeEvent, Company.name)
-        .join(Company, ChangeEvent.company_id == Company.company_id)
+    # Pagina: één rij extra ophalen om te weten of er nog een pagina volgt
+    limit = limit or EVENT_FEED_PAGE_SIZE
+    events = list(stream_event_records(query, limit + 1))
+    more = len(events) > limit
+    events = events[:limit]
+    return jsonify({
+        "events": events,
+        "next_cursor": events[-1]["cursor"] if more else None,
+    })
+
+# =====================================================
+# API: CHANGE FEED (incrementele sync voor BI)
+# =====================================================
+
+@bp.route("/api/changes")
+@admin_required
+def api_changes():
+    """
+    Wijzigingen aan company, metric en metric_history na een volgnummer.
+      ?since=0      (next_since van de vorige pagina; 0 = vanaf het begin)
+      ?limit=500    (max CHANGES_PAGE_MAX)
+    Elke wijziging: {"seq", "table", "op": "upsert"|"delete", "id", "data"}.
+    Zolang has_more true is, verder met since=next_since.
+    """
+    since = request.args.get("since", 0, type=int)
+    changes, next_since, has_more = change_page(
+        since=max(0, since),
+        limit=request.args.get("limit", CHANGES_PAGE_SIZE, type=int),
     )
+    return jsonify({
+        "changes": changes,
+        "next_since": next_since,
+        "has_more": has_more,
+    })
 
-    company_id = request.args.get("company_id", type=int)
-    if company_id:
-        query = query.filter(ChangeEvent.company_id == company_id)
+# =====================================================
+# API: CACHE-STATISTIEKEN
+# =====================================================
 
-    event_type = request.args.get("type")
-    if event_type:
-        query = query.filter(ChangeEvent.event_type == event_type)
+@bp.route("/api/cache-stats")
+@admin_required
+def api_cache_stats():
+    """
+    Hit rate van de fragmentcache van de detailpagina, per fragment, voor de
+    LRU en voor de gedeelde cache, plus de synchronisatie tussen workers.
+    Tellers gelden per proces (elke worker heeft zijn eigen LRU).
+    """
+    return jsonify({"fragments": fragment_cache().stats(), "sync": cache_sync_stats()})
 
-    since_str = request.args.get("since")
-    if since_str:
+# =====================================================
+# API: VERGELIJKBARE BEDRIJVEN IN BATCH
+# =====================================================
+
+# Maximum aantal expliciete ids per aanvraag (een sector mag groter zijn)
+SIMILAR_BATCH_MAX_IDS = 500
+SIMILAR_BATCH_MAX_TOP_N = 50
+
+
+@bp.route("/api/similar-companies", methods=["GET", "POST"])
+@login_required
+def api_similar_companies():
+    """
+    Top N vergelijkbare bedrijven voor een hele lijst bedrijven in één aanvraag.
+    Bedrijven kiezen (één van):
+      ?ids=1,2,3             (of POST JSON {"company_ids": [1, 2, 3]})
+      ?sector_id=4           (alle bedrijven in die sector)
+      ?watchlist=1           (de watchlist uit de sessie)
+    Optioneel: ?top_n=5 (max SIMILAR_BATCH_MAX_TOP_N)
+
+    Antwoordt met NDJSON (één JSON-object per regel, per bedrijf),
+    gestreamd zodra elk resultaat berekend is. Alle bedrijven worden één keer
+    geladen en de similariteitsindex wordt gedeeld over de hele batch.
+    """
+    payload = request.get_json(silent=True) or {}
+    top_n = payload.get("top_n", request.args.get("top_n", 5, type=int))
+    sector_id = payload.get("sector_id", request.args.get("sector_id", type=int))
+
+    ids = payload.get("company_ids")
+    if ids is None and request.args.get("ids"):
+        ids = request.args.get("ids").split(",")
+    if ids is None and request.args.get("watchlist"):
+        ids = session.get("watchlist_companies", [])
+
+    try:
+        top_n = max(1, min(SIMILAR_BATCH_MAX_TOP_N, int(top_n)))
+        ids = [int(cid) for cid in ids] if ids is not None else None
+        sector_id = int(sector_id) if sector_id is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "Ongeldige company ids, sector_id of top_n."}), 400
+
+    if ids is None and sector_id is None:
+        return jsonify({"error": "Geef ids, sector_id of watchlist=1 op."}), 400
+    if ids is not None and len(ids) > SIMILAR_BATCH_MAX_IDS:
+        return jsonify({"error": f"Maximaal {SIMILAR_BATCH_MAX_IDS} ids per aanvraag."}), 400
+
+    # Eén keer alle bedrijven laden: de pool voor elke zoekopdracht
+    all_companies = company_query("similarity").all()
+    by_id = {c.company_id: c for c in all_companies}
+
+    if ids is not None:
+        targets = [by_id[cid] for cid in dict.fromkeys(ids) if cid in by_id]
+        missing = [cid for cid in dict.fromkeys(ids) if cid not in by_id]
+    else:
+        targets = [c for c in all_companies if c.sector_id == sector_id]
+        missing = []
+
+    def generate():
+        for company, ranked in find_similar_companies_batch(targets, all_companies, top_n):
+            yield json.dumps({
+                "company_id": company.company_id,
+                "name": company.name,
+                "similar": [
+                    {"company_id": other.company_id, "name": other.name, "score": score}
+                    for other, score in ranked
+                ],
+            }) + "\n"
+        for cid in missing:
+            yield json.dumps({"company_id": cid, "error": "not_found"}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+# =====================================================
+# API: COMPETITOR-GRAAF
+# =====================================================
+
+# Maximum aantal hops voor /api/competitor-graph/neighbourhood
+COMPETITOR_GRAPH_MAX_HOPS = 3
+
+
+@bp.route("/api/competitor-graph/<int:company_id>/out")
+@login_required
+def api_competitor_out_edges(company_id):
+    """Competitors die dit bedrijf noemt, met het opgeloste bedrijf (of null)."""
+    return jsonify({"company_id": company_id, "edges": out_edges(company_id)})
+
+
+@bp.route("/api/competitor-graph/<int:company_id>/in")
+@login_required
+def api_competitor_in_edges(company_id):
+    """Bedrijven die dit bedrijf als competitor noemen."""
+    return jsonify({"company_id": company_id, "edges": in_edges(company_id)})
+
+
+@bp.route("/api/competitor-graph/listed-by")
+@login_required
+def api_competitor_listed_by():
+    """
+    Wie noemt deze naam als competitor? Werkt ook voor niet-gevolgde bedrijven.
+      ?name=Adidas
+    """
+    name = (request.args.get("name") or "").strip()
+    if not name:
+        return jsonify({"error": "Geef een naam op via ?name=..."}), 400
+    return jsonify({"name": name, "edges": listed_by(name)})
+
+
+@bp.route("/api/competitor-graph/neighbourhood")
+@login_required
+def api_competitor_neighbourhood():
+    """
+    k-hop omgeving in de competitor-graaf.
+    Startbedrijven: ?ids=1,2 of ?watchlist=1
+    Optioneel: ?k=2 (max COMPETITOR_GRAPH_MAX_HOPS), ?direction=out|in|both
+    """
+    if request.args.get("ids"):
         try:
-            since_date = datetime.fromisoformat(since_str)
-            query = query.filter(ChangeEvent.detected_at >= since_date)
+            start_ids = [int(cid) for cid in request.args.get("ids").split(",")]
         except ValueError:
-            pass
+            return jsonify({"error": "Ongeldige company ids."}), 400
+    elif request.args.get("watchlist"):
+        start_ids = [int(cid) for cid in session.get("watchlist_companies", [])]
+    else:
+        return jsonify({"error": "Geef ids of watchlist=1 op."}), 400
 
-    rows = query.order_by(ChangeEvent.detected_at.desc()).all()
+    k = max(1, min(COMPETITOR_GRAPH_MAX_HOPS, request.args.get("k", 2, type=int)))
+    direction = request.args.get("direction", "out")
+    if direction not in ("out", "in", "both"):
+        return jsonify({"error": "direction moet out, in of both zijn."}), 400
 
-    out = []
-    for e, company_name in rows:
-        out.append({
-            "event_id": e.event_id,
-            "company_id": e.company_id,
-            "company_name": company_name or "Onbekend",
-            "event_type": e.event_type,
-            "description": e.description,
-            "detected_at": e.detected_at.isoformat() if e.detected_at else None
-        })
+    nodes, edges, truncated = competitor_neighbourhood(start_ids, k=k, direction=direction)
 
-    return jsonify(out)
+    names = dict(
+        db.session.query(Company.company_id, Company.name)
+        .filter(Company.company_id.in_(list(nodes)))
+        .all()
+    ) if nodes else {}
+
+    return jsonify({
+        "k": k,
+        "direction": direction,
+        "truncated": truncated,
+        "nodes": [
+            {"company_id": cid, "name": names.get(cid), "hop": hop}
+            for cid, hop in sorted(nodes.items(), key=lambda item: (item[1], item[0]))
+        ],
+        "edges": [
+            {"source": source, "target": target, "match_score": score}
+            for source, target, score in edges
+        ],
+    })
 
 # =====================================================
 # DELETE COMPANY 
@@ -1674,13 +2072,19 @@ def api_events():
 @bp.route("/company/<int:company_id>/delete", methods=["POST"])
 @login_required
 def delete_company(company_id):
-    company = Company.query.get(company_id)
+    company = company_query("name").get(company_id)
     if not company:
         return "Bedrijf niet gevonden", 404
 
+    # Buren die dit bedrijf als "vergelijkbaar" hadden opnieuw berekenen
+    remove_company_similarity(company_id)
+
     # Verwijder het bedrijf en commit de transactie
     db.session.delete(company)
     db.session.commit()
+    invalidate_company_features(company_id)
+    invalidate_company_fragments(company_id)
+    report_cache().invalidate(company_id)
 
     # Optioneel: In een productie-omgeving zou u ook Audit Logs,
     # Metrics, Change Events, en Metric History gerelateerd aan
@@ -1696,26 +2100,159 @@ def delete_company(company_id):
 @bp.route('/company/<int:company_id>/alerts')
 @login_required
 def company_alerts(company_id):
-    company = Company.query.get_or_404(company_id)
+    company = company_query("name").get_or_404(company_id)
     
-    # Haal alle events op voor dit specifieke bedrijf
-    events = ChangeEvent.query.filter_by(company_id=company_id).order_by(
-        ChangeEvent.detected_at.desc()
-    ).all()
-
-    alerts = []
-    for e in events:
-        alerts.append({
-            "company_id": e.company_id,
-            "company": company.name,
-            "type": e.event_type,
-            "description": e.description,
-            "time": e.detected_at
-        })
+    # Eerste pagina events voor dit specifieke bedrijf; de rest via "Meer laden"
+    alerts, next_cursor = alert_page(company_id=company_id, limit=ALERT_PAGE_SIZE)
     
     # Gebruik dezelfde template als /all-alerts, maar geef het bedrijf mee
     return render_template(
         "all_alerts.html",
         alerts=alerts,
+        next_cursor=next_cursor,
         company=company # Nu weet de template welk bedrijf het betreft
-    )
\ No newline at end of file
+    )
+
+# =====================================================
+# CLI: EENMALIGE OPKUIS VAN DUBBELE INFERRED HISTORIEK
+# =====================================================
+
+@bp.cli.command("dedupe-inferred-history")
+def dedupe_inferred_history():
+    """
+    Verwijdert dubbele 'inferred' historiekpunten die vroeger bij elke
+    scrape/refresh opnieuw werden toegevoegd.
+    Per (company_id, name, recorded_at) blijft de jongste rij (hoogste id,
+    dus de meest recente schatting) behouden.
+
+    Gebruik: flask dedupe-inferred-history
+    """
+    keep_ids = (
+        db.select(db.func.max(MetricHistory.id))
+        .where(MetricHistory.source == "inferred")
+        .group_by(MetricHistory.company_id, MetricHistory.name, MetricHistory.recorded_at)
+    )
+
+    deleted = (
+        MetricHistory.query
+        .filter(MetricHistory.source == "inferred")
+        .filter(MetricHistory.id.not_in(keep_ids))
+        .delete(synchronize_session=False)
+    )
+    db.session.commit()
+
+    print(f"Dedupe: {deleted} dubbele inferred historiekpunten verwijderd.")
+
+
+# =====================================================
+# CLI: ROLLUPS VOOR GRAFIEKEN OPNIEUW OPBOUWEN
+# =====================================================
+
+@bp.cli.command("rebuild-metric-rollups")
+def rebuild_metric_rollups():
+    """
+    Bouwt de dag/week/maand-rollups opnieuw op vanuit metric_history
+    (bv. na de eerste deploy of na de inferred-dedupe).
+
+    Gebruik: flask rebuild-metric-rollups
+    """
+    written = rebuild_all_rollups()
+    print(f"Rollups: {written} buckets opgebouwd.")
+
+
+# =====================================================
+# CLI: VERGELIJKBARE BEDRIJVEN VOLLEDIG HERBEREKENEN
+# =====================================================
+
+@bp.cli.command("rebuild-company-similarity")
+def rebuild_company_similarity():
+    """
+    Herberekent de volledige company_similarity tabel
+    (eerste vulling, of na een wijziging van de gewichten/SIMILARITY_MODE).
+
+    Gebruik: flask rebuild-company-similarity
+    """
+    count = rebuild_all_similarity()
+    print(f"Similarity: top-K buren herberekend voor {count} bedrijven.")
+
+
+# =====================================================
+# CLI: VOLLEDIGE SIMILARITEITSMATRIX VAN EEN SECTOR
+# =====================================================
+
+@bp.cli.command("sector-similarity-matrix")
+@click.option("--sector-id", type=int, required=True, help="Sector waarvoor de matrix berekend wordt")
+@click.option("--output", type=click.Path(dir_okay=False), required=True, help="Doel-CSV")
+def sector_similarity_matrix(sector_id, output):
+    """
+    Schrijft de volledige similariteitsmatrix (scores 0-100) van alle bedrijven
+    in één sector naar CSV. De matrix wordt per blok rijen berekend en
+    weggeschreven, zodat ook grote sectoren in beperkt geheugen passen.
+
+    Gebruik: flask sector-similarity-matrix --sector-id 3 --output matrix.csv
+    """
+    from app.similarity_matrix import similarity_blocks
+
+    companies = company_query("similarity").filter_by(sector_id=sector_id).order_by(Company.company_id).all()
+    if not companies:
+        print(f"Geen bedrijven gevonden in sector {sector_id}.")
+        return
+
+    with open(output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["company_id"] + [c.company_id for c in companies])
+        for start, stop, block in similarity_blocks(companies):
+            for offset, row in enumerate(block):
+                writer.writerow([companies[start + offset].company_id] + [f"{v:.2f}" for v in row])
+
+    print(f"Matrix: {len(companies)} × {len(companies)} scores geschreven naar {output}.")
+
+
+# =====================================================
+# CLI: TELLER VAN DE MELDINGEN OPNIEUW TELLEN
+# =====================================================
+
+@bp.cli.command("recount-change-events")
+def recount_change_events_command():
+    """
+    Zet de teller change_event_count (dashboard, alle meldingen) opnieuw gelijk
+    aan het werkelijke aantal change events, bv. na deletes rechtstreeks in SQL.
+
+    Gebruik: flask recount-change-events
+    """
+    total = recount_change_events()
+    print(f"✅ change_event_count = {total}")
+
+
+# =====================================================
+# CLI: CHANGE_SEQ AANVULLEN VOOR BESTAANDE RIJEN
+# =====================================================
+
+@bp.cli.command("backfill-change-seq")
+def backfill_change_seq_command():
+    """
+    Geeft bestaande company / metric / metric_history rijen zonder change_seq
+    een volgnummer, zodat ze in /api/changes verschijnen (eenmalig na de deploy,
+    of na wijzigingen rechtstreeks in SQL).
+
+    Gebruik: flask backfill-change-seq
+    """
+    for table, count in backfill_change_seq().items():
+        print(f"{table}: {count} rijen genummerd.")
+
+
+# =====================================================
+# CLI: COMPETITOR-NAMEN OPNIEUW OPBOUWEN
+# =====================================================
+
+@bp.cli.command("rebuild-competitor-names")
+def rebuild_competitor_names():
+    """
+    Vult de competitor_name tabel opnieuw vanuit Company.competitors,
+    inclusief de naamresolutie van de competitor-graaf
+    (eerste vulling na de deploy, of na een wijziging van de normalisatie).
+
+    Gebruik: flask rebuild-competitor-names
+    """
+    written = rebuild_all_competitor_names()
+    print(f"Competitors: {written} namen opgeslagen.")
@@ -0,0 +1,207 @@
+# similarity_store.py
+#
+# Gematerialiseerde "vergelijkbare bedrijven" (tabel company_similarity).
+# Per bedrijf bewaren we de top-K buren met hun score. Bij een nieuwe of
+# opnieuw gescrapete company wordt enkel de rij van dat bedrijf herberekend,
+# plus de rijen van buren die erdoor kunnen veranderen.
+# De detailpagina leest de buren dan met één geïndexeerde query.
+
+from flask import current_app
+
+from app import db
+from app.load_profiles import company_query, company_options
+from app.models import Company, CompanySimilarity
+from app.similarity import get_features, features_similarity_score
+
+# Aantal buren dat we per bedrijf bewaren (de detailpagina toont er 5)
+SIMILARITY_TOP_K = 10
+
+
+def find_similar_companies(company, all_companies, top_n=5):
+    """
+    Top N vergelijkbare bedrijven binnen dezelfde sector, volgens
+    de ingestelde SIMILARITY_MODE ("jaccard" = exact, "indexed" = exact
+    via de inverted index, "minhash" = benaderend, "tfidf" = cosinus op
+    IDF-gewogen tokens).
+    """
+    mode = current_app.config.get("SIMILARITY_MODE", "jaccard")
+
+    if mode == "tfidf":
+        from app.similarity_tfidf import top_similar_companies_tfidf
+        return top_similar_companies_tfidf(
+            company, all_companies, top_n=top_n,
+            refresh_ratio=current_app.config.get("TFIDF_REFRESH_RATIO", 0.1),
+        )
+
+    if mode == "minhash":
+        from app.similarity_minhash import top_similar_companies_minhash
+        return top_similar_companies_minhash(
+            company, all_companies, top_n=top_n,
+            num_perm=current_app.config.get("MINHASH_NUM_PERM", 160),
+            bands=current_app.config.get("MINHASH_BANDS", 80),
+        )
+
+    if mode == "indexed":
+        from app.similarity import top_similar_companies_indexed
+        return top_similar_companies_indexed(company, all_companies, top_n=top_n)
+
+    from app.similarity import top_similar_companies_in_same_sector
+    return top_similar_companies_in_same_sector(company, all_companies, top_n=top_n)
+
+
+def find_similar_companies_batch(companies, all_companies, top_n=5):
+    """
+    Generator met (company, [(other, score), ...]) voor elk bedrijf in companies.
+    De index van de ingestelde SIMILARITY_MODE (en dus de feature cache) wordt
+    één keer opgebouwd en gedeeld over de hele batch, in plaats van per
+    bedrijf gecontroleerd zoals bij find_similar_companies.
+    """
+    mode = current_app.config.get("SIMILARITY_MODE", "jaccard")
+
+    if mode == "tfidf":
+        from app.similarity_tfidf import top_similar_companies_tfidf, get_tfidf_index
+        index = get_tfidf_index(all_companies, current_app.config.get("TFIDF_REFRESH_RATIO", 0.1))
+        search = lambda c: top_similar_companies_tfidf(c, all_companies, top_n=top_n, index=index)
+    elif mode == "minhash":
+        from app.similarity_minhash import top_similar_companies_minhash, get_minhash_index
+        num_perm = current_app.config.get("MINHASH_NUM_PERM", 160)
+        bands = current_app.config.get("MINHASH_BANDS", 80)
+        index = get_minhash_index(all_companies, num_perm, bands)
+        search = lambda c: top_similar_companies_minhash(c, all_companies, top_n=top_n, index=index)
+    elif mode == "indexed":
+        from app.similarity import top_similar_companies_indexed, SimilarityIndex
+        index = SimilarityIndex()
+        index.sync(all_companies)
+        search = lambda c: top_similar_companies_indexed(c, all_companies, top_n=top_n, index=index)
+    else:
+        from app.similarity import top_similar_companies_in_same_sector
+        search = lambda c: top_similar_companies_in_same_sector(c, all_companies, top_n=top_n)
+
+    for company in companies:
+        yield company, search(company)
+
+
+def _write_neighbours(company, all_companies):
+    """Herberekent en overschrijft de top-K rij van één bedrijf."""
+    ranked = find_similar_companies(company, all_companies, top_n=SIMILARITY_TOP_K)
+
+    CompanySimilarity.query.filter_by(company_id=company.company_id).delete(synchronize_session=False)
+    for rank, (other, score) in enumerate(ranked, start=1):
+        db.session.add(CompanySimilarity(
+            company_id=company.company_id,
+            neighbour_id=other.company_id,
+            rank=rank,
+            score=score,
+        ))
+
+
+def _same_sector(company, other):
+    # Zelfde regel als similarity.filter_by_sector
+    return not company.sector_id or other.sector_id == company.sector_id
+
+
+def refresh_company_similarity(company, all_companies=None):
+    """
+    Incrementele update na het aanmaken of opnieuw scrapen van een bedrijf:
+    1) de eigen top-K rij
+    2) bedrijven die dit bedrijf nu als buur hebben (score of sector kan gewijzigd zijn)
+    3) bedrijven waarvoor dit bedrijf nu in de top-K kan komen
+       (nog geen K buren, of score minstens hun huidige laagste score)
+    Commit gebeurt door de aanroeper.
+    """
+    if all_companies is None:
+        all_companies = company_query("similarity").all()
+    by_id = {c.company_id: c for c in all_companies}
+
+    _write_neighbours(company, all_companies)
+
+    affected = {
+        row.company_id
+        for row in CompanySimilarity.query.filter_by(neighbour_id=company.company_id)
+    }
+
+    # Laagste bewaarde score en aantal buren per bedrijf (één query)
+    drempels = {
+        cid: (count, min_score)
+        for cid, count, min_score in (
+            db.session.query(CompanySimilarity.company_id,
+                             db.func.count(CompanySimilarity.neighbour_id),
+                             db.func.min(CompanySimilarity.score))
+            .group_by(CompanySimilarity.company_id)
+        )
+    }
+
+    target = get_features(company)
+    for other in all_companies:
+        if other.company_id == company.company_id or other.company_id in affected:
+            continue
+        if not _same_sector(other, company):
+            continue
+        count, min_score = drempels.get(other.company_id, (0, None))
+        if count < SIMILARITY_TOP_K:
+            affected.add(other.company_id)
+            continue
+        score = round(features_similarity_score(get_features(other), target), 2)
+        if score >= min_score:
+            affected.add(other.company_id)
+
+    affected.discard(company.company_id)
+    for company_id in affected:
+        other = by_id.get(company_id)
+        if other is not None:
+            _write_neighbours(other, all_companies)
+
+    return len(affected) + 1
+
+
+def remove_company_similarity(company_id):
+    """
+    Aanroepen vóór het verwijderen van een bedrijf: bedrijven die het als buur
+    hadden krijgen een nieuwe top-K zonder dit bedrijf.
+    Commit gebeurt door de aanroeper.
+    """
+    affected = [
+        row.company_id
+        for row in CompanySimilarity.query.filter_by(neighbour_id=company_id)
+    ]
+    CompanySimilarity.query.filter(
+        db.or_(CompanySimilarity.company_id == company_id,
+               CompanySimilarity.neighbour_id == company_id)
+    ).delete(synchronize_session=False)
+
+    if not affected:
+        return 0
+
+    all_companies = company_query("similarity").filter(Company.company_id != company_id).all()
+    by_id = {c.company_id: c for c in all_companies}
+    for cid in affected:
+        if cid in by_id:
+            _write_neighbours(by_id[cid], all_companies)
+    return len(affected)
+
+
+def rebuild_all_similarity():
+    """Volledige herberekening van company_similarity. Retourneert het aantal bedrijven."""
+    all_companies = company_query("similarity").all()
+
+    CompanySimilarity.query.delete(synchronize_session=False)
+    for company in all_companies:
+        _write_neighbours(company, all_companies)
+
+    db.session.commit()
+    return len(all_companies)
+
+
+def stored_similar_companies(company_id, top_n=5):
+    """
+    Bewaarde top N buren als [(Company, score), ...] in één geïndexeerde query.
+    """
+    return (
+        db.session.query(Company, CompanySimilarity.score)
+        .options(*company_options("name"))
+        .join(CompanySimilarity, CompanySimilarity.neighbour_id == Company.company_id)
+        .filter(CompanySimilarity.company_id == company_id)
+        .order_by(CompanySimilarity.rank.asc())
+        .limit(top_n)
+        .all()
+    )
@@ -0,0 +1,334 @@
+# similarity_tfidf.py
+#
+# TF-IDF gewogen similariteit (alternatief voor Jaccard in similarity.py).
+# Jaccard telt "de", "the", "and" of "platform" even zwaar als een
+# onderscheidend woord. Hier krijgt elk token per veld een IDF-gewicht
+# op basis van het hele corpus:
+#   idf(t) = ln((1 + N) / (1 + df(t))) + 1
+# Elk veld wordt een L2-genormaliseerde sparse vector (dict token -> gewicht)
+# en de similariteit per veld is de cosinus. De weging over de velden en het
+# negeren van ontbrekende velden (gewichten) blijven zoals in similarity_score.
+#
+# TF is binair: de gecachete features (get_features) zijn tokensets, en de
+# velden zijn kort genoeg dat herhaalde woorden weinig toevoegen.
+#
+# Incrementeel bijhouden:
+#   - document frequencies worden bij elke add/remove meteen aangepast
+#   - vectoren worden berekend met een vaste IDF-snapshot; pas als het aantal
+#     wijzigingen sinds de snapshot groter is dan refresh_ratio × N worden
+#     de snapshot en alle vectoren opnieuw opgebouwd.
+
+import heapq
+import math
+import threading
+
+from app.similarity import gewichten, get_features, filter_by_sector
+
+DEFAULT_REFRESH_RATIO = 0.1
+
+# Posting-token voor een veld dat aanwezig maar leeg is (zoals in similarity.py)
+_LEEG = object()
+
+
+def _idf(n_docs, df):
+    return math.log((1 + n_docs) / (1 + df)) + 1.0
+
+
+def _vector(tokens, idf):
+    """L2-genormaliseerde vector {token: gewicht} met binaire tf."""
+    weights = {t: idf(t) for t in tokens}
+    norm = math.sqrt(sum(w * w for w in weights.values()))
+    return {t: w / norm for t, w in weights.items()}
+
+
+class TfidfRecord:
+    """
+    TF-IDF vectoren van één bedrijf per gewogen veld.
+    Per veld: None (ontbreekt), _LEEG (aanwezig maar leeg) of een dict token -> gewicht.
+    """
+    __slots__ = ("company_id", "sector_id", "source", "vectors")
+
+    def __init__(self, company_id, sector_id, source, vectors):
+        self.company_id = company_id
+        self.sector_id = sector_id
+        self.source = source
+        self.vectors = vectors
+
+
+def _cosine(A, B):
+    if len(A) > len(B):
+        A, B = B, A
+    return sum(w * B[t] for t, w in A.items() if t in B)
+
+
+def tfidf_score(record_a, record_b):
+    """Gewogen TF-IDF similariteitsscore (0-100), zelfde weging als similarity_score."""
+    score = 0.0
+    totaal_gewicht = 0.0
+
+    for veld, gewicht in gewichten.items():
+        A = record_a.vectors[veld]
+        B = record_b.vectors[veld]
+        if A is None or B is None:
+            continue
+        if A is _LEEG and B is _LEEG:
+            sim = 1.0
+        elif A is _LEEG or B is _LEEG:
+            sim = 0.0
+        else:
+            sim = min(1.0, _cosine(A, B))
+        score += sim * gewicht
+        totaal_gewicht += gewicht
+
+    if totaal_gewicht == 0:
+        return 0.0
+
+    return (score / totaal_gewicht) * 100.0
+
+
+class TfidfIndex:
+    """
+    Corpusstatistieken (document frequencies per veld) + postings
+    (veld, token) -> {company_id: gewicht} voor het accumuleren van cosinussen.
+    Alle lees- en schrijfbewerkingen nemen self.lock (gedeeld tussen threads).
+    """
+
+    def __init__(self, refresh_ratio=DEFAULT_REFRESH_RATIO):
+        self.refresh_ratio = refresh_ratio
+        self.lock = threading.RLock()
+        self._features = {}                      # company_id -> CompanyFeatures
+        self._records = {}                       # company_id -> TfidfRecord
+        self._df = {veld: {} for veld in gewichten}
+        self._postings = {}
+
+        # IDF-snapshot waarmee de huidige vectoren berekend zijn
+        self._snapshot_docs = 0
+        self._snapshot_df = {veld: {} for veld in gewichten}
+        self._changes = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def record(self, company_id):
+        with self.lock:
+            return self._records.get(company_id)
+
+    # ---------- corpusstatistieken ----------
+
+    def _count(self, features, delta):
+        for veld in gewichten:
+            tokens = getattr(features, veld)
+            if not tokens:
+                continue
+            df = self._df[veld]
+            for token in tokens:
+                count = df.get(token, 0) + delta
+                if count:
+                    df[token] = count
+                else:
+                    df.pop(token, None)
+
+    def _snapshot_idf(self, veld):
+        n_docs = self._snapshot_docs
+        df = self._snapshot_df[veld]
+        return lambda token: _idf(n_docs, df.get(token, 0))
+
+    def build_record(self, features):
+        """Vectoren voor deze features met de huidige IDF-snapshot."""
+        with self.lock:
+            vectors = {}
+            for veld in gewichten:
+                tokens = getattr(features, veld)
+                if tokens is None:
+                    vectors[veld] = None
+                elif not tokens:
+                    vectors[veld] = _LEEG
+                else:
+                    vectors[veld] = _vector(tokens, self._snapshot_idf(veld))
+            return TfidfRecord(features.company_id, features.sector_id, features, vectors)
+
+    def refresh(self):
+        """Nieuwe IDF-snapshot en alle vectoren + postings opnieuw opbouwen."""
+        with self.lock:
+            self._snapshot_docs = len(self._features)
+            self._snapshot_df = {veld: dict(df) for veld, df in self._df.items()}
+            self._changes = 0
+
+            self._records = {}
+            self._postings = {}
+            for features in self._features.values():
+                self._index(self.build_record(features))
+
+    # ---------- postings ----------
+
+    @staticmethod
+    def _keys(record):
+        for veld, vector in record.vectors.items():
+            if vector is None:
+                continue
+            if vector is _LEEG:
+                yield (veld, _LEEG), 1.0
+                continue
+            for token, weight in vector.items():
+                yield (veld, token), weight
+
+    def _index(self, record):
+        self._records[record.company_id] = record
+        for key, weight in self._keys(record):
+            self._postings.setdefault(key, {})[record.company_id] = weight
+
+    def _unindex(self, company_id):
+        record = self._records.pop(company_id, None)
+        if record is None:
+            return
+        for key, _weight in self._keys(record):
+            ids = self._postings.get(key)
+            if ids is not None:
+                ids.pop(company_id, None)
+                if not ids:
+                    del self._postings[key]
+
+    # ---------- wijzigingen ----------
+
+    def add(self, features, index=True):
+        # Een update (vervangen) telt als één wijziging, niet als remove + add
+        with self.lock:
+            self._discard(features.company_id)
+            self._features[features.company_id] = features
+            self._count(features, +1)
+            if index:
+                self._index(self.build_record(features))
+            self._changes += 1
+
+    def remove(self, company_id):
+        with self.lock:
+            if self._discard(company_id):
+                self._changes += 1
+
+    def _discard(self, company_id):
+        """Haalt een bedrijf uit de statistieken en postings; True als het erin zat."""
+        features = self._features.pop(company_id, None)
+        if features is None:
+            return False
+        self._count(features, -1)
+        self._unindex(company_id)
+        return True
+
+    def sync(self, companies):
+        """
+        Houdt de index gelijk met deze bedrijven (enkel gewijzigde features
+        worden opnieuw geïndexeerd) en ververst de IDF-snapshot wanneer
+        het corpus sinds de vorige snapshot genoeg veranderd is.
+        """
+        with self.lock:
+            seen = set()
+            gewijzigd = []
+            for company in companies:
+                features = get_features(company)
+                seen.add(features.company_id)
+                if self._features.get(features.company_id) is not features:
+                    # Eerst enkel de statistieken; vectoren pas als er geen refresh volgt
+                    self.add(features, index=False)
+                    gewijzigd.append(features)
+
+            for company_id in [cid for cid in self._features if cid not in seen]:
+                self.remove(company_id)
+
+            if self._changes > self.refresh_ratio * max(1, self._snapshot_docs):
+                self.refresh()
+            else:
+                for features in gewijzigd:
+                    self._index(self.build_record(features))
+
+    # ---------- zoeken ----------
+
+    def scores(self, record, candidate_ids=None):
+        """
+        {company_id: score} voor alle bedrijven die minstens één token
+        (of een leeg veld) delen met het target; cosinussen worden via de postings
+        geaccumuleerd in plaats van per paar berekend.
+        """
+        with self.lock:
+            dots = {}
+            for veld, vector in record.vectors.items():
+                if vector is None:
+                    continue
+                if vector is _LEEG:
+                    vector = {_LEEG: 1.0}
+                acc = {}
+                for token, weight in vector.items():
+                    for cid, other_weight in self._postings.get((veld, token), {}).items():
+                        acc[cid] = acc.get(cid, 0.0) + weight * other_weight
+                dots[veld] = acc
+
+            kandidaten = set()
+            for acc in dots.values():
+                kandidaten.update(acc)
+            if candidate_ids is not None:
+                kandidaten &= candidate_ids
+
+            result = {}
+            for cid in kandidaten:
+                other = self._records[cid]
+                score = 0.0
+                totaal_gewicht = 0.0
+                for veld, gewicht in gewichten.items():
+                    if record.vectors[veld] is None or other.vectors[veld] is None:
+                        continue
+                    # Beide leeg → 1.0 via _LEEG-posting, één leeg of geen overlap → 0.0
+                    score += min(1.0, dots.get(veld, {}).get(cid, 0.0)) * gewicht
+                    totaal_gewicht += gewicht
+                result[cid] = (score / totaal_gewicht) * 100.0 if totaal_gewicht else 0.0
+            return result
+
+
+# Eén index per proces, gedeeld door de scheduler- en requestthreads
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_tfidf_index(companies, refresh_ratio=DEFAULT_REFRESH_RATIO):
+    """Geeft de procesbrede index, gesynchroniseerd met deze bedrijven."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = TfidfIndex(refresh_ratio)
+        index = _index
+    with index.lock:
+        index.refresh_ratio = refresh_ratio
+        index.sync(companies)
+    return index
+
+
+def top_similar_companies_tfidf(target_company, all_companies, top_n=5,
+                                refresh_ratio=DEFAULT_REFRESH_RATIO, index=None):
+    """
+    TF-IDF variant van top_similar_companies_in_same_sector: zelfde sectorfilter,
+    zelfde tie-break (eerder in de lijst wint) en aanvulling met score 0.
+    """
+    if top_n <= 0:
+        return []
+
+    pool = filter_by_sector(target_company, all_companies)
+    if index is None:
+        index = get_tfidf_index(all_companies, refresh_ratio)
+
+    target = index.record(target_company.company_id) or index.build_record(get_features(target_company))
+    positie = {c.company_id: i for i, c in enumerate(pool)}
+
+    scored = (
+        (round(score, 2), -positie[cid])
+        for cid, score in index.scores(target, set(positie)).items()
+        if score > 0
+    )
+    ranked = [(pool[-neg_pos], score) for score, neg_pos in heapq.nlargest(top_n, scored)]
+
+    if len(ranked) < top_n:
+        gekozen = {company.company_id for company, _score in ranked}
+        for company in pool:
+            if len(ranked) == top_n:
+                break
+            if company.company_id not in gekozen:
+                ranked.append((company, 0.0))
+
+    return ranked
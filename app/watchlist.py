@@ -0,0 +1,80 @@
+# watchlist.py
+#
+# Bulkqueries voor de watchlist-vergelijking.
+# In plaats van één Metric-query per bedrijf per metric en één AuditLog-query
+# per bedrijf, halen we:
+#   - alle geselecteerde metrics van alle bedrijven in één query
+#     (jongste rij per bedrijf + metricnaam via row_number), gepivoteerd in een dict
+#   - de laatste N audit logs per bedrijf in één gewindowde query
+
+from app import db
+from app.models import Metric, AuditLog
+
+# Aantal audit logs per bedrijf op de watchlist-pagina
+WATCHLIST_AUDIT_LOGS = 10
+
+
+def latest_metrics(company_ids, metric_labels):
+    """
+    {(company_id, naam_lowercase): (description, value)} met per bedrijf en
+    metric de jongste rij (zelfde keuze als .order_by(last_updated.desc()).first()).
+    """
+    labels = [label.lower() for label in metric_labels]
+    if not company_ids or not labels:
+        return {}
+
+    name_lower = db.func.lower(Metric.name)
+    ranked = (
+        db.select(
+            Metric.company_id,
+            name_lower.label("name_lower"),
+            Metric.description,
+            Metric.value,
+            db.func.row_number().over(
+                partition_by=(Metric.company_id, name_lower),
+                order_by=(Metric.last_updated.desc(), Metric.metric_id.desc()),
+            ).label("rn"),
+        )
+        .where(Metric.company_id.in_(company_ids), name_lower.in_(labels))
+        .subquery()
+    )
+
+    rows = db.session.execute(
+        db.select(ranked.c.company_id, ranked.c.name_lower, ranked.c.description, ranked.c.value)
+        .where(ranked.c.rn == 1)
+    )
+    return {
+        (company_id, name): (description, value)
+        for company_id, name, description, value in rows
+    }
+
+
+def recent_audit_logs(company_ids, per_company=WATCHLIST_AUDIT_LOGS):
+    """{company_id: [rij(source_name, source_url, retrieved_at), ...]} — nieuwste eerst."""
+    if not company_ids:
+        return {}
+
+    ranked = (
+        db.select(
+            AuditLog.company_id,
+            AuditLog.source_name,
+            AuditLog.source_url,
+            AuditLog.retrieved_at,
+            db.func.row_number().over(
+                partition_by=AuditLog.company_id,
+                order_by=(AuditLog.retrieved_at.desc(), AuditLog.log_id.desc()),
+            ).label("rn"),
+        )
+        .where(AuditLog.company_id.in_(company_ids))
+        .subquery()
+    )
+
+    logs = {}
+    rows = db.session.execute(
+        db.select(ranked.c.company_id, ranked.c.source_name, ranked.c.source_url, ranked.c.retrieved_at)
+        .where(ranked.c.rn <= per_company)
+        .order_by(ranked.c.company_id, ranked.c.rn)
+    )
+    for row in rows:
+        logs.setdefault(row.company_id, []).append(row)
+    return logs
@@ -0,0 +1,104 @@
+# bench_audit_export.py
+# Doel: piekgeheugen en doorvoer van de streaming audit-exports
+# (app/audit_export.py) op een groot aantal synthetische audit logs,
+# naast de vroegere aanpak (alle rijen laden, CSV volledig in een StringIO).
+# Het piekgeheugen van de streaming exports hoort niet mee te groeien met --rows.
+#
+# Gebruik (vanuit de projectmap):
+#   python -m benchmarks.bench_audit_export                    (1 000 000 rijen, SQLite-bestand)
+#   python -m benchmarks.bench_audit_export --rows 100000 --gzip
+#   python -m benchmarks.bench_audit_export --skip-materialized
+
+import argparse
+import csv
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app import create_app, db
+from app.audit_export import audit_log_query, audit_export_chunks, gzip_chunks
+from app.config import Config
+from app.models import AuditLog, Company
+
+_DB_PATH = os.path.join(tempfile.gettempdir(), "bench_audit_export.db")
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = os.environ.get("BENCH_DATABASE_URL", f"sqlite:///{_DB_PATH}")
+    SCHEDULER_ENABLED = False
+
+
+def _fill(rows, companies=200, batch=50000):
+    """Synthetische audit logs via bulk-inserts (Core, geen ORM-objecten)."""
+    db.session.execute(db.insert(Company), [
+        {"company_id": i, "name": f"Company {i}"} for i in range(1, companies + 1)
+    ])
+    start = datetime(2024, 1, 1)
+    for offset in range(0, rows, batch):
+        db.session.execute(db.insert(AuditLog), [
+            {
+                "log_id": i,
+                "company_id": i % companies + 1,
+                "source_name": f"scrape {i % 7}",
+                "source_url": f"https://company{i % companies + 1}.example/page/{i}",
+                "retrieved_at": start + timedelta(seconds=30 * i),
+            }
+            for i in range(offset + 1, min(rows, offset + batch) + 1)
+        ])
+    db.session.commit()
+
+
+def _materialized_csv():
+    """De vroegere export: alle rijen in het geheugen, CSV in één StringIO."""
+    logs = AuditLog.query.order_by(AuditLog.retrieved_at.desc()).all()
+    names = {c.company_id: c.name for c in Company.query.all()}
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["Company", "Source Name", "Source URL", "Retrieved At"])
+    for log in logs:
+        writer.writerow([names.get(log.company_id, "Onbekend"), log.source_name, log.source_url,
+                         log.retrieved_at.isoformat() if log.retrieved_at else ""])
+    yield output.getvalue().encode("utf-8")
+
+
+def measure(label, make_chunks):
+    """Consumeert een export zoals een client dat zou doen; meet tijd, bytes en piekgeheugen."""
+    db.session.expunge_all()
+    tracemalloc.start()
+    started = time.perf_counter()
+    total = 0
+    for chunk in make_chunks():
+        total += len(chunk)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:>22}: {elapsed:7.2f} s   {total / 1e6:9.1f} MB output   piek {peak / 1e6:8.1f} MB",
+          flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--gzip", action="store_true", help="ook de gzip-varianten meten")
+    parser.add_argument("--skip-materialized", action="store_true", help="de vroegere export niet meten")
+    args = parser.parse_args()
+
+    if "BENCH_DATABASE_URL" not in os.environ and os.path.exists(_DB_PATH):
+        os.remove(_DB_PATH)
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        print(f"{args.rows:,} audit logs aanmaken...", flush=True)
+        _fill(args.rows)
+
+        for fmt in ("csv", "json", "ndjson"):
+            measure(f"stream {fmt}", lambda: audit_export_chunks(audit_log_query(), fmt))
+            if args.gzip:
+                measure(f"stream {fmt}+gzip", lambda: gzip_chunks(audit_export_chunks(audit_log_query(), fmt)))
+
+        if not args.skip_materialized:
+            measure("vroeger csv (.all())", _materialized_csv)
@@ -0,0 +1,70 @@
+# bench_minhash.py
+# Doel: recall@5 en queries/seconde van de MinHash/LSH-modus vergelijken met exacte scoring.
+#
+# Gebruik (vanuit de projectmap, met de gewone .env):
+#   python -m benchmarks.bench_minhash --companies 10000 --queries 200 --num-perm 160 --bands 80
+#   python -m benchmarks.bench_minhash --bootstrap   (woorden/verdelingen uit de SQL-dump)
+#
+# De standaardinstelling (160/80) moet recall@5 >= 0.9 halen op beide corpora.
+
+import argparse
+import random
+import time
+
+from app.similarity import top_similar_companies_in_same_sector, get_features
+from app.similarity_minhash import top_similar_companies_minhash, get_minhash_index
+from benchmarks.synthetic import generate_companies, DEFAULT_DUMP_PATH
+
+
+def run(n_companies, n_queries, num_perm, bands, top_n=5, seed=42, bootstrap_path=None):
+    companies = generate_companies(n_companies, seed=seed, bootstrap_path=bootstrap_path)
+    queries = random.Random(seed).sample(companies, min(n_queries, len(companies)))
+
+    t0 = time.perf_counter()
+    for company in companies:
+        get_features(company)
+    t1 = time.perf_counter()
+    lsh_index = get_minhash_index(companies, num_perm, bands)
+    t2 = time.perf_counter()
+
+    start = time.perf_counter()
+    exact = [top_similar_companies_in_same_sector(q, companies, top_n) for q in queries]
+    exact_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approx = [top_similar_companies_minhash(q, companies, top_n, index=lsh_index) for q in queries]
+    approx_time = time.perf_counter() - start
+
+    recalls = []
+    for e, a in zip(exact, approx):
+        expected = {c.company_id for c, score in e if score > 0}
+        if expected:
+            found = {c.company_id for c, _score in a}
+            recalls.append(len(expected & found) / len(expected))
+
+    return {
+        "companies": n_companies,
+        "queries": len(queries),
+        "num_perm": num_perm,
+        "bands": bands,
+        "build_exact_s": round(t1 - t0, 3),
+        "build_minhash_s": round(t2 - t1, 3),
+        "exact_qps": round(len(queries) / exact_time, 1),
+        "minhash_qps": round(len(queries) / approx_time, 1),
+        "recall_at_5": round(sum(recalls) / len(recalls), 4) if recalls else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--companies", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--num-perm", type=int, default=160)
+    parser.add_argument("--bands", type=int, default=80)
+    parser.add_argument("--bootstrap", action="store_true", help="verdelingen uit database/database dump/company_rows.sql")
+    args = parser.parse_args()
+
+    result = run(args.companies, args.queries, args.num_perm, args.bands,
+                 bootstrap_path=DEFAULT_DUMP_PATH if args.bootstrap else None)
+    for key, value in result.items():
+        print(f"{key:>16}: {value}")
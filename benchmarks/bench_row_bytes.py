@@ -0,0 +1,113 @@
+# bench_row_bytes.py
+# Doel: bytes die per pagina uit de database gehaald worden, vóór (volledige
+# Company-rijen) en na (laadprofielen uit app/load_profiles.py).
+# Telt de grootte van de opgehaalde kolomwaarden (tekst als UTF-8, JSON als
+# geserialiseerde tekst, getallen/datums als 8 bytes).
+#
+# Gebruik (vanuit de projectmap):
+#   python -m benchmarks.bench_row_bytes                      (SQLite in het geheugen, synthetische data)
+#   python -m benchmarks.bench_row_bytes --companies 5000
+#   BENCH_DATABASE_URL=postgresql://... python -m benchmarks.bench_row_bytes --existing
+#       (enkel lezen: meet op de bestaande bedrijven in die database)
+
+import argparse
+import json
+import os
+
+from sqlalchemy.orm import undefer
+
+from app import create_app, db
+from app.config import Config
+from app.load_profiles import company_query
+from app.models import Company
+from benchmarks.synthetic import generate_companies
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = os.environ.get("BENCH_DATABASE_URL", "sqlite:///:memory:")
+    SCHEDULER_ENABLED = False
+
+
+def _value_bytes(value):
+    if value is None:
+        return 0
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (dict, list)):
+        return len(json.dumps(value).encode("utf-8"))
+    return 8
+
+
+def fetched_bytes(statement):
+    """Som van de kolomwaarden die deze SELECT teruggeeft."""
+    return sum(
+        _value_bytes(value)
+        for row in db.session.connection().execute(statement)
+        for value in row
+    )
+
+
+def _fill(n):
+    """Synthetische bedrijven met baseline-teksten van realistische grootte."""
+    for c in generate_companies(n):
+        db.session.add(Company(
+            company_id=c.company_id,
+            name=c.name,
+            website_url=f"https://company{c.company_id}.example",
+            headquarters="Gent, België",
+            team_size=c.company_id % 500,
+            funding="Series A",
+            sector_id=None,
+            target_segment=c.target_segment,
+            product_description=c.product_description,
+            pricing=c.pricing,
+            key_features=c.key_features,
+            competitors=[f"Competitor {i}" for i in range(5)],
+            ai_summary=(c.product_description or "") * 4,
+            value_proposition=c.target_segment,
+            traction_signals=(c.product_description or "") * 2,
+            funding_history=(c.pricing or "") * 10,
+            office_locations="Gent, Brussel, Amsterdam",
+        ))
+    db.session.commit()
+
+
+def run(page_size=50):
+    first_id = db.session.query(db.func.min(Company.company_id)).scalar()
+
+    # Per pagina: dezelfde query, vóór met alle kolommen (zoals zonder deferred), na met het profiel
+    pages = {
+        "list": lambda q: q.order_by(Company.name, Company.company_id).limit(page_size),
+        "name": lambda q: q,
+        "similarity": lambda q: q,
+        "detail": lambda q: q.filter(Company.company_id == first_id),
+    }
+
+    result = {}
+    for profile, shape in pages.items():
+        result[profile] = {
+            "before_bytes": fetched_bytes(shape(Company.query.options(undefer("*"))).statement),
+            "after_bytes": fetched_bytes(shape(company_query(profile)).statement),
+        }
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--companies", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--existing", action="store_true", help="geen data aanmaken, bestaande rijen meten")
+    args = parser.parse_args()
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        if not args.existing:
+            db.create_all()
+            _fill(args.companies)
+
+        for profile, sizes in run(args.page_size).items():
+            before, after = sizes["before_bytes"], sizes["after_bytes"]
+            saving = 1 - after / before if before else 0.0
+            print(f"{profile:>12}: vóór {before:>12,} B   na {after:>12,} B   (-{saving:.0%})")
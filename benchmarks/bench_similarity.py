@@ -0,0 +1,176 @@
+# bench_similarity.py
+# Doel: meten hoe similarity.py schaalt (similarity_score, filter_by_sector,
+# top_similar_companies en de index-variant) op synthetische corpora.
+# Per geval: ops/seconde, p50/p99 latentie en piekgeheugen (tracemalloc).
+# Resultaten worden als JSON bewaard zodat een wijziging met een baseline
+# vergeleken kan worden.
+#
+# Gebruik (vanuit de projectmap, met de gewone .env):
+#   python -m benchmarks.bench_similarity --sizes 1000 10000 100000 --output bench.json
+#   python -m benchmarks.bench_similarity --output nieuw.json --baseline bench.json
+#   python -m benchmarks.bench_similarity --bootstrap   (woorden/verdelingen uit de SQL-dump)
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from app.similarity import (
+    similarity_score,
+    filter_by_sector,
+    top_similar_companies_in_same_sector,
+    top_similar_companies_indexed,
+    invalidate_company_features,
+    SimilarityIndex,
+)
+from benchmarks.synthetic import generate_companies, DEFAULT_DUMP_PATH
+
+
+def _measure(op, args_list, max_seconds):
+    """Voert op(*args) uit per element van args_list (tot max_seconds), retourneert latenties in ms."""
+    latencies = []
+    deadline = time.perf_counter() + max_seconds
+    for args in args_list:
+        start = time.perf_counter()
+        op(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if time.perf_counter() > deadline:
+            break
+    return latencies
+
+
+def _peak_memory_kb(op, args_list, repeat=5):
+    """Piekgeheugen (tracemalloc) van een paar uitvoeringen; apart gemeten omdat tracemalloc vertraagt."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        for args in args_list[:repeat]:
+            op(*args)
+        return round((tracemalloc.get_traced_memory()[1] - base) / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def _stats(latencies, peak_kb):
+    ordered = sorted(latencies)
+    total_s = sum(ordered) / 1000
+    return {
+        "ops": len(ordered),
+        "ops_per_sec": round(len(ordered) / total_s, 2) if total_s else None,
+        "p50_ms": round(statistics.median(ordered), 4),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 4),
+        "peak_kb": peak_kb,
+    }
+
+
+def run_size(n, queries, max_seconds, seed=42, bootstrap_path=None):
+    companies = generate_companies(n, seed=seed, bootstrap_path=bootstrap_path)
+    rng = random.Random(seed)
+    targets = rng.sample(companies, min(queries, n))
+    pairs = [(rng.choice(companies), rng.choice(companies)) for _ in range(queries * 20)]
+
+    def build_index():
+        # Vanaf een lege feature cache: tokenisatie + postings
+        invalidate_company_features()
+        fresh = SimilarityIndex()
+        fresh.sync(companies)
+        return fresh
+
+    results = {}
+    latencies = _measure(build_index, [()], max_seconds)
+    results[f"build_index@{n}"] = _stats(latencies, _peak_memory_kb(build_index, [()]))
+    print(f"{'build_index@' + str(n):>40}: {results[f'build_index@{n}']}", flush=True)
+    index = build_index()
+
+    cases = {
+        "similarity_score": (similarity_score, pairs),
+        "filter_by_sector": (filter_by_sector, [(t, companies) for t in targets]),
+        "top_similar_companies": (top_similar_companies_in_same_sector, [(t, companies, 5) for t in targets]),
+        "top_similar_companies_indexed": (
+            lambda t: top_similar_companies_indexed(t, companies, 5, index=index),
+            [(t,) for t in targets],
+        ),
+    }
+
+    for name, (op, args_list) in cases.items():
+        latencies = _measure(op, args_list, max_seconds)
+        results[f"{name}@{n}"] = _stats(latencies, _peak_memory_kb(op, args_list))
+        print(f"{name + '@' + str(n):>40}: {results[f'{name}@{n}']}", flush=True)
+
+    # De index-variant moet exact dezelfde top 5 (en scores) geven als alles scoren
+    mismatches = sum(
+        top_similar_companies_indexed(t, companies, 5, index=index) != top_similar_companies_in_same_sector(t, companies, 5)
+        for t in targets
+    )
+    results[f"exact_indexed@{n}"] = {"queries": len(targets), "mismatches": mismatches}
+    print(f"{'exact_indexed@' + str(n):>40}: {results[f'exact_indexed@{n}']}", flush=True)
+    return results
+
+
+def compare(current, baseline, threshold):
+    """Print de verandering per geval t.o.v. de baseline; retourneert de regressies."""
+    regressions = []
+    print("\nVergelijking met baseline (ops/sec, p99):")
+    for key, result in current.items():
+        base = baseline.get(key)
+        if not base or not base.get("ops_per_sec") or not result.get("ops_per_sec"):
+            print(f"{key:>40}: geen baseline")
+            continue
+        speed = (result["ops_per_sec"] - base["ops_per_sec"]) / base["ops_per_sec"]
+        p99 = (result["p99_ms"] - base["p99_ms"]) / base["p99_ms"] if base["p99_ms"] else 0.0
+        flag = ""
+        if speed < -threshold:
+            flag = "  <-- REGRESSIE"
+            regressions.append(key)
+        print(f"{key:>40}: ops/sec {speed:+.1%}, p99 {p99:+.1%}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=100, help="aantal doelbedrijven per geval")
+    parser.add_argument("--max-seconds", type=float, default=20.0, help="tijdsbudget per geval")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bootstrap", action="store_true", help="verdelingen uit database/database dump/company_rows.sql")
+    parser.add_argument("--output", help="JSON-bestand voor de resultaten")
+    parser.add_argument("--baseline", help="eerder JSON-resultaat om mee te vergelijken")
+    parser.add_argument("--threshold", type=float, default=0.10, help="toegelaten daling van ops/sec")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    for n in args.sizes:
+        results.update(run_size(n, args.queries, args.max_seconds, args.seed,
+                                DEFAULT_DUMP_PATH if args.bootstrap else None))
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": args.sizes,
+            "queries": args.queries,
+            "seed": args.seed,
+            "bootstrap": args.bootstrap,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResultaten bewaard in {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
@@ -0,0 +1,80 @@
+# bench_tfidf.py
+# Doel: querylatentie (p50/p99) van de TF-IDF modus meten naast exacte Jaccard,
+# plus de opbouwtijd van de index en de kost van een incrementele update.
+#
+# Gebruik (vanuit de projectmap, met de gewone .env):
+#   python -m benchmarks.bench_tfidf --companies 10000 100000 --queries 200
+
+import argparse
+import random
+import statistics
+import time
+
+from app.similarity import top_similar_companies_in_same_sector, build_features, get_features
+from app.similarity_tfidf import top_similar_companies_tfidf, TfidfIndex
+from benchmarks.synthetic import generate_companies
+
+
+def _latencies(fn, queries):
+    result = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        result.append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def _summary(latencies_ms):
+    ordered = sorted(latencies_ms)
+    return {
+        "p50_ms": round(statistics.median(ordered), 2),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 2),
+    }
+
+
+def run(n_companies, n_queries, top_n=5, seed=42):
+    companies = generate_companies(n_companies, seed=seed)
+    queries = random.Random(seed).sample(companies, min(n_queries, len(companies)))
+
+    start = time.perf_counter()
+    for company in companies:
+        get_features(company)
+    build_exact = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tfidf_index = TfidfIndex()
+    tfidf_index.sync(companies)
+    build_tfidf = time.perf_counter() - start
+
+    exact = _latencies(lambda q: top_similar_companies_in_same_sector(q, companies, top_n), queries)
+    tfidf = _latencies(lambda q: top_similar_companies_tfidf(q, companies, top_n, index=tfidf_index), queries)
+
+    # Incrementele update: één bedrijf gewijzigd (nieuwe features) → sync zonder refresh
+    changed = companies[0]
+    changed.product_description = (changed.product_description or "") + " gewijzigd"
+    start = time.perf_counter()
+    tfidf_index.add(build_features(changed))
+    update_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "companies": n_companies,
+        "queries": len(queries),
+        "build_exact_s": round(build_exact, 2),
+        "build_tfidf_s": round(build_tfidf, 2),
+        "exact": _summary(exact),
+        "tfidf": _summary(tfidf),
+        "tfidf_update_ms": round(update_ms, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--companies", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    for n in args.companies:
+        result = run(n, args.queries)
+        for key, value in result.items():
+            print(f"{key:>16}: {value}")
+        print()
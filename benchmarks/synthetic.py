@@ -0,0 +1,191 @@
+# synthetic.py
+# Doel: reproduceerbare synthetische bedrijven om similarity.py te benchmarken.
+#
+# Standaard zijn tekstlengtes, aantal key_features, ontbrekende velden en de
+# sectorverdeling afgestemd op de echte data (een paar grote sectoren, een
+# lange staart kleine). Met bootstrap_path worden die verdelingen én de meest
+# voorkomende woorden rechtstreeks uit een SQL-dump van de company-tabel gehaald.
+
+import itertools
+import json
+import random
+import re
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+_VOCAB_SIZE = 5000
+_FEATURE_POOL_SIZE = 2000
+
+DEFAULT_DUMP_PATH = Path(__file__).resolve().parent.parent / "database" / "database dump" / "company_rows.sql"
+
+# Aantal woorden / items per veld (min, max) en kans dat het veld ontbreekt
+_DEFAULT_PROFILE = {
+    "lengths": {
+        "target_segment": (8, 25),
+        "product_description": (25, 70),
+        "pricing": (1, 12),
+        "key_features": (3, 7),
+    },
+    "missing": {
+        "target_segment": 0.05,
+        "product_description": 0.03,
+        "pricing": 0.15,
+        "key_features": 0.05,
+    },
+}
+
+_TEXT_FIELDS = ("target_segment", "product_description", "pricing")
+
+# Elke gegenereerde versie krijgt een eigen change_seq, zoals na een commit:
+# corpora met dezelfde ids delen zo geen gecachete features
+_change_seq = itertools.count(1)
+
+
+def _vocabulary(rng, size):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+
+
+# -----------------------------
+# Bootstrap vanuit een SQL-dump
+# -----------------------------
+
+_TOKEN_RE = re.compile(r"\(|\)|'((?:[^']|'')*)'|(null)")
+
+
+def read_company_dump(path=DEFAULT_DUMP_PATH):
+    """
+    Leest de rijen uit een Supabase-dump ("INSERT INTO ... (kolommen) VALUES (...), (...);")
+    als lijst van dicts {kolom: waarde} (None voor null).
+    """
+    sql = Path(path).read_text(encoding="utf-8")
+    header, _sep, body = sql.partition(" VALUES ")
+    columns = re.findall(r'"(\w+)"', header.split("(", 1)[1])
+
+    rows = []
+    current = None
+    for match in _TOKEN_RE.finditer(body):
+        token = match.group(0)
+        if token == "(":
+            current = []
+        elif token == ")":
+            if current is not None:
+                rows.append(dict(zip(columns, current)))
+            current = None
+        elif current is not None:
+            current.append(None if match.group(2) else match.group(1).replace("''", "'"))
+    return rows
+
+
+def profile_from_rows(rows):
+    """
+    Haalt lengteverdelingen, ontbrekende velden, sectorverdeling en
+    woordfrequenties uit echte bedrijfsrijen.
+    """
+    lengths = {}
+    missing = {}
+    words = Counter()
+    features = Counter()
+
+    for veld in _TEXT_FIELDS + ("key_features",):
+        samples = []
+        absent = 0
+        for row in rows:
+            value = row.get(veld)
+            if veld == "key_features":
+                items = json.loads(value) if value else None
+                if items is None:
+                    absent += 1
+                    continue
+                features.update(items)
+                samples.append(len(items))
+            else:
+                if not value or not value.strip():
+                    absent += 1
+                    continue
+                tokens = value.lower().split()
+                words.update(tokens)
+                samples.append(len(tokens))
+        lengths[veld] = samples or list(range(*_DEFAULT_PROFILE["lengths"][veld]))
+        missing[veld] = absent / len(rows) if rows else 0.0
+
+    sectors = Counter(row.get("sector_id") for row in rows if row.get("sector_id"))
+
+    return {
+        "lengths": lengths,
+        "missing": missing,
+        "sector_weights": [count for _sector, count in sectors.most_common()],
+        "words": [w for w, _count in words.most_common()],
+        "features": [f for f, _count in features.most_common()],
+    }
+
+
+# -----------------------------
+# Generator
+# -----------------------------
+
+def _sector_weights(sectors):
+    # Zipf-achtig: een paar grote sectoren, een lange staart kleine
+    return [1.0 / (rank + 1) for rank in range(sectors)]
+
+
+def generate_companies(n, seed=42, sectors=10, bootstrap_path=None):
+    """
+    Genereert n bedrijven met dezelfde attributen als Company
+    (company_id, name, sector_id, target_segment, key_features, product_description, pricing).
+    Woorden volgen een Zipf-achtige verdeling zodat sommige termen veel voorkomen.
+
+    bootstrap_path: SQL-dump van de company-tabel (bv. DEFAULT_DUMP_PATH); de
+    echte woorden en features komen dan bovenaan de frequentieverdeling en
+    lengtes/ontbrekende velden/sectorgroottes volgen de dump.
+    """
+    rng = random.Random(seed)
+    vocab = _vocabulary(rng, _VOCAB_SIZE)
+    feature_pool = _vocabulary(rng, _FEATURE_POOL_SIZE)
+
+    profile = _DEFAULT_PROFILE
+    sector_weights = _sector_weights(sectors)
+
+    if bootstrap_path is not None:
+        profile = profile_from_rows(read_company_dump(bootstrap_path))
+        vocab = (profile["words"] + vocab)[:max(_VOCAB_SIZE, len(profile["words"]))]
+        feature_pool = (profile["features"] + feature_pool)[:max(_FEATURE_POOL_SIZE, len(profile["features"]))]
+        # Echte sectorgroottes voor de grootste sectoren, Zipf-staart voor de rest
+        real = profile["sector_weights"]
+        if real:
+            scale = sector_weights[0] / real[0]
+            sector_weights = [w * scale for w in real[:sectors]] + sector_weights[len(real):]
+
+    weights = [1.0 / (rank + 1) for rank in range(len(vocab))]
+    sector_ids = list(range(1, len(sector_weights) + 1))
+
+    def length(veld):
+        spec = profile["lengths"][veld]
+        if isinstance(spec, tuple):
+            return rng.randint(*spec)
+        return rng.choice(spec)
+
+    def text(veld):
+        if rng.random() < profile["missing"][veld]:
+            return None
+        return " ".join(rng.choices(vocab, weights=weights, k=length(veld)))
+
+    def key_features():
+        if rng.random() < profile["missing"]["key_features"]:
+            return None
+        return rng.sample(feature_pool, min(len(feature_pool), length("key_features")))
+
+    companies = []
+    for i in range(1, n + 1):
+        companies.append(SimpleNamespace(
+            company_id=i,
+            name=f"Company {i}",
+            change_seq=next(_change_seq),
+            sector_id=rng.choices(sector_ids, weights=sector_weights)[0],
+            target_segment=text("target_segment"),
+            key_features=key_features(),
+            product_description=text("product_description"),
+            pricing=text("pricing"),
+        ))
+    return companies
@@ -27,6 +27,8 @@ create table public.audit_log (
   constraint audit_log_company_id_fkey foreign KEY (company_id) references company (company_id) on delete CASCADE
 ) TABLESPACE pg_default;
 
+create index IF not exists ix_audit_log_company_retrieved on public.audit_log using btree (company_id, retrieved_at) TABLESPACE pg_default;
+
 create table public.change_event (
   event_id bigserial not null,
   event_type text null,
@@ -37,6 +39,10 @@ create table public.change_event (
   constraint change_event_company_id_fkey foreign KEY (company_id) references company (company_id) on delete CASCADE
 ) TABLESPACE pg_default;
 
+-- Keyset paginering van de meldingen op (detected_at, event_id), globaal en per bedrijf
+create index IF not exists ix_change_event_detected on public.change_event using btree (detected_at, event_id) TABLESPACE pg_default;
+create index IF not exists ix_change_event_company_detected on public.change_event using btree (company_id, detected_at, event_id) TABLESPACE pg_default;
+
 create table public.company (
   company_id bigserial not null,
   name text not null,
@@ -56,10 +62,19 @@ create table public.company (
   competitors jsonb null,
   created_at timestamp with time zone null default now(),
   sector_id integer null,
+  updated_at timestamp with time zone null default now(),
+  change_seq bigint null,
   constraint company_pkey primary key (company_id),
   constraint fk_sector foreign KEY (sector_id) references sectors (sector_id)
 ) TABLESPACE pg_default;
 
+-- Keyset paginering van de bedrijvenlijst op (name, company_id)
+create index IF not exists ix_company_name_id on public.company using btree (name, company_id) TABLESPACE pg_default;
+create index IF not exists ix_company_sector_name_id on public.company using btree (sector_id, name, company_id) TABLESPACE pg_default;
+
+-- Change-feed (/api/changes): rijen gewijzigd na een volgnummer
+create index IF not exists ix_company_change_seq on public.company using btree (change_seq) TABLESPACE pg_default;
+
 create table public.metric (
   metric_id bigserial not null,
   company_id bigint null,
@@ -69,10 +84,15 @@ create table public.metric (
   value numeric null,
   active boolean null default true,
   last_updated timestamp with time zone null default now(),
+  updated_at timestamp with time zone null default now(),
+  change_seq bigint null,
   constraint metric_pkey primary key (metric_id),
   constraint metric_company_id_fkey foreign KEY (company_id) references company (company_id) on delete CASCADE
 ) TABLESPACE pg_default;
 
+create index IF not exists ix_metric_company_name_updated on public.metric using btree (company_id, name, last_updated) TABLESPACE pg_default;
+create index IF not exists ix_metric_change_seq on public.metric using btree (change_seq) TABLESPACE pg_default;
+
 create table public.metric_history (
   id bigserial not null,
   company_id bigint not null,
@@ -80,11 +100,89 @@ create table public.metric_history (
   value numeric null,
   recorded_at timestamp with time zone null default now(),
   source text null,
+  updated_at timestamp with time zone null default now(),
+  change_seq bigint null,
   constraint metric_history_pkey primary key (id),
   constraint metric_history_company_id_fkey foreign KEY (company_id) references company (company_id) on delete CASCADE
 ) TABLESPACE pg_default;
 
 create index IF not exists ix_metric_history_recorded_at on public.metric_history using btree (recorded_at) TABLESPACE pg_default;
+create index IF not exists ix_metric_history_change_seq on public.metric_history using btree (change_seq) TABLESPACE pg_default;
+
+create index IF not exists ix_metric_history_company_name_recorded on public.metric_history using btree (company_id, name, recorded_at) TABLESPACE pg_default;
+
+-- Natuurlijke sleutel voor AI-backfill (eerst `flask dedupe-inferred-history` draaien)
+create unique index IF not exists uq_metric_history_inferred on public.metric_history using btree (company_id, name, recorded_at) TABLESPACE pg_default
+where (source = 'inferred'::text);
+
+create table public.metric_rollup (
+  id bigserial not null,
+  company_id bigint not null,
+  name text not null,
+  resolution text not null,
+  bucket_start timestamp with time zone not null,
+  last_value numeric null,
+  last_recorded_at timestamp with time zone null,
+  min_value numeric null,
+  max_value numeric null,
+  sum_value numeric null,
+  value_count integer not null default 0,
+  constraint metric_rollup_pkey primary key (id),
+  constraint uq_metric_rollup_bucket unique (company_id, name, resolution, bucket_start),
+  constraint metric_rollup_company_id_fkey foreign KEY (company_id) references company (company_id) on delete CASCADE
+) TABLESPACE pg_default;
+
+create table public.company_similarity (
+  company_id bigint not null,
+  neighbour_id bigint not null,
+  rank integer not null,
+  score double precision not null,
+  computed_at timestamp with time zone null default now(),
+  constraint company_similarity_pkey primary key (company_id, neighbour_id),
+  constraint company_similarity_company_id_fkey foreign KEY (company_id) references company (company_id) on delete CASCADE,
+  constraint company_similarity_neighbour_id_fkey foreign KEY (neighbour_id) references company (company_id) on delete CASCADE
+) TABLESPACE pg_default;
+
+create index IF not exists ix_company_similarity_rank on public.company_similarity using btree (company_id, rank) TABLESPACE pg_default;
+create index IF not exists ix_company_similarity_neighbour on public.company_similarity using btree (neighbour_id) TABLESPACE pg_default;
+
+create table public.competitor_name (
+  id bigserial not null,
+  company_id bigint not null,
+  competitor_name text not null,
+  normalized_name text not null,
+  target_company_id bigint null,
+  match_score double precision null,
+  constraint competitor_name_pkey primary key (id),
+  constraint uq_competitor_name_company unique (company_id, normalized_name),
+  constraint competitor_name_company_id_fkey foreign KEY (company_id) references company (company_id) on delete CASCADE,
+  constraint competitor_name_target_company_id_fkey foreign KEY (target_company_id) references company (company_id) on delete set null
+) TABLESPACE pg_default;
+
+-- In-edges van de competitor-graaf ("wie noemt X als concurrent")
+create index IF not exists ix_competitor_name_target on public.competitor_name using btree (target_company_id) TABLESPACE pg_default;
+
+-- Gesorteerde, distincte lijst voor het dashboard (`flask rebuild-competitor-names` vult de tabel)
+create index IF not exists ix_competitor_name_normalized on public.competitor_name using btree (normalized_name, competitor_name) TABLESPACE pg_default;
+
+-- Bijgehouden tellers (`flask recount-change-events` zet change_event_count opnieuw gelijk;
+-- change_seq is het volgnummer van de change-feed)
+create table public.app_counter (
+  name text not null,
+  value bigint not null default 0,
+  constraint app_counter_pkey primary key (name)
+) TABLESPACE pg_default;
+
+insert into public.app_counter (name, value) values ('change_seq', 0) on conflict (name) do nothing;
+
+-- Verwijderde company / metric / metric_history rijen voor de change-feed
+create table public.change_tombstone (
+  change_seq bigint not null,
+  table_name text not null,
+  row_id bigint not null,
+  deleted_at timestamp with time zone null default now(),
+  constraint change_tombstone_pkey primary key (change_seq)
+) TABLESPACE pg_default;
 
 create table public.sectors (
   sector_id integer not null default nextval('sectors_sector_id_seq'::regclass),
@@ -0,0 +1,99 @@
+# conftest.py
+#
+# Gedeelde fixtures: een app op een tijdelijke SQLite-database, een ingelogde
+# client en een teller voor SQL-statements (before_cursor_execute).
+
+import os
+
+# app.scraper maakt bij het importeren een OpenAI-client aan
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import pytest
+from sqlalchemy import BigInteger, event
+from sqlalchemy.ext.compiler import compiles
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.config import Config
+from app.similarity import invalidate_company_features
+
+
+def pytest_collection_modifyitems(config, items):
+    # Tests met @pytest.mark.slow enkel met RUN_SLOW_TESTS=1
+    if os.environ.get("RUN_SLOW_TESTS") == "1":
+        return
+    skip = pytest.mark.skip(reason="zware test, zet RUN_SLOW_TESTS=1")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip)
+
+
+@compiles(BigInteger, "sqlite")
+def _sqlite_bigint(type_, compiler, **kw):
+    # SQLite nummert enkel "INTEGER PRIMARY KEY" automatisch
+    return "INTEGER"
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        SCHEDULER_ENABLED = False
+        EXPORT_CACHE_DIR = str(tmp_path / "reports")
+        EXPORT_WORKERS = 0
+        SHARED_CACHE_PATH = ""
+        # Geen synchronisatie tussen workers: houdt het aantal queries per request vast
+        CACHE_SYNC_INTERVAL = float("inf")
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        # Nieuwe database: ids en change_seq beginnen opnieuw bij 1
+        invalidate_company_features()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    from app.models import AppUser
+
+    user = AppUser(username="admin", email="admin@example.com",
+                   password_hash=generate_password_hash("secret"), is_admin=True)
+    db.session.add(user)
+    db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = user.user_id
+        sess["username"] = user.username
+    return client
+
+
+class QueryCounter:
+    """Verzamelt de SQL-statements die binnen een `with`-blok uitgevoerd worden."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries(app):
+    return lambda: QueryCounter(db.engine)
@@ -0,0 +1,147 @@
+# Streaming audit-exports (app/audit_export.py): inhoud van CSV/JSON/NDJSON/gzip,
+# de since/until-grenzen, en een piekgeheugen dat niet meegroeit met het aantal rijen.
+# De variant met 1 miljoen rijen draait enkel met RUN_SLOW_TESTS=1.
+
+import csv
+import gzip
+import io
+import json
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.audit_export import (audit_export_chunks, audit_log_query, gzip_chunks, parse_export_bound,
+                              AUDIT_EXPORT_CHUNK)
+from app.models import AuditLog, Company
+
+START = datetime(2024, 1, 1)
+
+
+def _fill(rows, companies=20, batch=50000):
+    """Audit logs via bulk-inserts (Core), één per 30 seconden vanaf START."""
+    db.session.execute(db.insert(Company), [
+        {"company_id": i, "name": f"Company {i}"} for i in range(1, companies + 1)
+    ])
+    for offset in range(0, rows, batch):
+        db.session.execute(db.insert(AuditLog), [
+            {
+                "log_id": i,
+                "company_id": i % companies + 1,
+                "source_name": f"scrape {i % 7}",
+                "source_url": f"https://company{i % companies + 1}.example/page/{i}",
+                "retrieved_at": START + timedelta(seconds=30 * i),
+            }
+            for i in range(offset + 1, min(rows, offset + batch) + 1)
+        ])
+    db.session.commit()
+
+
+def _export(fmt, compress=False, **bounds):
+    chunks = audit_export_chunks(audit_log_query(**bounds), fmt)
+    if compress:
+        chunks = gzip_chunks(chunks)
+    return b"".join(chunks)
+
+
+@pytest.fixture
+def logs(app):
+    _fill(5, companies=2)
+    # Audit log zonder (bestaand) bedrijf
+    db.session.execute(db.insert(AuditLog), [{"log_id": 99, "company_id": None, "source_name": "manueel",
+                                              "source_url": "https://x.example", "retrieved_at": START}])
+    db.session.commit()
+
+
+def test_csv_export(logs):
+    rows = list(csv.reader(io.StringIO(_export("csv").decode("utf-8"))))
+
+    assert rows[0] == ["Company", "Source Name", "Source URL", "Retrieved At"]
+    assert len(rows) == 7
+    # Nieuwste eerst
+    assert rows[1] == ["Company 2", "scrape 5", "https://company2.example/page/5",
+                       (START + timedelta(seconds=150)).isoformat()]
+    assert rows[-1] == ["Onbekend", "manueel", "https://x.example", START.isoformat()]
+
+
+@pytest.mark.parametrize("fmt", ["json", "ndjson"])
+def test_json_exports(logs, fmt):
+    text = _export(fmt).decode("utf-8")
+    records = json.loads(text) if fmt == "json" else [json.loads(line) for line in text.splitlines()]
+
+    assert len(records) == 6
+    assert records[0] == {"company": "Company 2", "source_name": "scrape 5",
+                          "source_url": "https://company2.example/page/5",
+                          "retrieved_at": (START + timedelta(seconds=150)).isoformat()}
+    assert [r["retrieved_at"] for r in records] == sorted((r["retrieved_at"] for r in records), reverse=True)
+
+
+def test_empty_exports(app):
+    assert json.loads(_export("json")) == []
+    assert _export("ndjson") == b""
+    assert _export("csv").decode("utf-8").strip() == "Company,Source Name,Source URL,Retrieved At"
+
+
+@pytest.mark.parametrize("fmt", ["csv", "json", "ndjson"])
+def test_gzip_matches_plain_export(logs, fmt):
+    assert gzip.decompress(_export(fmt, compress=True)) == _export(fmt)
+
+
+def test_since_until_bounds(logs):
+    since = START + timedelta(seconds=60)     # log 2, inclusief
+    until = START + timedelta(seconds=120)    # log 4, exclusief
+    records = json.loads(_export("json", since=since, until=until))
+
+    assert [r["source_url"].rsplit("/", 1)[1] for r in records] == ["3", "2"]
+
+
+def test_parse_export_bound():
+    assert parse_export_bound("") is None
+    assert parse_export_bound("2025-12-01") == datetime(2025, 12, 1)
+    # Een datum als einde telt de hele dag mee
+    assert parse_export_bound("2025-12-31", end=True) == datetime(2026, 1, 1)
+    assert parse_export_bound("2025-12-31T12:00", end=True) == datetime(2025, 12, 31, 12)
+    with pytest.raises(ValueError):
+        parse_export_bound("31/12/2025")
+
+
+def _peak_bytes(fmt, compress=False):
+    """Piekgeheugen (tracemalloc) bij het consumeren van een export, zoals een client."""
+    db.session.expunge_all()
+    tracemalloc.start()
+    try:
+        total = 0
+        chunks = audit_export_chunks(audit_log_query(), fmt)
+        for chunk in gzip_chunks(chunks) if compress else chunks:
+            total += len(chunk)
+        return tracemalloc.get_traced_memory()[1], total
+    finally:
+        tracemalloc.stop()
+
+
+def _assert_bounded(app, small, large):
+    _fill(small)
+    peaks_small = {fmt: _peak_bytes(fmt) for fmt in ("csv", "json", "ndjson")}
+    peaks_small["csv+gzip"] = _peak_bytes("csv", compress=True)
+
+    db.session.execute(db.delete(AuditLog))
+    db.session.execute(db.delete(Company))
+    db.session.commit()
+    _fill(large)
+
+    for key, (small_peak, small_total) in peaks_small.items():
+        fmt, _, compress = key.partition("+")
+        large_peak, large_total = _peak_bytes(fmt, compress=bool(compress))
+        assert large_total > small_total * (large / small) * 0.8
+        # Geen groei met het aantal rijen: enkel ruis bovenop een paar blokken
+        assert large_peak < small_peak * 1.5 + 4 * AUDIT_EXPORT_CHUNK, (key, small_peak, large_peak)
+
+
+def test_export_memory_does_not_grow_with_rows(app):
+    _assert_bounded(app, 5_000, 50_000)
+
+
+@pytest.mark.slow
+def test_export_memory_one_million_rows(app):
+    _assert_bounded(app, 10_000, 1_000_000)
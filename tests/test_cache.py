@@ -0,0 +1,86 @@
+# Gedeelde cache (app/cache.py): standaard een privé-bestand in de instance-map,
+# geen bestanden van andere gebruikers, en een lopend totaal i.p.v. SUM(size) per set.
+
+import os
+import sqlite3
+import stat
+
+import pytest
+
+from app import cache as cache_module
+from app.cache import SqliteCache, shared_cache
+
+
+@pytest.fixture
+def no_shared(monkeypatch):
+    monkeypatch.setattr(cache_module, "_shared", None)
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_default_path_is_private_instance_file(app, no_shared):
+    app.config["SHARED_CACHE_PATH"] = None
+    shared = shared_cache()
+    shared.set("a", {"html": "<p>x</p>"})
+
+    assert shared.path == os.path.join(app.instance_path, "cache", "shared.sqlite3")
+    assert _mode(os.path.dirname(shared.path)) == 0o700
+    assert _mode(shared.path) == 0o600
+    assert shared.get("a") == {"html": "<p>x</p>"}
+
+    app.config["SHARED_CACHE_PATH"] = ""
+    assert shared_cache() is None
+
+
+def test_foreign_or_linked_file_is_not_used(tmp_path, monkeypatch):
+    target = tmp_path / "elders.sqlite3"
+    SqliteCache(str(target), max_bytes=10_000).set("a", "<script>")
+    link = tmp_path / "link.sqlite3"
+    link.symlink_to(target)
+
+    linked = SqliteCache(str(link), max_bytes=10_000)
+    assert linked.get("a") is None and linked.errors == 1
+
+    # Vooraf aangemaakt door een andere gebruiker
+    monkeypatch.setattr(os, "getuid", lambda: os.stat(target).st_uid + 1)
+    foreign = SqliteCache(str(target), max_bytes=10_000)
+    assert foreign.get("a") is None and foreign.errors == 1
+
+
+def _bytes(path):
+    with sqlite3.connect(path) as connection:
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entry").fetchone()[0]
+        meta = connection.execute("SELECT value FROM cache_meta WHERE name = 'bytes'").fetchone()[0]
+    return total, meta
+
+
+def test_running_total_and_eviction(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    shared = SqliteCache(path, max_bytes=2_000)
+    for i in range(10):
+        shared.set(f"k{i}", "x" * 50)
+    shared.set("k3", "y" * 120)        # overschrijven
+    shared.delete_prefix("k1")
+    total, meta = _bytes(path)
+    assert total == meta == shared.stats()["bytes"]
+
+    for i in range(100):
+        shared.set(f"n{i}", "z" * 100)
+    total, meta = _bytes(path)
+    assert total == meta <= 2_000
+    assert shared.evictions > 0
+
+
+def test_existing_file_without_total_is_counted_once(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE cache_entry (key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                           " size INTEGER NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)")
+        connection.execute("INSERT INTO cache_entry VALUES ('oud', '\"x\"', 40, NULL, 0)")
+    os.chmod(path, 0o600)
+
+    shared = SqliteCache(path, max_bytes=10_000)
+    shared.set("nieuw", "y")
+    assert _bytes(path) == (40 + len("nieuw") + 3,) * 2
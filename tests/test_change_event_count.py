@@ -0,0 +1,67 @@
+# Teller change_event_count (app/alerts.py): pas bij de commit aangepast, zodat
+# de tellerrij niet de hele transactie vergrendeld blijft, en gelijk aan COUNT(*).
+
+from sqlalchemy import func, select
+
+from app import db
+from app.alerts import CHANGE_EVENT_COUNT, change_event_count
+from app.models import AppCounter, ChangeEvent, Company
+
+
+def _count():
+    return db.session.execute(select(func.count()).select_from(ChangeEvent.__table__)).scalar()
+
+
+def _counter():
+    return db.session.execute(select(AppCounter.value).where(AppCounter.name == CHANGE_EVENT_COUNT)).scalar()
+
+
+def _events(company_id, n):
+    events = [ChangeEvent(company_id=company_id, event_type="new_feature", description=f"Feature {i}")
+              for i in range(n)]
+    db.session.add_all(events)
+    return events
+
+
+def test_counter_is_written_at_commit_only(app, count_queries):
+    company = Company(name="Acme")
+    db.session.add(company)
+    db.session.commit()
+    company_id = company.company_id
+
+    # Eerste schrijver: de teller bestaat nog niet en wordt met COUNT(*) gevuld
+    _events(company_id, 2)
+    with count_queries() as flushes:
+        db.session.flush()
+        _events(company_id, 1)
+        db.session.flush()
+    assert not any("app_counter" in statement for statement in flushes.statements)
+
+    with count_queries() as commit:
+        db.session.commit()
+    assert sum("app_counter" in statement for statement in commit.statements) == 1
+    assert _counter() == _count() == 3
+
+    # Daarna: optellen en aftrekken in dezelfde upsert
+    events = _events(company_id, 4)
+    db.session.commit()
+    db.session.delete(events[0])
+    db.session.commit()
+    assert _counter() == _count() == 6
+    assert change_event_count() == 6
+
+
+def test_rolled_back_events_are_not_counted(app):
+    company = Company(name="Acme")
+    db.session.add(company)
+    db.session.commit()
+    company_id = company.company_id
+    assert change_event_count() == 0
+
+    _events(company_id, 3)
+    db.session.flush()
+    db.session.rollback()
+
+    _events(company_id, 1)
+    db.session.commit()
+    assert _counter() == _count() == 1
@@ -0,0 +1,163 @@
+# Grafiekdata van de detailpagina (/company/<id> en /company/<id>/charts): vast aantal
+# queries, ongeacht het aantal reeksen en punten, en de juiste indexen op SQLite.
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app import db
+from app.history import load_series_columns, record_rollup_point
+from app.models import Company, MetricHistory
+
+METRICS = ("Pricing", "TeamSize", "Hiring")
+
+
+def _add_history(company_id, days, metrics=METRICS):
+    start = datetime(2024, 1, 1)
+    for day in range(days):
+        for i, name in enumerate(metrics):
+            recorded_at = start + timedelta(days=day)
+            value = (day + i) % 5
+            db.session.add(MetricHistory(company_id=company_id, name=name, value=value,
+                                         recorded_at=recorded_at, source="snapshot"))
+            record_rollup_point(company_id, name, recorded_at, value)
+    db.session.commit()
+
+
+@pytest.fixture
+def company(app):
+    company = Company(name="Acme")
+    db.session.add(company)
+    db.session.commit()
+    return company
+
+
+@pytest.mark.parametrize("days", [10, 400])
+def test_charts_endpoint_query_count(client, company, count_queries, days):
+    _add_history(company.company_id, days)
+    url = f"/company/{company.company_id}/charts?metrics={','.join(METRICS)}&max_points=50"
+
+    with count_queries() as queries:
+        response = client.get(url)
+
+    assert response.status_code == 200
+    series = response.get_json()["series"]
+    assert set(series) == set(METRICS)
+    assert all(0 < len(s["labels"]) <= 50 for s in series.values())
+    # company_version + series_range_start + load_series_columns (alle reeksen samen)
+    assert queries.count == 3, queries.statements
+
+
+def test_charts_endpoint_single_metric_same_count(client, company, count_queries):
+    _add_history(company.company_id, 30)
+    url = f"/company/{company.company_id}/charts/Pricing"
+
+    with count_queries() as queries:
+        response = client.get(url)
+
+    assert response.status_code == 200
+    assert queries.count == 3, queries.statements
+
+
+def test_charts_endpoint_not_modified_needs_one_query(client, company, count_queries):
+    _add_history(company.company_id, 30)
+    url = f"/company/{company.company_id}/charts?metrics=Pricing"
+    etag = client.get(url).headers["ETag"]
+
+    with count_queries() as queries:
+        response = client.get(url, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert queries.count == 1
+
+
+def _plan(statement):
+    compiled = statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+    rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    return " ".join(str(row[-1]) for row in rows)
+
+
+def test_rollup_series_use_rollup_unique_index(app, company):
+    # Het endpoint leest rollups: (company_id, name, resolution, bucket_start) → uq_metric_rollup_bucket
+    from app.models import MetricRollup
+    query = (db.session.query(MetricRollup)
+             .filter(MetricRollup.company_id == 1, MetricRollup.name.in_(METRICS),
+                     MetricRollup.resolution == "day")
+             .order_by(MetricRollup.bucket_start))
+    assert "sqlite_autoindex_metric_rollup" in _plan(query.statement)
+
+
+def test_raw_series_use_company_name_recorded_index(app, company):
+    # Ruwe reeksen (resolution=None) en de laatste waarde per metric → ix_metric_history_company_name_recorded
+    query = (db.session.query(MetricHistory.name, MetricHistory.recorded_at, MetricHistory.value)
+             .filter(MetricHistory.company_id == 1, MetricHistory.name.in_(METRICS))
+             .order_by(MetricHistory.recorded_at))
+    assert "ix_metric_history_company_name_recorded" in _plan(query.statement)
+
+    latest = (db.session.query(MetricHistory.value)
+              .filter(MetricHistory.company_id == 1, MetricHistory.name == "Pricing")
+              .order_by(MetricHistory.recorded_at.desc())
+              .limit(1))
+    assert "ix_metric_history_company_name_recorded" in _plan(latest.statement)
+
+
+def test_raw_series_loader_returns_all_metrics(app, company):
+    _add_history(company.company_id, 5, metrics=("Pricing", "Hiring"))
+    columns = load_series_columns(company.company_id, ["Pricing", "Hiring", "Missing"])
+    assert len(columns["Pricing"][0]) == 5
+    assert len(columns["Hiring"][1]) == 5
+    assert len(columns["Missing"][0]) == 0
+
+
+def _rollups():
+    from app.models import MetricRollup
+    return sorted(
+        (r.name, r.resolution, r.bucket_start.replace(tzinfo=None), float(r.last_value), float(r.min_value),
+         float(r.max_value), float(r.sum_value), r.value_count)
+        for r in MetricRollup.query
+    )
+
+
+def test_rollups_without_on_conflict_match_rebuild(app, company, monkeypatch):
+    # Andere dialecten dan PostgreSQL/SQLite: select-then-update via _merge_rollups
+    from app import history
+    monkeypatch.setattr(history, "_INSERTS", {})
+    _add_history(company.company_id, 40)
+    incremental = _rollups()
+
+    history.rebuild_all_rollups()
+    db.session.commit()
+    assert incremental == _rollups()
+
+
+def _detail_queries(client, count_queries, company_id):
+    url = f"/company/{company_id}"
+    db.session.expunge_all()
+    with count_queries() as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    return queries
+
+
+def test_company_detail_query_count_is_constant(client, count_queries, monkeypatch):
+    # De detailpagina zelf: het aantal (reeks)queries hangt niet af van het aantal metrics
+    from app import google_reviews
+    monkeypatch.setattr(google_reviews, "get_google_reviews", lambda *args, **kwargs: (0, "Google"))
+
+    few, many = Company(name="Weinig"), Company(name="Veel")
+    db.session.add_all([few, many])
+    db.session.commit()
+    few_id, many_id = few.company_id, many.company_id
+    _add_history(few_id, 30, metrics=("Pricing",))
+    _add_history(many_id, 30, metrics=("Pricing",) + tuple(f"Metric {i}" for i in range(12)))
+
+    small = _detail_queries(client, count_queries, few_id)
+    large = _detail_queries(client, count_queries, many_id)
+
+    def series(queries):
+        return [s for s in queries.statements if "metric_history" in s or "metric_rollup" in s]
+
+    assert large.count == small.count, large.statements
+    # Enkel het laatste pricing-niveau; de reeksen zelf komen uit company_chart_data
+    assert len(series(large)) == len(series(small)) == 1, series(large)
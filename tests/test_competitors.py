@@ -0,0 +1,73 @@
+# Naamresolutie van competitors: de trigram-blokkering geeft hetzelfde resultaat
+# als difflib over alle sleutels, en een hernoemd bedrijf verliest de in-edges
+# die enkel via de oude naam pasten.
+
+import difflib
+import random
+import string
+
+from app import db
+from app.competitors import (CompanyNameIndex, FUZZY_CUTOFF, in_edges, normalize_competitor_name,
+                             sync_company_competitors)
+from app.models import Company
+
+
+def _typo(name, rng):
+    chars = list(name)
+    for _ in range(rng.randint(0, 2)):
+        i = rng.randrange(len(chars))
+        op = rng.choice("sdi")
+        if op == "s":
+            chars[i] = rng.choice(string.ascii_lowercase)
+        elif op == "d" and len(chars) > 1:
+            del chars[i]
+        else:
+            chars.insert(i, rng.choice(string.ascii_lowercase + " "))
+    return "".join(chars)
+
+
+def test_fuzzy_resolve_matches_full_difflib_scan():
+    rng = random.Random(7)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(300)]
+    rows = [(i, " ".join(rng.sample(words, rng.randint(1, 3))), None) for i in range(1, 1001)]
+    index = CompanyNameIndex(rows)
+    keys = list(index._names)
+
+    queries = [_typo(rng.choice(rows)[1], rng) for _ in range(400)]
+    queries += ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 12))) for _ in range(100)]
+    matched = 0
+    for query in queries:
+        normalized = normalize_competitor_name(query)
+        if not normalized:
+            continue
+        expected = difflib.get_close_matches(normalized, keys, n=1, cutoff=FUZZY_CUTOFF)
+        close = index._closest(normalized)
+        assert (close[0] if close else None) == (expected[0] if expected else None), query
+        matched += bool(expected)
+    assert matched > 100
+
+
+def test_fuzzy_candidates_are_a_small_subset():
+    rng = random.Random(3)
+    rows = [(i, "".join(rng.choices(string.ascii_lowercase, k=10)), None) for i in range(1, 3001)]
+    index = CompanyNameIndex(rows)
+
+    assert len(index.fuzzy_candidates(normalize_competitor_name(rows[0][1]))) < 50
+
+
+def test_rename_reresolves_in_edges(app):
+    notion = Company(name="Notion", competitors=[])
+    coda = Company(name="Coda", competitors=["Notion"])
+    db.session.add_all([notion, coda])
+    db.session.flush()
+    sync_company_competitors(notion)
+    sync_company_competitors(coda)
+    db.session.commit()
+    assert [e["source_company_id"] for e in in_edges(notion.company_id)] == [coda.company_id]
+
+    notion.name = "Evernote"
+    db.session.flush()
+    sync_company_competitors(notion)
+    db.session.commit()
+
+    assert in_edges(notion.company_id) == []
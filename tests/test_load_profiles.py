@@ -0,0 +1,100 @@
+# Laadprofielen (app/load_profiles.py): de lichte profielen halen de uitgestelde
+# kolommen niet op, en de dashboard- en refreshpaden laden geen kolommen per rij na.
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import undefer
+
+from app import db
+from app.load_profiles import company_query
+from app.models import Company
+from benchmarks.bench_row_bytes import fetched_bytes
+
+DEFERRED = {"office_locations", "traction_signals", "funding_history", "ai_summary", "value_proposition",
+            "competitors", "product_description", "target_segment", "pricing", "key_features"}
+
+
+class ColumnLoadCounter:
+    """Telt ORM-queries die kolommen van een al geladen Company nalanden (deferred/expired)."""
+
+    def __init__(self, session):
+        self.session = session
+        self.loads = []
+
+    def _record(self, state):
+        if state.is_column_load and state.bind_mapper is not None and state.bind_mapper.class_ is Company:
+            self.loads.append(str(state.statement))
+
+    def __enter__(self):
+        event.listen(self.session, "do_orm_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.session, "do_orm_execute", self._record)
+
+
+def _add_companies(n):
+    text = "Boekhouding en facturatie voor kmo's " * 20
+    for i in range(n):
+        db.session.add(Company(
+            name=f"Bedrijf {i}", website_url=f"https://bedrijf{i}.example", team_size=10 + i,
+            product_description=text, target_segment="kmo", pricing="€ 20 per maand",
+            key_features=["facturen", "btw"], competitors=["Concurrent"], ai_summary=text * 4,
+            value_proposition=text, traction_signals=text, funding_history=text, office_locations="Gent",
+        ))
+    db.session.commit()
+
+
+@pytest.mark.parametrize("profile", ["list", "name"])
+def test_light_profiles_skip_deferred_columns(app, count_queries, profile):
+    _add_companies(20)
+    db.session.expunge_all()
+
+    with count_queries() as queries:
+        companies = company_query(profile).all()
+    assert len(companies) == 20 and queries.count == 1
+    assert not {column for column in DEFERRED if f"company.{column}" in queries.statements[0]}
+
+    # Bytes per pagina: vóór (alle kolommen) en na (het profiel)
+    before = fetched_bytes(Company.query.options(undefer("*")).statement)
+    after = fetched_bytes(company_query(profile).statement)
+    assert after * 10 < before
+
+
+def test_dashboard_has_no_per_row_column_loads(client):
+    _add_companies(10)
+    with client.session_transaction() as sess:
+        sess["watchlist_companies"] = [c.company_id for c in Company.query.limit(5)]
+        sess["watchlist_metrics"] = ["Pricing"]
+    db.session.expunge_all()
+
+    with ColumnLoadCounter(db.session) as counter:
+        response = client.get("/dashboard")
+
+    assert response.status_code == 200
+    assert counter.loads == []
+
+
+def test_refresh_all_companies_has_no_per_row_column_loads(app, monkeypatch):
+    import app as app_package
+    from app import google_reviews, routes
+
+    _add_companies(5)
+    db.session.expunge_all()
+
+    result = {
+        "title": None, "headquarters": "Gent", "office_locations": "Gent", "team_size": 12,
+        "funding": "Seed", "funding_history": "", "traction_signals": "", "ai_summary": "Samenvatting",
+        "value_proposition": "", "product_description": "Nieuwe productlijn", "target_segment": "kmo",
+        "pricing": "€ 25 per maand", "key_features": ["facturen"], "competitors": ["Bedrijf 1"],
+        "historical_metrics": [],
+    }
+    monkeypatch.setattr(app_package, "create_app", lambda *args, **kwargs: app)
+    monkeypatch.setattr(routes, "scrape_website", lambda url: dict(result))
+    monkeypatch.setattr(google_reviews, "get_google_reviews", lambda name: (0, "Geen reviews"))
+
+    with ColumnLoadCounter(db.session) as counter:
+        routes.refresh_all_companies()
+
+    assert Company.query.filter_by(pricing="€ 25 per maand").count() == 5
+    assert counter.loads == []
@@ -0,0 +1,64 @@
+# Rapporten in de process pool (app/report_exports.py): een gecrashte worker
+# maakt de pool kapot; de export lukt toch en de volgende krijgt een nieuwe pool.
+
+import os
+import stat
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app import db
+from app import report_exports
+from app.models import Company
+
+
+@pytest.fixture
+def broken_pool(app):
+    app.config["EXPORT_WORKERS"] = 1
+    executor = report_exports._report_executor()
+    with pytest.raises(BrokenProcessPool):
+        executor.submit(os._exit, 1).result()
+    yield executor
+    if report_exports._executor is not None:
+        report_exports._executor.shutdown()
+        report_exports._executor = None
+
+
+def test_broken_pool_is_replaced(app, broken_pool):
+    company = Company(name="Acme", pricing="€ 10", key_features=["a"])
+    db.session.add(company)
+    db.session.commit()
+    company_id = company.company_id
+
+    reports = report_exports.company_reports([company_id], ["pdf"])
+    assert reports[(company_id, "pdf")][1].startswith(b"%PDF")
+    assert report_exports._executor is None
+
+    # Volgende export (andere soort, dus een cache miss): nieuwe, werkende pool
+    reports = report_exports.company_reports([company_id], ["pptx"])
+    assert reports[(company_id, "pptx")][1][:2] == b"PK"
+    assert report_exports._executor not in (None, broken_pool)
+
+
+def test_report_cache_defaults_to_private_instance_dir(app):
+    app.config["EXPORT_CACHE_DIR"] = ""
+    cache = report_exports.report_cache()
+    cache.put(1, 7, "pdf", b"%PDF-1.4")
+
+    directory = os.path.join(app.instance_path, "reports")
+    assert cache.directory == directory
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    assert cache.get(1, 7, "pdf") == b"%PDF-1.4"
+
+
+def test_report_cache_tightens_permissions_and_checks_owner(app, tmp_path, monkeypatch):
+    directory = tmp_path / "shared"
+    directory.mkdir(mode=0o777)
+    os.chmod(directory, 0o777)
+    report_exports.ReportCache(str(directory)).put(1, 7, "pdf", b"%PDF-1.4")
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+    # Map van een andere gebruiker (bv. vooraf aangemaakt in /tmp): niet gebruiken
+    monkeypatch.setattr(os, "getuid", lambda: os.stat(directory).st_uid + 1)
+    with pytest.raises(PermissionError):
+        report_exports.ReportCache(str(directory)).get(1, 7, "pdf")
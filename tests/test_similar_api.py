@@ -0,0 +1,41 @@
+# Batch-API voor vergelijkbare bedrijven (/api/similar-companies): invoer uit
+# de JSON-body wordt net als de query string naar int omgezet.
+
+import json
+
+import pytest
+
+from app import db
+from app.models import Company, Sector
+
+
+@pytest.fixture
+def sector(app):
+    sector = Sector(name="Software")
+    db.session.add(sector)
+    db.session.flush()
+    for name, segment in (("Acme", "kmo boekhouding"), ("Beta", "kmo facturatie"), ("Gamma", "kmo boekhouding")):
+        db.session.add(Company(name=name, sector_id=sector.sector_id, target_segment=segment,
+                               product_description=segment, pricing="", key_features=[]))
+    db.session.commit()
+    return sector.sector_id
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+@pytest.mark.parametrize("sector_id", [lambda sid: sid, lambda sid: str(sid)])
+def test_sector_id_from_json_body(client, sector, sector_id):
+    response = client.post("/api/similar-companies", json={"sector_id": sector_id(sector), "top_n": 2})
+
+    assert response.status_code == 200
+    results = _lines(response)
+    assert {r["name"] for r in results} == {"Acme", "Beta", "Gamma"}
+    assert all(len(r["similar"]) == 2 for r in results)
+
+
+def test_invalid_sector_id_is_rejected(client, sector):
+    response = client.post("/api/similar-companies", json={"sector_id": "software"})
+
+    assert response.status_code == 400
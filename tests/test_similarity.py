@@ -0,0 +1,82 @@
+# Similariteit (app/similarity.py): de feature cache volgt de versie van een
+# bedrijf (change_seq) en blijft begrensd; similarity_score leest de huidige velden;
+# de inverted index geeft exact hetzelfde als alles scoren.
+
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from app import db, similarity
+from app.models import Company
+from app.similarity import (SimilarityIndex, get_features, similarity_score, top_similar_companies_in_same_sector,
+                            top_similar_companies_indexed)
+
+
+def _company(**fields):
+    company = Company(name="Acme", target_segment="kmo boekhouding", product_description="facturen",
+                      pricing="gratis", key_features=["btw"], **fields)
+    db.session.add(company)
+    db.session.commit()
+    return company
+
+
+def test_features_follow_company_version(app):
+    company = _company()
+    assert get_features(company).target_segment == {"kmo", "boekhouding"}
+
+    # Gewijzigd maar nog niet gecommit: niet uit (of in) de cache
+    company.target_segment = "enterprise"
+    assert get_features(company).target_segment == {"enterprise"}
+    db.session.commit()
+    assert get_features(company).target_segment == {"enterprise"}
+
+    # Nieuw object met hetzelfde id (bv. een andere database): geen oude features
+    other = Company(company_id=company.company_id, name="Beta", target_segment="horeca")
+    assert get_features(other).target_segment == {"horeca"}
+
+
+def test_similarity_score_reads_current_fields(app):
+    a, b = _company(), _company()
+    assert similarity_score(a, b) == 100.0
+
+    b.key_features = ["crm"]
+    assert similarity_score(a, b) == pytest.approx(70.0)
+
+
+def test_feature_cache_is_bounded(app, monkeypatch):
+    monkeypatch.setattr(similarity, "FEATURE_CACHE_SIZE", 3)
+    companies = [_company() for _ in range(5)]
+    for company in companies:
+        get_features(company)
+
+    assert list(similarity._feature_cache) == [c.company_id for c in companies[-3:]]
+
+
+def _random_companies(rng, n, vocab, sectors):
+    words = [f"w{i}" for i in range(vocab)]
+
+    def text():
+        return None if rng.random() < 0.1 else " ".join(rng.choices(words, k=rng.randint(0, 6)))
+
+    return [
+        SimpleNamespace(company_id=i, change_seq=None, sector_id=rng.choice(sectors),
+                        target_segment=text(), product_description=text(), pricing=text(),
+                        key_features=None if rng.random() < 0.1 else rng.sample(words, rng.randint(0, 3)))
+        for i in range(1, n + 1)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("vocab", [8, 60, 400])
+def test_indexed_matches_brute_force(seed, vocab):
+    # Kleine woordenschat: veel gelijke scores; grote: veel bedrijven met score 0
+    rng = random.Random(seed)
+    companies = _random_companies(rng, 300, vocab, sectors=[None, 1, 2, 3])
+    index = SimilarityIndex()
+    index.sync(companies)
+
+    for target in rng.sample(companies, 60):
+        for top_n in (1, 5):
+            assert (top_similar_companies_indexed(target, companies, top_n, index=index)
+                    == top_similar_companies_in_same_sector(target, companies, top_n)), (target.company_id, top_n)
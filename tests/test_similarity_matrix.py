@@ -0,0 +1,41 @@
+# Similariteitsmatrix (app/similarity_matrix.py): elke cel is gelijk aan
+# similarity_score van dat paar, ook met lege en ontbrekende velden en over blokken heen.
+
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.similarity import similarity_score
+from app.similarity_matrix import similarity_blocks, similarity_matrix
+
+
+def _random_companies(seed, n):
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(15)]
+
+    def text():
+        return rng.choice([None, "", " ".join(rng.choices(words, k=rng.randint(1, 6)))])
+
+    return [
+        SimpleNamespace(company_id=i, sector_id=1, target_segment=text(), product_description=text(),
+                        pricing=text(), key_features=rng.choice([None, [], rng.sample(words, rng.randint(1, 4))]))
+        for i in range(1, n + 1)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_matrix_equals_similarity_score(seed):
+    companies = _random_companies(seed, 60)
+    expected = np.array([[similarity_score(a, b) for b in companies] for a in companies])
+
+    np.testing.assert_allclose(similarity_matrix(companies, chunk_size=7), expected, rtol=1e-12, atol=1e-12)
+
+
+def test_blocks_cover_all_rows():
+    companies = _random_companies(0, 23)
+    blocks = [(start, stop, block.shape) for start, stop, block in similarity_blocks(companies, chunk_size=10)]
+
+    assert blocks == [(0, 10, (10, 23)), (10, 20, (10, 23)), (20, 23, (3, 23))]
+    assert list(similarity_blocks([], chunk_size=10)) == []
@@ -0,0 +1,28 @@
+# MinHash/LSH (app/similarity_minhash.py): op een vast (geseed) corpus vindt de
+# standaardinstelling minstens 90% van de exacte top 5, met exacte scores.
+
+import random
+
+from app.similarity import features_similarity_score, get_features, top_similar_companies_in_same_sector
+from app.similarity_minhash import MinHashLSHIndex, top_similar_companies_minhash
+from benchmarks.synthetic import generate_companies
+
+
+def test_minhash_recall_against_exact_scoring():
+    companies = generate_companies(1000, seed=7)
+    index = MinHashLSHIndex()
+    index.sync(companies)
+
+    recalls = []
+    for target in random.Random(7).sample(companies, 100):
+        found = top_similar_companies_minhash(target, companies, 5, index=index)
+        for company, score in found:
+            assert company.sector_id == target.sector_id and company is not target
+            assert score == round(features_similarity_score(get_features(target), get_features(company)), 2)
+
+        expected = {c.company_id for c, score in top_similar_companies_in_same_sector(target, companies, 5) if score > 0}
+        if expected:
+            recalls.append(len(expected & {c.company_id for c, _score in found}) / len(expected))
+
+    assert len(recalls) > 50
+    assert sum(recalls) / len(recalls) >= 0.9
@@ -0,0 +1,76 @@
+# TF-IDF index (app/similarity_tfidf.py): een update telt als één wijziging
+# voor refresh_ratio, en sync/scores mogen tegelijk vanuit meerdere threads lopen.
+
+import itertools
+import threading
+from types import SimpleNamespace
+
+from app.similarity import build_features
+from app.similarity_tfidf import TfidfIndex
+from benchmarks.synthetic import generate_companies
+
+_change_seq = itertools.count(1)
+
+
+def _company(company_id, segment):
+    return SimpleNamespace(company_id=company_id, change_seq=next(_change_seq), sector_id=1, target_segment=segment,
+                           key_features=["a"], product_description="boekhouding", pricing="gratis")
+
+
+def test_update_counts_as_one_change():
+    index = TfidfIndex(refresh_ratio=1.0)
+    for i in range(1, 11):
+        index.add(build_features(_company(i, f"kmo {i}")))
+    index.refresh()
+
+    index.add(build_features(_company(3, "enterprise")))
+    assert index._changes == 1
+    index.remove(4)
+    index.remove(4)
+    assert index._changes == 2
+
+
+def test_refresh_after_ratio_of_updates():
+    companies = [_company(i, f"kmo {i}") for i in range(1, 11)]
+    index = TfidfIndex(refresh_ratio=0.3)
+    index.sync(companies)
+    index.refresh()
+
+    # 3 updates op 10 bedrijven: nog geen refresh (> 0.3 × 10 nodig)
+    for i in range(3):
+        companies[i] = _company(i + 1, "enterprise")
+    index.sync(companies)
+    assert index._changes == 3
+
+    companies[3] = _company(4, "enterprise")
+    index.sync(companies)
+    assert index._changes == 0
+
+
+def test_concurrent_sync_and_scores():
+    corpora = [generate_companies(300, seed=seed) for seed in (1, 2)]
+    index = TfidfIndex(refresh_ratio=0.1)
+    index.sync(corpora[0])
+    errors = []
+
+    def writer():
+        try:
+            for i in range(20):
+                index.sync(corpora[i % 2])
+        except Exception as exc:
+            errors.append(exc)
+
+    def reader():
+        try:
+            for i in range(200):
+                target = index.build_record(build_features(corpora[0][i % 300]))
+                index.scores(target)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
@@ -0,0 +1,71 @@
+# Watchlist-vergelijking (/watchlist): vast aantal queries, ongeacht het aantal
+# bedrijven en metrics, en geen externe calls (Google-reviews) tijdens het renderen.
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import AuditLog, Company, Metric
+
+METRICS = ["Pricing", "Features", "Reviews", "Funding", "Hiring"]
+
+
+def _watch(client, n_companies):
+    ids = []
+    for i in range(n_companies):
+        company = Company(name=f"Bedrijf {i}", pricing="€ 10 per maand", key_features=["a", "b"],
+                          funding="Seed", team_size=5 + i, ai_summary="Goede reviews")
+        db.session.add(company)
+        db.session.flush()
+        ids.append(company.company_id)
+        # Twee versies per metric (de jongste wint); Reviews zonder Metric-rij,
+        # zodat de fallback op de bedrijfsvelden gebruikt wordt
+        for name in METRICS:
+            if name == "Reviews":
+                continue
+            for age in (2, 1):
+                db.session.add(Metric(company_id=company.company_id, name=name, value=age,
+                                      description=f"{name} {age}",
+                                      last_updated=datetime(2025, 1, 10) - timedelta(days=age)))
+        for day in range(12):
+            db.session.add(AuditLog(company_id=company.company_id, source_name="Scrape",
+                                    source_url=f"https://bedrijf{i}.example",
+                                    retrieved_at=datetime(2025, 1, 1) + timedelta(days=day)))
+    db.session.commit()
+
+    with client.session_transaction() as sess:
+        sess["watchlist_companies"] = ids
+        sess["watchlist_metrics"] = METRICS
+
+
+@pytest.fixture
+def no_google(monkeypatch):
+    from app import google_reviews
+
+    calls = []
+    monkeypatch.setattr(google_reviews, "get_google_reviews",
+                        lambda *args, **kwargs: calls.append(args) or (0, "Google"))
+    return calls
+
+
+def _render(client, count_queries):
+    db.session.expunge_all()
+    with count_queries() as queries:
+        response = client.get("/watchlist")
+    assert response.status_code == 200
+    return response, queries
+
+
+def test_watchlist_query_count_is_constant(client, count_queries, no_google):
+    _watch(client, 2)
+    _response, small = _render(client, count_queries)
+
+    _watch(client, 20)
+    response, large = _render(client, count_queries)
+
+    # Bedrijven + metrics (één gewindowde query) + audit logs (één gewindowde query)
+    assert large.count == small.count == 3, large.statements
+    html = response.get_data(as_text=True)
+    assert "Bedrijf 19" in html and "Pricing 1" in html and "Pricing 2" not in html
+    assert no_google == []